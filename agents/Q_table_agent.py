@@ -1,5 +1,8 @@
 import numpy as np
 import math
+from multiprocessing import shared_memory
+
+from agents.features import FeatureExtractor, get_extractor
 
 
 class QTable:
@@ -48,6 +51,147 @@ class QTable:
         )
         self.set_q_value(distance, orientation, action, new_q_value)
 
+    # __________BATCHED__________#
+
+    def choose_actions(self, distances, orientations, epsilon, rng=None):
+        """Epsilon-greedy actions for a batch of states, e.g. one per copy of
+        the environment.
+
+        Args:
+            distances (np.ndarray): (N,) distance indices.
+            orientations (np.ndarray): (N,) orientation indices.
+            epsilon (float): probability of a random action.
+            rng (np.random.Generator | None): source of randomness, the global
+                numpy generator if None.
+        """
+        n = len(distances)
+        if rng is None:
+            explore = np.random.rand(n) < epsilon
+            random_actions = np.random.randint(0, self.action_space_size, n)
+        else:
+            explore = rng.random(n) < epsilon
+            random_actions = rng.integers(0, self.action_space_size, n)
+        greedy_actions = np.argmax(self.q_table[distances, orientations], axis=1)
+        return np.where(explore, random_actions, greedy_actions)
+
+    def update_q_values(
+        self,
+        distances,
+        orientations,
+        actions,
+        learning_rate,
+        rewards,
+        discount_factor,
+        next_distances,
+        next_orientations,
+        dones=None,
+    ):
+        """TD update for a batch of transitions.
+
+        The max future Q-values are read from the table before the batch.
+        Transitions sharing the same (distance, orientation, action) entry are
+        applied as if one after another, in batch order: the entry ends at
+        (1 - lr)^k * q + sum_i lr * (1 - lr)^(k - 1 - i) * target_i.
+
+        Args:
+            distances, orientations, actions (np.ndarray): (N,) indices.
+            learning_rate (float): step size.
+            rewards (np.ndarray): (N,) rewards.
+            discount_factor (float): discount of the future Q-values.
+            next_distances, next_orientations (np.ndarray): (N,) indices.
+            dones (np.ndarray | None): (N,) bool, no bootstrapping where True.
+        """
+        q_table = self.q_table
+        future = np.max(q_table[next_distances, next_orientations], axis=1)
+        if dones is not None:
+            future = np.where(dones, 0.0, future)
+        targets = np.asarray(rewards, dtype=float) + discount_factor * future
+
+        ## group the transitions by entry, keeping the batch order in groups
+        entries = np.ravel_multi_index(
+            (distances, orientations, actions), q_table.shape
+        )
+        order = np.argsort(entries, kind="stable")
+        entries = entries[order]
+        n = len(entries)
+        if n == 0:
+            return
+        starts = np.flatnonzero(np.r_[True, entries[1:] != entries[:-1]])
+        counts = np.diff(np.r_[starts, n])
+        group = np.repeat(np.arange(len(starts)), counts)
+        # number of later updates of the same entry
+        later = counts[group] - 1 - (np.arange(n) - starts[group])
+
+        decay = 1 - learning_rate
+        weights = learning_rate * decay**later
+        contributions = np.bincount(
+            group, weights=weights * targets[order], minlength=len(starts)
+        )
+        index = np.unravel_index(entries[starts], q_table.shape)
+        q_table[index] = decay**counts * q_table[index] + contributions
+
+
+class SharedQTable(QTable):
+    """QTable whose table lives in shared memory, for Q-learning workers that
+    update it concurrently, each with its own environment.
+
+    Updates take no lock (Hogwild): two workers writing the same entry at the
+    same time may lose one of the updates, which barely matters for sparse
+    updates of a table this size, while every worker runs at full speed. The
+    object can be passed to worker processes as is, they attach to the same
+    memory; only the process that created it frees the memory on `close`.
+
+    Args:
+        num_distances_manhattan (int): Number of distance indices.
+        action_space_size (int): Number of actions.
+        num_orientations_kronecker (int): Number of orientation indices.
+    """
+
+    def __init__(
+        self, num_distances_manhattan, action_space_size, num_orientations_kronecker=2
+    ):
+        self.state_space_dimension_a = num_distances_manhattan
+        self.state_space_dimension_b = num_orientations_kronecker
+        self.action_space_size = action_space_size
+        shape = (num_distances_manhattan, num_orientations_kronecker, action_space_size)
+        size = int(np.prod(shape)) * np.dtype(np.float64).itemsize
+        self._memory = shared_memory.SharedMemory(create=True, size=size)
+        self._owner = True
+        self.q_table = np.ndarray(shape, dtype=np.float64, buffer=self._memory.buf)
+        self.q_table[:] = 0
+
+    def __getstate__(self):
+        return {
+            "dimensions": self.q_table.shape,
+            "name": self._memory.name,
+        }
+
+    def __setstate__(self, state):
+        shape = state["dimensions"]
+        self.state_space_dimension_a, self.state_space_dimension_b = shape[:2]
+        self.action_space_size = shape[2]
+        self._memory = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self.q_table = np.ndarray(shape, dtype=np.float64, buffer=self._memory.buf)
+
+    def set_q_table(self, q_table):
+        # copied into the shared memory, so that every worker sees it
+        np.copyto(self.q_table, q_table)
+
+    def snapshot(self) -> np.ndarray:
+        """Private copy of the table. Workers keep writing during the copy,
+        so it may mix entries from before and after concurrent updates, as
+        any read of a Hogwild table."""
+        return self.q_table.copy()
+
+    def close(self) -> None:
+        """Detaches from the shared memory, and frees it in the creating
+        process. The table must not be used afterwards."""
+        self.q_table = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
 
 def manhattan_distance(x1, y1, x2, y2):
     return abs(x1 - x2) + abs(y1 - y2)
@@ -76,40 +220,21 @@ def scalar_product(vector1, vector2):
 
 
 def grab_distance_and_kronecker(
-    state,
-):  # takes state as decribed in tan_env.py and returns distance between player and closest enemy
-    tank_player = state["player"]
-    x_player, y_player, direction_player, _ = tank_player.info()
-    list_enemies = list(state["enemies"])
-
-    if len(list_enemies) == 0:
-        return 0, 0
-
-    closest_enemy = list_enemies[0]
-    x_enemy, y_enemy, _, _ = closest_enemy.info()
-    d_min = manhattan_distance(x_player, x_enemy, y_player, y_enemy)
-
-    for enemy in list_enemies:
-        x_enemy, y_enemy, _, _ = enemy.info()
-        if manhattan_distance(x_player, x_enemy, y_player, y_enemy) < d_min:
-            d_min = manhattan_distance(x_player, x_enemy, y_player, y_enemy)
-            closest_enemy = enemy
-
-    x_enemy, y_enemy, _, _ = closest_enemy.info()
-    box = [(x_enemy + i, y_enemy + j) for i in range(-2, 3) for j in range(-2, 3)]
-
-    direction_orientation_map = {0: (0, 1), 1: (1, 0), 2: (0, -1), 3: (-1, 0)}
-    key = int(np.argmax(direction_player))
-    orientation_vector = direction_orientation_map.get(key)
-
-    list_scalar_product = [0]
-    for pos_x, pos_y in box:
-        direction_vector = get_vector_normalized(
-            x_player, y_player, pos_x, pos_y
-        )  # calculate director vector to get direction player_enemy for each pixel of enemy
-        list_scalar_product.append(scalar_product(orientation_vector, direction_vector))
-
-    kronecker = 0
-    if 1 in list_scalar_product:
-        kronecker = 1
-    return d_min, kronecker
+    state, extractor: FeatureExtractor | None = None
+):  # takes state as decribed in tank_env.py and returns distance between player and closest enemy
+    """Returns the manhattan distance between the player and the closest
+    enemy, and 1 if the player faces that enemy, 0 otherwise.
+
+    Args:
+        state (dict): state of a TankEnv.
+        extractor (FeatureExtractor | None): extractor built for the grid size.
+            If None, a shared one large enough for the positions of the state
+            is used.
+    """
+    if extractor is None:
+        player = state["player"]
+        size = max([player.x, player.y] + [max(e.x, e.y) for e in state["enemies"]])
+        # round up so that a handful of tables cover every grid
+        size = 32 * (size // 32 + 1)
+        extractor = get_extractor(size, size)
+    return extractor(state)
@@ -0,0 +1,95 @@
+"""Cold-start benchmark of a rollout worker.
+
+Each sample runs in a fresh interpreter and measures the time to import
+`envs`, then the time to build a TankEnv, reset it and take a first step.
+It also checks that no rendering module is loaded along the way.
+
+Usage:
+    python benchmarks/cold_start.py --repeats 10
+    python benchmarks/cold_start.py --max-import-ms 300 --max-first-step-ms 50
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that a headless worker must not load
+RENDERING_MODULES = ("matplotlib", "pygame", "utils.renderer", "utils.coloring")
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import envs
+t1 = time.perf_counter()
+env = envs.TankEnv(obstacles={obstacles!r})
+env.reset(seed=0)
+env.step(4)
+t2 = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (t1 - t0) * 1000,
+    "first_step_ms": (t2 - t1) * 1000,
+    "loaded": [m for m in {modules!r} if m in sys.modules],
+}}))
+"""
+
+
+def sample(obstacles: str) -> dict:
+    code = CHILD.format(obstacles=obstacles, modules=RENDERING_MODULES)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--obstacles", default="", choices=["", "low", "high"])
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-first-step-ms", type=float, default=None)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    samples = [sample(args.obstacles) for _ in range(args.repeats)]
+    import_ms = np.array([s["import_ms"] for s in samples])
+    first_step_ms = np.array([s["first_step_ms"] for s in samples])
+    loaded = sorted({m for s in samples for m in s["loaded"]})
+
+    results = {
+        "repeats": args.repeats,
+        "import_ms": {"p50": np.median(import_ms), "max": import_ms.max()},
+        "first_step_ms": {"p50": np.median(first_step_ms), "max": first_step_ms.max()},
+        "rendering_modules_loaded": loaded,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"import envs:        p50 {np.median(import_ms):7.1f} ms")
+        print(f"time to first step: p50 {np.median(first_step_ms):7.1f} ms")
+        print(f"rendering modules loaded: {loaded or 'none'}")
+
+    failed = bool(loaded)
+    if args.max_import_ms is not None and np.median(import_ms) > args.max_import_ms:
+        failed = True
+    if (
+        args.max_first_step_ms is not None
+        and np.median(first_step_ms) > args.max_first_step_ms
+    ):
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Throughput benchmark suite of the simulator.
+
+Sweeps grid size, enemies on screen, obstacle density and game mode, and
+measures TankEnv.reset, step and render, grab_distance_and_kronecker and
+QTable updates: operations per second, p50/p99 latency and peak memory.
+Results are written as JSON, and can be compared against a saved baseline
+to gate changes on throughput regressions.
+
+Usage:
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --quick --baseline baseline.json --tolerance 0.15
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agents.Q_table_agent import QTable, grab_distance_and_kronecker
+from envs import TankEnv
+
+
+def summarize(latencies_ns: list) -> dict:
+    """Operations per second and latency percentiles in microseconds."""
+    latencies = np.array(latencies_ns, dtype=np.float64) / 1e3
+    return {
+        "per_s": 1e6 / latencies.mean(),
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p99_us": float(np.percentile(latencies, 99)),
+    }
+
+
+def make_env(config: dict) -> TankEnv:
+    return TankEnv(
+        max_x=config["size"],
+        max_y=config["size"],
+        max_enemies_on_screen=config["enemies"],
+        total_ennemies_to_kill=max(10, config["enemies"]),
+        obstacles=config["obstacles"],
+        mode=config["mode"],
+    )
+
+
+# __________BENCHMARKS__________#
+
+
+def bench_reset(env: TankEnv, repeats: int) -> dict:
+    latencies = []
+    for i in range(repeats):
+        t0 = time.perf_counter_ns()
+        env.reset(seed=i)
+        latencies.append(time.perf_counter_ns() - t0)
+    return summarize(latencies)
+
+
+def bench_step(env: TankEnv, steps: int, seed: int = 0) -> tuple[dict, list]:
+    """Steps with random actions, resetting finished games. Also returns a
+    sample of the visited states for the feature benchmark."""
+    actions = np.random.default_rng(seed).integers(0, 6, steps).tolist()
+    env.reset(seed=seed)
+    latencies = []
+    samples = []
+    for i, action in enumerate(actions):
+        t0 = time.perf_counter_ns()
+        _, _, done, _, _ = env.step(action)
+        latencies.append(time.perf_counter_ns() - t0)
+        if i % 10 == 0:
+            samples.append(snapshot_state(env.state))
+        if done:
+            env.reset()
+    return summarize(latencies), samples
+
+
+def snapshot_state(state: dict) -> dict:
+    return {
+        "player": state["player"].copy(),
+        "enemies": [enemy.copy() for enemy in state["enemies"]],
+    }
+
+
+def bench_render(env: TankEnv, frames: int) -> dict:
+    env.reset(seed=0)
+    env.render()  # builds the renderer
+    rng = np.random.default_rng(0)
+    latencies = []
+    for _ in range(frames):
+        env.step(int(rng.integers(6)))
+        t0 = time.perf_counter_ns()
+        env.render()
+        latencies.append(time.perf_counter_ns() - t0)
+    return summarize(latencies)
+
+
+def bench_features(samples: list, repeats: int = 5) -> dict:
+    grab_distance_and_kronecker(samples[0])  # builds the lookup table
+    latencies = []
+    for _ in range(repeats):
+        for state in samples:
+            t0 = time.perf_counter_ns()
+            grab_distance_and_kronecker(state)
+            latencies.append(time.perf_counter_ns() - t0)
+    return summarize(latencies)
+
+
+def bench_peak_memory(config: dict, steps: int) -> float:
+    """Peak memory in KiB traced while building, resetting, stepping and
+    rendering an environment."""
+    tracemalloc.start()
+    env = make_env(config)
+    env.reset(seed=0)
+    rng = np.random.default_rng(0)
+    for _ in range(steps):
+        _, _, done, _, _ = env.step(int(rng.integers(6)))
+        if done:
+            env.reset()
+    env.render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**10
+
+
+def bench_q_table(updates: int, batch_size: int) -> dict:
+    rng = np.random.default_rng(0)
+    agent = QTable(41, 6)
+    distances = rng.integers(0, 41, updates)
+    orientations = rng.integers(0, 2, updates)
+    actions = rng.integers(0, 6, updates)
+    rewards = rng.normal(size=updates)
+
+    latencies = []
+    for i in range(updates):
+        t0 = time.perf_counter_ns()
+        agent.update_q_value(
+            distances[i],
+            orientations[i],
+            actions[i],
+            0.1,
+            rewards[i],
+            0.99,
+            distances[i],
+            orientations[i],
+        )
+        latencies.append(time.perf_counter_ns() - t0)
+    results = {"update": summarize(latencies)}
+
+    # batched, reported per transition
+    latencies = []
+    for start in range(0, updates - batch_size + 1, batch_size):
+        batch = slice(start, start + batch_size)
+        t0 = time.perf_counter_ns()
+        agent.update_q_values(
+            distances[batch],
+            orientations[batch],
+            actions[batch],
+            0.1,
+            rewards[batch],
+            0.99,
+            distances[batch],
+            orientations[batch],
+        )
+        latencies.append((time.perf_counter_ns() - t0) / batch_size)
+    results["update_batched"] = summarize(latencies)
+    return results
+
+
+# __________SUITE__________#
+
+
+def config_name(config: dict) -> str:
+    obstacles = config["obstacles"] or "none"
+    return f"{config['mode']}/{config['size']}x{config['size']}/e{config['enemies']}/{obstacles}"
+
+
+def run_config(config: dict, args) -> dict:
+    try:
+        env = make_env(config)
+        step, samples = bench_step(env, args.steps)
+        return {
+            "reset": bench_reset(env, args.resets),
+            "step": step,
+            "render": bench_render(env, args.frames),
+            "features": bench_features(samples),
+            "peak_memory_kib": bench_peak_memory(config, args.steps // 10),
+        }
+    except Exception as error:
+        # e.g. a mode that is not playable yet
+        return {"error": f"{type(error).__name__}: {error}"}
+
+
+def run_suite(args) -> dict:
+    configs = [
+        {"size": size, "enemies": enemies, "obstacles": obstacles, "mode": mode}
+        for mode, size, enemies, obstacles in itertools.product(
+            args.modes, args.sizes, args.enemies, args.obstacles
+        )
+    ]
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "steps": args.steps,
+        },
+        "configs": {},
+        "q_table": bench_q_table(args.updates, args.batch_size),
+    }
+    for config in configs:
+        name = config_name(config)
+        results["configs"][name] = dict(config, **run_config(config, args))
+        print(f"{name:28s} {describe(results['configs'][name])}", file=sys.stderr)
+    return results
+
+
+def describe(result: dict) -> str:
+    if "error" in result:
+        return "error: " + result["error"]
+    return (
+        f"step {result['step']['per_s']:9.0f}/s "
+        f"(p99 {result['step']['p99_us']:6.1f} us)  "
+        f"reset {result['reset']['per_s']:7.0f}/s  "
+        f"render {result['render']['per_s']:7.0f}/s  "
+        f"features {result['features']['per_s']:8.0f}/s  "
+        f"peak {result['peak_memory_kib']:6.0f} KiB"
+    )
+
+
+def throughputs(results: dict) -> dict:
+    """Flattens every operations-per-second figure, keyed by a path."""
+    flat = {}
+    for name, result in results["configs"].items():
+        for bench in ("reset", "step", "render", "features"):
+            if bench in result:
+                flat[f"{name}:{bench}"] = result[bench]["per_s"]
+    for bench, result in results["q_table"].items():
+        flat[f"q_table:{bench}"] = result["per_s"]
+    return flat
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Lists the throughputs that dropped by more than `tolerance` (a
+    fraction) below the baseline, as (key, before, after, ratio). A
+    throughput of the baseline missing from the results, e.g. because its
+    config now raises, is a regression with `after` and `ratio` None."""
+    current = throughputs(results)
+    regressions = []
+    for key, before in throughputs(baseline).items():
+        if key not in current:
+            regressions.append((key, before, None, None))
+            continue
+        ratio = current[key] / before
+        if ratio < 1 - tolerance:
+            regressions.append((key, before, current[key], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=None)
+    parser.add_argument("--enemies", type=int, nargs="+", default=[5, 10])
+    parser.add_argument(
+        "--obstacles",
+        nargs="+",
+        default=["", "low", "high"],
+        choices=["", "low", "high"],
+    )
+    # "2p" is opt-in: TankEnv has no second player yet, so it raises at the
+    # first step (see envs.MultiTankEnv for games of several tanks)
+    parser.add_argument("--modes", nargs="+", default=None, choices=["1p", "2p"])
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--resets", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="fewer steps, and 20x20 1p maps unless --sizes/--modes are given",
+    )
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare to")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="allowed throughput drop against the baseline, as a fraction",
+    )
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes = args.sizes or [20]
+        args.modes = args.modes or ["1p"]
+        args.steps = 2000
+        args.resets = 100
+        args.frames = 200
+    args.sizes = args.sizes or [20, 40]
+    args.modes = args.modes or ["1p"]
+
+    results = run_suite(args)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline is None:
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, args.tolerance)
+    for key, before, after, ratio in regressions:
+        if after is None:
+            config = results["configs"].get(key.split(":")[0], {})
+            reason = config.get("error", "not measured")
+            print(f"REGRESSION {key}: {before:.0f}/s -> {reason}", file=sys.stderr)
+            continue
+        print(
+            f"REGRESSION {key}: {before:.0f}/s -> {after:.0f}/s ({ratio - 1:+.0%})",
+            file=sys.stderr,
+        )
+    print(
+        f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}",
+        file=sys.stderr,
+    )
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,11 @@
+import logging
+
 from .tank_env import TankEnv
-from .game_elements import Tank, Projectile
\ No newline at end of file
+from .game_elements import Tank, Projectile
+from .vector_tank_env import VectorTankEnv
+from .subproc_vector_env import SubprocVectorEnv
+from .multi_tank_env import MultiTankEnv
+
+# Logging is opt-in: nothing is emitted unless the application configures a
+# handler, e.g. logging.basicConfig(level=logging.DEBUG)
+logging.getLogger(__name__).addHandler(logging.NullHandler())
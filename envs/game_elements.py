@@ -1,19 +1,77 @@
 import numpy as np
 
+# Used by tanks updated without the generator of an environment
+_default_rng = np.random.default_rng()
+
+# Moves of each direction (0 = up, 1 = right, 2 = down, 3 = left)
+DX = (0, 1, 0, -1)
+DY = (-1, 0, 1, 0)
+
+
+def to_direction(direction) -> int:
+    """Direction index of an int or of a one-hot vector (older form)."""
+    if isinstance(direction, (int, np.integer)):
+        return int(direction)
+    return int(np.argmax(direction))
+
+
+def one_hot(direction: int) -> np.ndarray:
+    vector = np.zeros(4, dtype=int)
+    vector[direction] = 1
+    return vector
+
+
+class OrderedSet(dict):
+    """Set of game elements iterated in insertion order.
+
+    A plain set of objects iterates in memory order, which changes from a run
+    to another and after a snapshot is restored, and so would the order in
+    which enemies draw their random moves.
+    """
+
+    def __init__(self, items=()):
+        super().__init__((item, None) for item in items)
+
+    def add(self, item) -> None:
+        self[item] = None
+
+    def remove(self, item) -> None:
+        del self[item]
+
+    def discard(self, item) -> None:
+        self.pop(item, None)
+
 
 class Tank:
-    def __init__(self, x: int, y: int, direction: np.ndarray, label: int = 1):
-        # defined by the center (a tank = 3x3 in display)
-        # Direction: 0 = up, 1 = right, 2 = down, 3 = left
-        # label: 0 = player, 1 = enemy
+    """A 3x3 tank, defined by its center.
+
+    Args:
+        x (int), y (int): Center of the tank.
+        direction (int): 0 = up, 1 = right, 2 = down, 3 = left. A one-hot
+            vector is also accepted.
+        label (int): 0 = player, 1 = enemy.
+    """
+
+    __slots__ = ("x", "y", "direction", "label", "score", "kills", "deaths")
+
+    def __init__(self, x: int, y: int, direction: int, label: int = 1):
         self.x = x
         self.y = y
-        self.direction = direction
+        self.direction = to_direction(direction)
         self.label = label
         self.score = 0
         self.kills = 0
         self.deaths = 0
 
+    @property
+    def one_hot(self) -> np.ndarray:
+        """Direction as a one-hot vector, the form it used to be stored in."""
+        return one_hot(self.direction)
+
+    @one_hot.setter
+    def one_hot(self, vector) -> None:
+        self.direction = to_direction(vector)
+
     def bounding_box(self):
         return [(self.x + i, self.y + j) for i in range(-1, 2) for j in range(-1, 2)]
 
@@ -21,50 +79,58 @@ class Tank:
         return [(self.x + i, self.y + j) for i in range(-2, 3) for j in range(-2, 3)]
 
     def info(self):
-        return (self.x, self.y, np.argmax(self.direction), self.label)
+        return (self.x, self.y, self.direction, self.label)
 
     def copy(self):
-        direction_copy = np.copy(self.direction)
-        return Tank(self.x, self.y, direction_copy, self.label)
+        tank = Tank(self.x, self.y, self.direction, self.label)
+        tank.score = self.score
+        tank.kills = self.kills
+        tank.deaths = self.deaths
+        return tank
 
-    def update(self, action, state, occupied_positions, boundaries):
+    def update(self, action, state, occupancy, boundaries):
         # action: 0: up, 1: right, 2: down, 3: left, 4: stay, 5: shoot
+        # occupancy: OccupancyGrid of the centers of tanks and obstacles
 
-        if not (action == 4 or action == 5):
+        if action < 4:
             # if it matches, move forward
-            if self.direction[action] == 1:
-                occupied_positions.remove((self.x, self.y))
-                x = self.x + self.direction[1] - self.direction[3]  # right - left
-                y = self.y + self.direction[2] - self.direction[0]  # down - up
+            if action == self.direction:
+                x = self.x + DX[action]
+                y = self.y + DY[action]
                 if (
                     x < 0
                     or x >= boundaries["max_x"]
                     or y < 0
                     or y >= boundaries["max_y"]
                 ):
-                    occupied_positions.add((self.x, self.y))
-                    return occupied_positions
+                    return occupancy
                 # check collision with other tanks
-                # check if the 9 squares are arround the tank are occupied
-                boxes = [(x + i, y + j) for i in range(-2, 3) for j in range(-2, 3)]
-                if any(box in occupied_positions for box in boxes):
-                    occupied_positions.add((self.x, self.y))
-                    return occupied_positions
+                # check if the 5x5 window around the new center is free
+                if not occupancy.can_move(self.x, self.y, x, y):
+                    return occupancy
+                occupancy.move(self.x, self.y, x, y)
                 self.x = x
                 self.y = y
-                occupied_positions.add((self.x, self.y))
 
             # if it doesn't, rotate
             else:
-                self.direction = [0, 0, 0, 0]
-                self.direction[action] = 1
+                self.direction = action
 
-        if action == 5:
+        elif action == 5:
             self.shoot(state)
 
-        return occupied_positions
-
-    def update_strategic(self, state, occupied_positions, boundaries, strategy=0):
+        return occupancy
+
+    def update_strategic(
+        self,
+        state,
+        occupancy,
+        boundaries,
+        strategy=0,
+        rng=None,
+        draws=None,
+        navigation=None,
+    ):
         """
         Three strategies available:
         - 0 : completely random
@@ -74,37 +140,29 @@ class Tank:
         They are defined hierarchically, meaning default behavior of 2 is 1 and deault behavior of 1 is 0.
 
         In other words:
-        for strategy 2, the tank goes towards the player with probability 0.7,
-        follow its current direction with probability 0.3 * 0.7 = 0.21,
-        and choose a random move with probability 0.09.
+        for strategy 2, the tank goes towards the player with probability 0.1,
+        follow its current direction with probability 0.9 * 0.7 = 0.63,
+        and choose a random move with probability 0.27.
 
         Probability for the mechanics can be customized.
+
+        Randomness comes from `draws`, three uniform numbers in [0, 1) drawn
+        beforehand (the environment draws them for all its enemies at once),
+        or else from `rng` (a np.random.Generator), or from a generator shared
+        by all tanks if both are None.
+
+        With a NavigationField, strategy 2 goes to the player along a shortest
+        path around the obstacles instead of straight at it.
         """
-        if strategy == 0:
-            # random strategy
-            action = np.random.randint(0, 6)  # TODO: change 5 to 6 after
-            occupied_positions = self.update(
-                action, state, occupied_positions, boundaries
-            )
-
-        if strategy == 1:
-            # follow more its direction with a probability of prob
-            prob = 0.7
-            if np.random.rand() < prob:
-                action = np.argmax(self.direction)
-                occupied_positions = self.update(
-                    action, state, occupied_positions, boundaries
-                )
-            else:
-                return self.update_strategic(
-                    state, occupied_positions, boundaries, strategy=0
-                )
-
-        if strategy == 2:
-            # go to the player with a probability of prob
-            prob = 0.1
-            if np.random.rand() < prob:
-                # go to the player
+        if draws is None:
+            draws = (_default_rng if rng is None else rng).random(3).tolist()
+        to_player, follow, random_action = draws
+
+        if strategy == 2 and to_player < 0.1:
+            # go to the player with a probability of 0.1
+            action = -1 if navigation is None else navigation.move(self.x, self.y)
+            if action < 0:
+                # straight at the player, along x then y
                 if self.x < state["player"].x:
                     action = 1
                 elif self.x > state["player"].x:
@@ -115,42 +173,52 @@ class Tank:
                     action = 0
                 else:
                     action = 4
-                occupied_positions = self.update(
-                    action, state, occupied_positions, boundaries
-                )
-            else:
-                return self.update_strategic(
-                    state, occupied_positions, boundaries, strategy=1
-                )
-
-        return occupied_positions
+        elif strategy >= 1 and follow < 0.7:
+            # follow more its direction with a probability of 0.7
+            action = self.direction
+        else:
+            # random strategy
+            action = int(random_action * 6)  # TODO: change 5 to 6 after
+        return self.update(action, state, occupancy, boundaries)
 
     def shoot(self, state):
         # create a new projectile
         # to be called after the updating of the projectiles
+        direction = self.direction
         p = Projectile(
-            self.x + 2 * (self.direction[1] - self.direction[3]),
-            self.y + 2 * (self.direction[2] - self.direction[0]),
-            self.direction,
+            self.x + 2 * DX[direction],
+            self.y + 2 * DY[direction],
+            direction,
             label=self.label,
+            owner=self,
         )
         state["projectiles"].add(p)
 
 
 class Projectile:
-    def __init__(self, x, y, direction, label):
+    # label: label of the shooter, owner: the shooting Tank (None if unknown,
+    # e.g. after a snapshot is restored)
+    __slots__ = ("x", "y", "direction", "label", "owner")
+
+    def __init__(self, x, y, direction, label, owner=None):
         self.x = x
         self.y = y
-        self.direction = direction
+        self.direction = to_direction(direction)
         self.label = label
+        self.owner = owner
+
+    @property
+    def one_hot(self) -> np.ndarray:
+        """Direction as a one-hot vector, the form it used to be stored in."""
+        return one_hot(self.direction)
 
     def info(self):
-        return (self.x, self.y, np.argmax(self.direction), self.label)
+        return (self.x, self.y, self.direction, self.label)
 
     def update(self, state, boundaries):
         # move
-        self.x += self.direction[1] - self.direction[3]  # right - left
-        self.y += self.direction[2] - self.direction[0]  # down - up
+        self.x += DX[self.direction]
+        self.y += DY[self.direction]
 
         # check if it's out of bondaries
         if (
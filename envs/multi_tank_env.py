@@ -0,0 +1,359 @@
+import logging
+
+import numpy as np
+from gymnasium import spaces
+from gymnasium.utils import seeding
+
+from envs.game_elements import DX, DY, OrderedSet, Tank
+from envs.occupancy import OccupancyGrid
+from envs.observation import TeamObservation
+from envs.projectile_map import ProjectileMap
+
+logger = logging.getLogger(__name__)
+
+
+class MultiTankEnv:
+    """Battle of tanks that are all controlled from outside, with the parallel
+    API of PettingZoo (without depending on it).
+
+    Every agent sends an action at each tick and all of them are resolved at
+    once: hits are found on the board left by the previous tick, then every
+    tank rotates, shoots or moves, then every projectile moves. A move
+    succeeds if the 5x5 clearance of its target is free of the other tanks
+    as they were at the start of the tick, and if no other tank moves to a
+    target closer than that, so the outcome does not depend on the order of
+    the agents. A tank is destroyed by the projectiles of the other teams and
+    leaves the game; the game ends when a single team is left, or is
+    truncated after `max_steps` ticks.
+
+    Collisions are lookups in grids indexed by cell (OccupancyGrid,
+    ProjectileMap, claimed targets), and the observations are windows of one
+    grid written once per tick (TeamObservation), so a tick costs the same
+    per tank with a few tanks or with dozens.
+
+    Observations, per agent: "tank" (x, y, direction, team) and "view", the
+    `view_size` x `view_size` window of TeamObservation centered on the
+    tank. Both are overwritten in place at each tick. Rewards are the ones of
+    TankEnv, with the kill reward going to the shooter.
+
+    Args:
+        num_agents (int): Number of tanks, named "tank_0", "tank_1", ...
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+        obstacles (str): One of {"", "low", "high"} describing obstacle density.
+        teams (list[int] | None): Team of each tank, from 0. Tanks never
+            hurt their own team. Every tank is its own team by default.
+        view_size (int): Side of the observed window, odd.
+        max_steps (int): Ticks before the game is truncated.
+    """
+
+    metadata = {"name": "multi_tank_v0", "render_modes": ["rgb_array"]}
+
+    def __init__(
+        self,
+        num_agents: int = 4,
+        max_x: int = 30,
+        max_y: int = 30,
+        obstacles: str = "",
+        teams: list | None = None,
+        view_size: int = 11,
+        max_steps: int = 1000,
+    ):
+        self.max_x = max_x
+        self.max_y = max_y
+        self.obstacles = obstacles
+        self.teams = list(range(num_agents)) if teams is None else list(teams)
+        self.view_size = view_size
+        self.max_steps = max_steps
+
+        # sanity checks
+        assert num_agents > 1
+        assert len(self.teams) == num_agents
+        assert len(set(self.teams)) > 1, "at least two teams are needed"
+        assert 0 <= min(self.teams) and max(self.teams) < 255
+        assert num_agents * 9 * 2 <= max_x * max_y
+
+        self.possible_agents = [f"tank_{i}" for i in range(num_agents)]
+        self.agents = []
+
+        self.action_spaces = {
+            agent: spaces.Discrete(6) for agent in self.possible_agents
+        }  # 0: up, 1: right, 2: down, 3: left, 4: stay, 5: shoot
+        self.observation_spaces = {
+            agent: spaces.Dict(
+                {
+                    "tank": spaces.Box(
+                        low=np.zeros(4, dtype=np.int32),
+                        high=np.array([max_x, max_y, 4, max(self.teams)]),
+                        dtype=np.int32,
+                    ),  # x, y, direction, team
+                    "view": spaces.Box(
+                        low=0,
+                        high=max(max(self.teams) + 1, 4),
+                        shape=(TeamObservation.CHANNELS, view_size, view_size),
+                        dtype=np.uint8,
+                    ),
+                }
+            )
+            for agent in self.possible_agents
+        }
+
+        # Rewards, as in TankEnv
+        self.reward_enemy_killed = 10
+        self.reward_player_dead = -20
+        self.reward_used_projectile = -0.1
+        self.reward_nothing = -0.01
+        self.timestep = -0.001
+
+        self.occupancy = OccupancyGrid(max_x, max_y)
+        # 3x3 footprints of the obstacles, padded like the occupancy grid
+        self.obstacle_boxes = np.zeros_like(self.occupancy.grid, dtype=bool)
+        self.projectile_map = ProjectileMap()
+        self.encoder = TeamObservation(max_x, max_y, view_size)
+        # x, y, direction, team of each tank, one row per agent
+        self._tank_rows = np.zeros((num_agents, 4), dtype=np.int32)
+        self._rows = {agent: i for i, agent in enumerate(self.possible_agents)}
+
+        self.tanks = {}  # agent -> Tank, for the agents still in the game
+        self.agent_of = {}  # Tank -> agent
+        self.projectiles = OrderedSet()
+        self.state = {"projectiles": self.projectiles}  # for Projectile.update
+        self.obstacle_set = set()
+        self.steps = 0
+        self.np_random, _ = seeding.np_random()
+        self.renderer = None
+
+    @property
+    def num_agents(self) -> int:
+        return len(self.agents)
+
+    @property
+    def max_num_agents(self) -> int:
+        return len(self.possible_agents)
+
+    def observation_space(self, agent: str) -> spaces.Dict:
+        return self.observation_spaces[agent]
+
+    def action_space(self, agent: str) -> spaces.Discrete:
+        return self.action_spaces[agent]
+
+    # __________GAME__________#
+
+    def reset(self, seed: int | None = None, options: dict | None = None):
+        """Places the obstacles and the tanks, returns (observations, infos)."""
+        if seed is not None:
+            self.np_random, _ = seeding.np_random(seed)
+        self.occupancy.clear()
+        self.projectiles.clear()
+        self.steps = 0
+
+        self.tanks = {}
+        self.agent_of = {}
+        for agent, team in zip(self.possible_agents, self.teams):
+            x, y = self.occupancy.sample_free(self.np_random)
+            direction = int(self.np_random.integers(0, 4))
+            tank = Tank(x, y, direction, label=team)
+            self.tanks[agent] = tank
+            self.agent_of[tank] = agent
+            self.occupancy.add(x, y)
+        self.agents = list(self.possible_agents)
+
+        if self.obstacles == "low":
+            nb_obstacles = self.max_x * self.max_y // 80
+        elif self.obstacles == "high":
+            nb_obstacles = self.max_x * self.max_y // 20
+        else:
+            nb_obstacles = 0
+        obstacles = set()
+        if nb_obstacles > 1:
+            for _ in range(nb_obstacles):
+                x, y = self.occupancy.sample_free(self.np_random)
+                obstacles.add((x, y))
+                self.occupancy.add(x, y)
+        self.set_obstacles(obstacles)
+
+        logger.debug("multi-agent environnement reset successfully")
+        return self.observe(self.agents), {agent: {} for agent in self.agents}
+
+    def set_obstacles(self, obstacles: set) -> None:
+        """Sets the obstacles and their cached 3x3 footprints. Does not touch
+        the occupancy grid."""
+        self.obstacle_set = obstacles
+        self.obstacle_boxes[:] = False
+        pad = self.occupancy.pad
+        for x, y in obstacles:
+            self.obstacle_boxes[
+                x + pad - 1 : x + pad + 2, y + pad - 1 : y + pad + 2
+            ] = True
+        self.encoder.encode_obstacles(obstacles)
+
+    def observe(self, agents) -> dict:
+        """Observations of `agents`, from one encoding of the board."""
+        self.encoder.encode(self.tanks.values(), self.projectiles)
+        rows = self._tank_rows
+        observations = {}
+        for agent in agents:
+            row = rows[self._rows[agent]]
+            tank = self.tanks.get(agent)
+            if tank is not None:
+                row[:] = tank.info()
+            # a destroyed tank gets a last look at where it was
+            observations[agent] = {
+                "tank": row,
+                "view": self.encoder.window(int(row[0]), int(row[1])),
+            }
+        return observations
+
+    def _resolve_projectiles(self, rewards: dict) -> list:
+        """Cancels the projectiles of different teams on the same cell, removes
+        those hitting an obstacle and destroys the tanks hit by another team.
+        Returns the destroyed agents."""
+        projectiles = self.projectiles
+        projectile_map = self.projectile_map
+        projectile_map.rebuild(projectiles)
+
+        ## projectiles of different teams on a cell cancel each other: the
+        ## team with the most keeps its surplus over all the others together
+        for here in projectile_map.cells.values():
+            if len(here) < 2:
+                continue
+            by_team = {}
+            for projectile in here:
+                by_team.setdefault(projectile.label, []).append(projectile)
+            if len(by_team) < 2:
+                continue
+            groups = sorted(by_team.values(), key=len, reverse=True)
+            surplus = max(len(groups[0]) - sum(map(len, groups[1:])), 0)
+            cancelled = groups[0][surplus:]
+            for group in groups[1:]:
+                cancelled += group
+            for projectile in cancelled:
+                projectiles.remove(projectile)
+                here.remove(projectile)
+
+        ## projectiles hitting an obstacle are absorbed
+        pad = self.occupancy.pad
+        for projectile in list(projectiles):
+            if self.obstacle_boxes[projectile.x + pad, projectile.y + pad]:
+                projectiles.remove(projectile)
+                projectile_map.discard(projectile)
+
+        ## tanks hit by another team
+        destroyed = []
+        for agent, tank in self.tanks.items():
+            for projectile in projectile_map.in_box(tank.x, tank.y):
+                if projectile.label == tank.label:
+                    continue
+                projectiles.remove(projectile)
+                projectile_map.discard(projectile)
+                tank.deaths += 1
+                rewards[agent] += self.reward_player_dead
+                shooter = self.agent_of.get(projectile.owner)
+                if shooter in rewards:
+                    rewards[shooter] += self.reward_enemy_killed
+                    projectile.owner.kills += 1
+                destroyed.append(agent)
+                break
+        for agent in destroyed:
+            tank = self.tanks.pop(agent)
+            self.occupancy.remove(tank.x, tank.y)
+        return destroyed
+
+    def _move_tanks(self, movers: list) -> None:
+        """Moves the tanks of `movers` (agent, tank, target x, target y) whose
+        target is free and not too close to the target of another mover."""
+        occupancy = self.occupancy
+        claims = {}  # target -> mover
+        candidates = []
+        for agent, tank, x, y in movers:
+            if not (0 <= x < self.max_x and 0 <= y < self.max_y):
+                continue
+            if not occupancy.can_move(tank.x, tank.y, x, y):
+                continue
+            candidates.append((agent, tank, x, y))
+            claims[(x, y)] = claims.get((x, y), 0) + 1
+
+        ## two targets closer than the 5x5 clearance: both moves fail
+        for agent, tank, x, y in candidates:
+            contested = claims[(x, y)] > 1 or any(
+                (x + i, y + j) in claims
+                for i in range(-2, 3)
+                for j in range(-2, 3)
+                if i or j
+            )
+            if not contested:
+                occupancy.move(tank.x, tank.y, x, y)
+                tank.x = x
+                tank.y = y
+
+    def step(self, actions: dict):
+        """Plays one tick.
+
+        Args:
+            actions (dict): agent -> action (0: up, 1: right, 2: down,
+                3: left, 4: stay, 5: shoot), for the agents in `self.agents`.
+                A missing agent stays.
+
+        Returns:
+            (observations, rewards, terminations, truncations, infos), dicts
+            keyed by the agents that were in the game at the start of the
+            tick.
+        """
+        agents = self.agents
+        rewards = {agent: self.timestep for agent in agents}
+
+        destroyed = self._resolve_projectiles(rewards)
+
+        ## tanks still in the game: rotations and shots, then moves
+        movers = []
+        for agent, tank in self.tanks.items():
+            action = actions.get(agent, 4)
+            if action < 4:
+                if action == tank.direction:
+                    movers.append(
+                        (agent, tank, tank.x + DX[action], tank.y + DY[action])
+                    )
+                else:
+                    tank.direction = action
+            elif action == 4:
+                rewards[agent] += self.reward_nothing
+            else:
+                tank.shoot(self.state)
+                rewards[agent] += self.reward_used_projectile
+        self._move_tanks(movers)
+
+        ## projectiles
+        boundaries = {"max_x": self.max_x, "max_y": self.max_y}
+        for projectile in list(self.projectiles):
+            projectile.update(self.state, boundaries)
+
+        self.steps += 1
+        for agent in agents:
+            if agent in self.tanks:
+                self.tanks[agent].score += rewards[agent]
+        over = len({tank.label for tank in self.tanks.values()}) < 2
+        truncated = self.steps >= self.max_steps and not over
+        terminations = {agent: over or agent in destroyed for agent in agents}
+        truncations = dict.fromkeys(agents, truncated)
+        infos = {agent: {} for agent in agents}
+
+        observations = self.observe(agents)
+        self.agents = [] if over or truncated else list(self.tanks)
+        return observations, rewards, terminations, truncations, infos
+
+    # __________RENDERING__________#
+
+    def render(self) -> np.ndarray:
+        """Frame of the game as a (max_y + 2, max_x + 2, 3) RGB array: team 0
+        in the colors of the player, the other teams in those of the enemies."""
+        from utils.renderer import FrameRenderer, PALETTE
+
+        if self.renderer is None:
+            self.renderer = FrameRenderer(self.max_x, self.max_y)
+        codes = self.renderer.draw_elements(
+            self.obstacle_set, self.tanks.values(), self.projectiles
+        )
+        return PALETTE[codes]
+
+    def close(self) -> None:
+        pass
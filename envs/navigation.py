@@ -0,0 +1,125 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from envs.game_elements import DX, DY
+
+
+class NavigationField:
+    """Shortest paths of enemy tanks towards the player, around obstacles.
+
+    A tank center can stand on a cell if no obstacle center lies in the 5x5
+    window around it (3x3 tank next to 3x3 obstacle). For a given player
+    cell, a breadth-first search over those cells gives the distance of every
+    cell to the player, and from it the best first move of every cell. That
+    move table is computed once per player cell and obstacle layout, and
+    kept in an LRU cache: the player keeps coming back to the same cells, so
+    most player moves are a cache hit, and every enemy then reads its move in
+    O(1). Other tanks are ignored, they move anyway.
+
+    Args:
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+        cache_cells (int): Budget of the cache, in cells over all its tables.
+    """
+
+    def __init__(self, max_x: int, max_y: int, cache_cells: int = 1 << 22):
+        self.max_x = max_x
+        self.max_y = max_y
+        self.max_tables = max(1, cache_cells // (max_x * max_y))
+        self.tables = OrderedDict()  # player cell -> bytes, 1 + move per cell
+        self.table = None  # table of the current player cell
+        self._obstacles = None
+        self.set_obstacles(set())
+
+    def set_obstacles(self, obstacles) -> None:
+        """Computes the cells a tank can stand on and clears the cache."""
+        pad = 2
+        blocked = np.zeros((self.max_x + 2 * pad, self.max_y + 2 * pad), dtype=bool)
+        for x, y in obstacles:
+            blocked[x : x + 5, y : y + 5] = True
+        self.free = ~blocked[pad:-pad, pad:-pad]
+
+        # free cells with a border of blocked cells, flattened for the search
+        walkable = np.zeros((self.max_x + 2, self.max_y + 2), dtype=np.uint8)
+        walkable[1:-1, 1:-1] = self.free
+        self._walkable = walkable.tobytes()
+        self._stride = self.max_y + 2
+
+        self.tables.clear()
+        self.table = None
+        self._obstacles = obstacles
+
+    def distances(self, player_x: int, player_y: int) -> np.ndarray:
+        """(max_x, max_y) number of moves to reach the player, -1 where the
+        player cannot be reached."""
+        stride = self._stride
+        walkable = self._walkable
+        # flat ids on the bordered grid, (x + 1) * stride + y + 1
+        start = (player_x + 1) * stride + player_y + 1
+        distance = [-1] * len(walkable)
+        distance[start] = 0
+        queue = [start]
+        offsets = (-1, stride, 1, -stride)
+        for cell in queue:  # the list grows while it is iterated
+            next_distance = distance[cell] + 1
+            for offset in offsets:
+                neighbor = cell + offset
+                if walkable[neighbor] and distance[neighbor] < 0:
+                    distance[neighbor] = next_distance
+                    queue.append(neighbor)
+        distance = np.array(distance, dtype=np.int32).reshape(-1, stride)
+        return distance[1:-1, 1:-1]
+
+    def _moves(self, player_x: int, player_y: int) -> bytes:
+        """Best move of every cell towards the player, plus one (0: none).
+
+        Among the moves along a shortest path, the one of the direct pursuit
+        is preferred: along x first, then along y.
+        """
+        distance = self.distances(player_x, player_y)
+        unreachable = np.iinfo(np.int32).max
+        field = np.full((self.max_x + 2, self.max_y + 2), unreachable, dtype=np.int64)
+        field[1:-1, 1:-1] = np.where(distance >= 0, distance, unreachable)
+        inner = field[1:-1, 1:-1]
+
+        # optimal[d]: moving along d gets one step closer
+        optimal = [
+            field[1 + dx : field.shape[0] - 1 + dx, 1 + dy : field.shape[1] - 1 + dy]
+            == inner - 1
+            for dx, dy in zip(DX, DY)
+        ]
+        x = np.arange(self.max_x)[:, None]
+        y = np.arange(self.max_y)[None, :]
+        toward_x = np.where(x < player_x, 1, 3)
+        toward_y = np.where(y < player_y, 2, 0)
+        x_first = np.choose(toward_x, optimal) & (x != player_x)
+        y_second = np.choose(toward_y, optimal) & (y != player_y)
+        moves = np.select(
+            [x_first, y_second, optimal[1], optimal[3], optimal[2], optimal[0]],
+            [toward_x, toward_y, 1, 3, 2, 0],
+            default=-1,
+        )
+        moves[(distance <= 0)] = -1
+        return (moves + 1).astype(np.uint8).tobytes()
+
+    def update(self, obstacles, player_x: int, player_y: int) -> None:
+        """Selects the move table of the player cell, to be called once per
+        step, after the player moved."""
+        if obstacles is not self._obstacles:
+            self.set_obstacles(obstacles)
+        cell = (player_x, player_y)
+        table = self.tables.get(cell)
+        if table is None:
+            table = self._moves(player_x, player_y)
+            self.tables[cell] = table
+            if len(self.tables) > self.max_tables:
+                self.tables.popitem(last=False)
+        else:
+            self.tables.move_to_end(cell)
+        self.table = table
+
+    def move(self, x: int, y: int) -> int:
+        """Action (0 to 3) bringing a tank at (x, y) closer to the player,
+        -1 if there is none."""
+        return self.table[x * self.max_y + y] - 1
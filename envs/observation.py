@@ -0,0 +1,355 @@
+import numpy as np
+from gymnasium import spaces
+
+
+class ArrayObservation:
+    """Encodes the state of a TankEnv into the arrays of its observation_space.
+
+    The arrays are allocated once and overwritten in place at each step, so
+    the returned dict must be copied by consumers that keep it around.
+    Rows of "enemies" and "projectiles" past the counts given in "count" are
+    zeros. Only the rows used at the previous step are cleared, not the whole
+    `max_x * max_y` projectile block.
+
+    Args:
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+        max_enemies (int): Rows of the "enemies" block, at least the number
+            of enemies the game can have at once (TankEnv.enemy_slots).
+        max_projectiles (int): Rows of the "projectiles" block.
+    """
+
+    def __init__(self, max_x: int, max_y: int, max_enemies: int, max_projectiles: int):
+        dtypes = np.int32
+        self.max_enemies = max_enemies
+        self.max_projectiles = max_projectiles
+        self.buffers = {
+            "player": np.zeros(3, dtype=dtypes),  # x, y, direction
+            "enemies": np.zeros((max_enemies, 3), dtype=dtypes),
+            "projectiles": np.zeros((max_projectiles, 4), dtype=dtypes),
+            "obstacles": np.zeros((max_x, max_y), dtype=dtypes),
+            "count": np.zeros(2, dtype=dtypes),  # number of enemies, projectiles
+        }
+
+    @staticmethod
+    def count_space(max_enemies: int, max_projectiles: int) -> spaces.Box:
+        return spaces.Box(
+            low=np.zeros(2, dtype=np.int32),
+            high=np.array([max_enemies, max_projectiles]),
+            dtype=np.int32,
+        )
+
+    def encode_obstacles(self, obstacles) -> None:
+        """Writes the obstacles, to be called once per reset."""
+        grid = self.buffers["obstacles"]
+        grid[:] = 0
+        for x, y in obstacles:
+            grid[x, y] = 1
+
+    def encode(self, state: dict) -> dict:
+        buffers = self.buffers
+        count = buffers["count"]
+
+        buffers["player"][:] = state["player"].info()[:3]
+
+        ## enemies: x, y, direction
+        enemies = buffers["enemies"]
+        assert len(state["enemies"]) <= self.max_enemies, "more enemies than rows"
+        n = 0
+        for enemy in state["enemies"]:
+            enemies[n] = enemy.info()[:3]
+            n += 1
+        if n < count[0]:
+            enemies[n : count[0]] = 0
+        count[0] = n
+
+        ## projectiles: x, y, direction, from (0: player, 1: enemy)
+        projectiles = buffers["projectiles"]
+        n = 0
+        for projectile in state["projectiles"]:
+            if n == self.max_projectiles:
+                break
+            projectiles[n] = projectile.info()
+            n += 1
+        if n < count[1]:
+            projectiles[n : count[1]] = 0
+        count[1] = n
+
+        return buffers
+
+
+class EgocentricObservation:
+    """Encodes the surroundings of the player as a K x K multi-channel window
+    centered on it, of a fixed size whatever the size of the map.
+
+    The channels live in a padded grid of the whole map, indexed
+    [channel, x + pad, y + pad]. Obstacles and walls (the cells past the
+    border of the rendered frame) are written once per reset; at each step
+    only the cells written at the previous step are cleared and the current
+    tanks and projectiles that fall in the window are written, so the cost of
+    a step does not depend on the map. The window is then a slice of the
+    grid, not a copy: like ArrayObservation, it must be copied by consumers
+    that keep it around.
+
+    Channels (uint8):
+        PLAYER, ENEMIES: 3x3 footprints of the tanks.
+        OBSTACLES: 3x3 footprints of the obstacles, and walls.
+        PLAYER_PROJECTILES, ENEMY_PROJECTILES: cells of the projectiles.
+        DIRECTION: direction + 1 on the tanks and projectiles, 0 elsewhere.
+
+    Args:
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+        view_size (int): Side K of the window, odd.
+    """
+
+    PLAYER = 0
+    ENEMIES = 1
+    OBSTACLES = 2
+    PLAYER_PROJECTILES = 3
+    ENEMY_PROJECTILES = 4
+    DIRECTION = 5
+    CHANNELS = 6
+
+    def __init__(self, max_x: int, max_y: int, view_size: int):
+        assert view_size > 0 and view_size % 2 == 1, "view_size must be odd"
+        self.max_x = max_x
+        self.max_y = max_y
+        self.view_size = view_size
+        # tank footprints and projectiles reach one cell past the board
+        self.pad = view_size // 2 + 1
+        shape = (self.CHANNELS, max_x + 2 * self.pad, max_y + 2 * self.pad)
+        # backed by a bytearray for fast scalar writes, by flat index
+        self._cells = bytearray(shape[0] * shape[1] * shape[2])
+        self.grid = np.frombuffer(self._cells, dtype=np.uint8).reshape(shape)
+        self._plane = shape[1] * shape[2]
+        self._stride = shape[2]
+        self._footprint = tuple(
+            i * self._stride + j for i in range(-1, 2) for j in range(-1, 2)
+        )
+        self._written = []  # flat ids of the cells of the last step
+        self.buffers = {
+            "player": np.zeros(3, dtype=np.int32),  # x, y, direction
+            "view": self.grid[:, :view_size, :view_size],
+        }
+
+    @staticmethod
+    def space(max_x: int, max_y: int, view_size: int) -> spaces.Dict:
+        shape = (EgocentricObservation.CHANNELS, view_size, view_size)
+        return spaces.Dict(
+            {
+                "player": spaces.Box(
+                    low=np.array([0, 0, 0]),
+                    high=np.array([max_x, max_y, 4]),
+                    dtype=np.int32,
+                ),  # x, y, direction
+                "view": spaces.Box(low=0, high=4, shape=shape, dtype=np.uint8),
+            }
+        )
+
+    def encode_obstacles(self, obstacles) -> None:
+        """Writes the obstacles and the walls, to be called once per reset."""
+        pad = self.pad
+        channel = self.grid[self.OBSTACLES]
+        channel[:] = 1
+        # the rendered frame: the board and one cell around it
+        channel[pad - 1 : pad + self.max_x + 1, pad - 1 : pad + self.max_y + 1] = 0
+        for x, y in obstacles:
+            channel[x + pad - 1 : x + pad + 2, y + pad - 1 : y + pad + 2] = 1
+
+    def window(self, x: int, y: int) -> np.ndarray:
+        """(CHANNELS, K, K) view of the grid centered on the cell (x, y)."""
+        x += self.pad - self.view_size // 2
+        y += self.pad - self.view_size // 2
+        return self.grid[:, x : x + self.view_size, y : y + self.view_size]
+
+    def encode(self, state: dict) -> dict:
+        pad = self.pad
+        stride = self._stride
+        plane = self._plane
+        cells = self._cells
+        for cell in self._written:
+            cells[cell] = 0
+        written = []
+
+        # only what falls in the window is written
+        player = state["player"]
+        px, py = player.x, player.y
+        reach = self.view_size // 2
+
+        ## tanks: footprint and direction
+        direction = self.DIRECTION * plane
+        for tank in (player, *state["enemies"]):
+            channel = (self.PLAYER if tank is player else self.ENEMIES) * plane
+            if abs(tank.x - px) > reach + 1 or abs(tank.y - py) > reach + 1:
+                continue
+            center = (tank.x + pad) * stride + tank.y + pad
+            value = tank.direction + 1
+            for offset in self._footprint:
+                cell = center + offset
+                cells[channel + cell] = 1
+                cells[direction + cell] = value
+                written.append(channel + cell)
+                written.append(direction + cell)
+
+        ## projectiles: cell and direction
+        for projectile in state["projectiles"]:
+            if abs(projectile.x - px) > reach or abs(projectile.y - py) > reach:
+                continue
+            cell = (projectile.x + pad) * stride + projectile.y + pad
+            # from (0: player, 1: enemy)
+            channel = (self.PLAYER_PROJECTILES + projectile.label) * plane
+            cells[channel + cell] = 1
+            cells[direction + cell] = projectile.direction + 1
+            written.append(channel + cell)
+            written.append(direction + cell)
+        self._written = written
+
+        self.buffers["player"][:] = (px, py, player.direction)
+        self.buffers["view"] = self.window(px, py)
+        return self.buffers
+
+
+class TeamObservation(EgocentricObservation):
+    """Windows of a MultiTankEnv. The grid is written once per step for all
+    the tanks, and each agent observes a window of it centered on its tank:
+    the cost of a step grows with the number of entities, not with the
+    number of agents times the entities.
+
+    Tanks and projectiles are coded by team instead of as player and
+    enemies, so that the grid is the same for every agent.
+
+    Channels (uint8):
+        TANKS: team + 1 on the 3x3 footprints of the tanks.
+        OBSTACLES: 3x3 footprints of the obstacles, and walls.
+        PROJECTILES: team + 1 of the shooter on the cells of the projectiles.
+        DIRECTION: direction + 1 on the tanks and projectiles, 0 elsewhere.
+    """
+
+    TANKS = 0
+    OBSTACLES = 1
+    PROJECTILES = 2
+    DIRECTION = 3
+    CHANNELS = 4
+
+    def encode(self, tanks, projectiles) -> None:
+        """Writes the tanks (labelled by team) and the projectiles."""
+        pad = self.pad
+        stride = self._stride
+        plane = self._plane
+        cells = self._cells
+        for cell in self._written:
+            cells[cell] = 0
+        written = []
+
+        channel = self.TANKS * plane
+        direction = self.DIRECTION * plane
+        for tank in tanks:
+            center = (tank.x + pad) * stride + tank.y + pad
+            team = tank.label + 1
+            value = tank.direction + 1
+            for offset in self._footprint:
+                cell = center + offset
+                cells[channel + cell] = team
+                cells[direction + cell] = value
+                written.append(channel + cell)
+                written.append(direction + cell)
+
+        channel = self.PROJECTILES * plane
+        for projectile in projectiles:
+            cell = (projectile.x + pad) * stride + projectile.y + pad
+            cells[channel + cell] = projectile.label + 1
+            cells[direction + cell] = projectile.direction + 1
+            written.append(channel + cell)
+            written.append(direction + cell)
+        self._written = written
+
+
+class PixelObservation:
+    """Renders the frames of a TankEnv into a preallocated ring buffer and
+    observes the last `frame_stack` of them, oldest first.
+
+    Each frame is written twice, at slots t % K and t % K + K of a buffer of
+    2K frames, so the last K frames always are K consecutive slots and the
+    stack is a slice of the buffer: stacking copies nothing and a step
+    allocates no frame. The first frame of an episode fills the whole stack.
+    Like ArrayObservation, the returned arrays are overwritten in place.
+
+    Args:
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+        frame_stack (int): Number K of stacked frames.
+        pixels (str): "rgb" for the (max_y + 2, max_x + 2, 3) frames of
+            TankEnv.render, "gray" for their luminance, "palette" for the
+            palette indices of utils.renderer, on a single channel.
+    """
+
+    def __init__(self, max_x: int, max_y: int, frame_stack: int, pixels: str):
+        # imported here, utils.renderer imports the envs package
+        from utils.renderer import FrameRenderer, PALETTE
+
+        assert frame_stack > 0
+        assert pixels in ("rgb", "gray", "palette")
+        self.frame_stack = frame_stack
+        self.pixels = pixels
+        self.renderer = FrameRenderer(max_x, max_y)
+        if pixels == "rgb":
+            self.colors = PALETTE
+        elif pixels == "gray":
+            self.colors = gray_palette(PALETTE)
+        else:
+            self.colors = None
+
+        shape = PixelObservation.frame_shape(max_x, max_y, pixels)
+        self.frames = np.zeros((2 * frame_stack, *shape), dtype=np.uint8)
+        self.last = -1  # slot t % K of the last frame, -1 before the first one
+        self.buffers = {"pixels": self.frames[frame_stack:]}
+
+    @staticmethod
+    def frame_shape(max_x: int, max_y: int, pixels: str) -> tuple:
+        # padding of 1 on each side, as rendered
+        if pixels == "rgb":
+            return (max_y + 2, max_x + 2, 3)
+        return (max_y + 2, max_x + 2)
+
+    @staticmethod
+    def space(max_x: int, max_y: int, frame_stack: int, pixels: str) -> spaces.Dict:
+        from utils.renderer import PALETTE
+
+        shape = (frame_stack, *PixelObservation.frame_shape(max_x, max_y, pixels))
+        high = len(PALETTE) - 1 if pixels == "palette" else 255
+        return spaces.Dict(
+            {"pixels": spaces.Box(low=0, high=high, shape=shape, dtype=np.uint8)}
+        )
+
+    def reset(self) -> None:
+        """Starts a new stack, to be called when a new episode begins."""
+        self.last = -1
+
+    def encode_obstacles(self, obstacles) -> None:
+        self.renderer.set_obstacles(obstacles)
+
+    def encode(self, state: dict) -> dict:
+        k = self.frame_stack
+        codes = self.renderer.draw(state)
+        slot = (self.last + 1) % k
+        frame = self.frames[slot + k]
+        if self.colors is None:
+            np.copyto(frame, codes)
+        else:
+            # mode="clip" lets take write straight into `out`
+            np.take(self.colors, codes, axis=0, out=frame, mode="clip")
+
+        if self.last < 0:
+            self.frames[:] = frame
+        else:
+            self.frames[slot] = frame
+        self.last = slot
+        self.buffers["pixels"] = self.frames[slot + 1 : slot + 1 + k]
+        return self.buffers
+
+
+def gray_palette(palette: np.ndarray) -> np.ndarray:
+    """Luminance (ITU-R BT.601) of the colors of an RGB palette."""
+    weights = np.array([0.299, 0.587, 0.114])
+    return np.rint(palette @ weights).astype(np.uint8)
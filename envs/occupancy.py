@@ -0,0 +1,164 @@
+import numpy as np
+
+
+class PlacementError(RuntimeError):
+    """Raised when no cell of the board can receive a new tank or obstacle."""
+
+
+class OccupancyGrid:
+    """Dense grid of the centers of tanks and obstacles.
+
+    Along with the centers, the grid keeps for every cell the number of
+    centers in its 5x5 window, updated incrementally, so checking a move or a
+    placement is a single lookup. It also keeps an index of the free cells
+    (cells of the board whose window is empty), so a placement is one uniform
+    draw. The index is maintained through placements and removals; a move
+    marks it stale and it is rebuilt in one vectorized pass at the next draw,
+    which keeps moves, by far the most frequent update, cheap.
+
+    The arrays are padded by 2 cells on each side, so the 5x5 window around
+    any cell of the board is a plain slice.
+
+    Args:
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+    """
+
+    pad = 2
+
+    def __init__(self, max_x: int, max_y: int):
+        self.max_x = max_x
+        self.max_y = max_y
+        shape = (max_x + 2 * self.pad, max_y + 2 * self.pad)
+        # number of centers on each cell, indexed [x + pad, y + pad]
+        self.grid = np.zeros(shape, dtype=np.uint8)
+        # number of centers in the 5x5 window around each cell, backed by a
+        # bytearray for fast scalar updates (at most 25 centers per window)
+        self._blocked = bytearray(shape[0] * shape[1])
+        self.blocked = np.frombuffer(self._blocked, dtype=np.uint8).reshape(shape)
+        self._stride = shape[1]
+
+        # free cells of the board, as flat ids x * max_y + y:
+        # free_cells[:n_free] lists them, free_slot gives the position of a
+        # cell in that list (-1 if the cell is not free)
+        self.free_cells = np.arange(max_x * max_y, dtype=np.int32)
+        self.free_slot = np.arange(max_x * max_y, dtype=np.int32)
+        self.n_free = max_x * max_y
+        self.index_stale = False
+
+    def clear(self) -> None:
+        self.grid[:] = 0
+        self.blocked[:] = 0
+        self.free_cells[:] = np.arange(self.max_x * self.max_y)
+        self.free_slot[:] = self.free_cells
+        self.n_free = self.max_x * self.max_y
+        self.index_stale = False
+
+    # __________FREE CELL INDEX__________#
+
+    def rebuild_index(self) -> None:
+        board = self.blocked[self.pad : -self.pad, self.pad : -self.pad]
+        free = np.flatnonzero(board.ravel() == 0)
+        self.n_free = free.size
+        self.free_cells[: free.size] = free
+        self.free_slot[:] = -1
+        self.free_slot[free] = np.arange(free.size)
+        self.index_stale = False
+
+    def _update_index(self, x: int, y: int, was_free, is_free) -> None:
+        """Updates the index for a window whose top-left cell of the board is
+        (x, y), given its free masks before and after a change."""
+        if self.index_stale:
+            return
+        for i, j in zip(*np.nonzero(was_free != is_free)):
+            cx = x + int(i)
+            cy = y + int(j)
+            if not (0 <= cx < self.max_x and 0 <= cy < self.max_y):
+                continue
+            cell = cx * self.max_y + cy
+            if is_free[i, j]:
+                self.free_cells[self.n_free] = cell
+                self.free_slot[cell] = self.n_free
+                self.n_free += 1
+            else:
+                # swap with the last free cell
+                slot = self.free_slot[cell]
+                self.n_free -= 1
+                last = self.free_cells[self.n_free]
+                self.free_cells[slot] = last
+                self.free_slot[last] = slot
+                self.free_slot[cell] = -1
+
+    def sample_free(self, rng: np.random.Generator) -> tuple[int, int]:
+        """Draws a free cell uniformly.
+
+        Raises:
+            PlacementError: if no cell of the board is free.
+        """
+        if self.index_stale:
+            self.rebuild_index()
+        if self.n_free == 0:
+            raise PlacementError("no free cell left on the board")
+        cell = int(self.free_cells[rng.integers(self.n_free)])
+        return divmod(cell, self.max_y)
+
+    # __________CENTERS__________#
+
+    def add(self, x: int, y: int) -> None:
+        self.grid[x + self.pad, y + self.pad] += 1
+        window = self.blocked[x : x + 5, y : y + 5]
+        was_free = window == 0
+        window += 1
+        self._update_index(x - 2, y - 2, was_free, window == 0)
+
+    def remove(self, x: int, y: int) -> None:
+        self.grid[x + self.pad, y + self.pad] -= 1
+        window = self.blocked[x : x + 5, y : y + 5]
+        was_free = window == 0
+        window -= 1
+        self._update_index(x - 2, y - 2, was_free, window == 0)
+
+    def move(self, x: int, y: int, new_x: int, new_y: int) -> None:
+        dx = new_x - x
+        dy = new_y - y
+        self.grid[x + self.pad, y + self.pad] -= 1
+        self.grid[new_x + self.pad, new_y + self.pad] += 1
+        self.index_stale = True
+        if abs(dx) + abs(dy) != 1:
+            self.blocked[x : x + 5, y : y + 5] -= 1
+            self.blocked[new_x : new_x + 5, new_y : new_y + 5] += 1
+            return
+
+        # the window slides by one cell: only its trailing row loses the
+        # center and only its leading row gains it
+        blocked = self._blocked
+        stride = self._stride
+        if dx:
+            # columns x - 2 * dx and new_x + 2 * dx, rows y - 2 to y + 2
+            trailing = (x - 2 * dx + self.pad) * stride + y
+            leading = (new_x + 2 * dx + self.pad) * stride + y
+            step = 1
+        else:
+            # rows y - 2 * dy and new_y + 2 * dy, columns x - 2 to x + 2
+            trailing = x * stride + y - 2 * dy + self.pad
+            leading = x * stride + new_y + 2 * dy + self.pad
+            step = stride
+        for k in range(5):
+            blocked[trailing + k * step] -= 1
+            blocked[leading + k * step] += 1
+
+    def __contains__(self, position: tuple[int, int]) -> bool:
+        x, y = position
+        return self.grid[x + self.pad, y + self.pad] > 0
+
+    def is_free(self, x: int, y: int) -> bool:
+        """True if no center lies in the 5x5 window around (x, y), i.e. a tank
+        centered on (x, y) would not overlap any tank or obstacle."""
+        return self._blocked[(x + self.pad) * self._stride + y + self.pad] == 0
+
+    def can_move(self, x: int, y: int, new_x: int, new_y: int) -> bool:
+        """True if the center at (x, y) can move to (new_x, new_y) without
+        overlapping anything else."""
+        own = abs(new_x - x) <= 2 and abs(new_y - y) <= 2
+        index = (new_x + self.pad) * self._stride + new_y + self.pad
+        return self._blocked[index] == own
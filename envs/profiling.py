@@ -0,0 +1,68 @@
+import time
+
+
+class StepProfiler:
+    """Cumulative time and call count of each phase of TankEnv.step, along
+    with the number of entities on the board at each step.
+
+    `start` is called at the beginning of a step and `lap` at the end of each
+    phase: the time since the previous mark is charged to that phase.
+    """
+
+    PHASES = ("clean", "spawn", "check_death", "player", "enemies", "projectiles")
+    ENTITIES = ("enemies", "projectiles", "obstacles")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.time_ns = dict.fromkeys(self.PHASES, 0)
+        self.calls = dict.fromkeys(self.PHASES, 0)
+        self.steps = 0
+        self.entity_totals = dict.fromkeys(self.ENTITIES, 0)
+        self.entity_max = dict.fromkeys(self.ENTITIES, 0)
+        self._mark = 0
+
+    def start(self) -> None:
+        self._mark = time.perf_counter_ns()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter_ns()
+        self.time_ns[phase] += now - self._mark
+        self.calls[phase] += 1
+        self._mark = now
+
+    def count(self, state: dict) -> dict:
+        """Records the entities of a step, returns their counts."""
+        counts = {
+            "enemies": len(state["enemies"]),
+            "projectiles": len(state["projectiles"]),
+            "obstacles": len(state["obstacles"]),
+        }
+        self.steps += 1
+        for entity, n in counts.items():
+            self.entity_totals[entity] += n
+            self.entity_max[entity] = max(self.entity_max[entity], n)
+        return counts
+
+    def summary(self) -> dict:
+        """Per phase: total time (ms), calls, mean time (us) and share of the
+        step time; per entity: mean and max count per step."""
+        total = sum(self.time_ns.values()) or 1
+        phases = {
+            phase: {
+                "total_ms": self.time_ns[phase] / 1e6,
+                "calls": self.calls[phase],
+                "mean_us": self.time_ns[phase] / 1e3 / max(self.calls[phase], 1),
+                "share": self.time_ns[phase] / total,
+            }
+            for phase in self.PHASES
+        }
+        entities = {
+            entity: {
+                "mean": self.entity_totals[entity] / max(self.steps, 1),
+                "max": self.entity_max[entity],
+            }
+            for entity in self.ENTITIES
+        }
+        return {"steps": self.steps, "phases": phases, "entities": entities}
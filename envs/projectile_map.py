@@ -0,0 +1,37 @@
+class ProjectileMap:
+    """Projectiles indexed by the cell they are on.
+
+    Rebuilt once per step, it turns collision checks into lookups of the
+    cells of a hit box instead of scans of every projectile.
+    """
+
+    def __init__(self):
+        self.cells = {}  # (x, y) -> list of Projectile objects
+
+    def rebuild(self, projectiles) -> None:
+        cells = {}
+        for projectile in projectiles:
+            position = (projectile.x, projectile.y)
+            if position in cells:
+                cells[position].append(projectile)
+            else:
+                cells[position] = [projectile]
+        self.cells = cells
+
+    def at(self, x: int, y: int) -> list:
+        return self.cells.get((x, y), [])
+
+    def discard(self, projectile) -> None:
+        here = self.cells.get((projectile.x, projectile.y))
+        if here is not None and projectile in here:
+            here.remove(projectile)
+
+    def in_box(self, x: int, y: int) -> list:
+        """Projectiles in the 3x3 hit box centered on (x, y)."""
+        found = []
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                here = self.cells.get((x + i, y + j))
+                if here:
+                    found += here
+        return found
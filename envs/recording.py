@@ -0,0 +1,264 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from envs.tank_env import TankEnv
+
+# Record of an episode, appended to the file as a whole:
+#   header, sparse reward steps (uint32), sparse reward values (float32),
+#   keyframe sizes (uint32), config (JSON), actions (two per byte), keyframes,
+#   zero padding to a multiple of 8 bytes.
+# Records start on 8-byte boundaries so their arrays can be read in place
+# from a memory-mapped file.
+_MAGIC = b"TEP1"
+_HEADER = struct.Struct("<4sIQIIIIII")
+_TERMINATED = 1
+_TRUNCATED = 2
+
+# Constructor arguments of TankEnv that define a game
+CONFIG_KEYS = (
+    "max_x",
+    "max_y",
+    "max_enemies_on_screen",
+    "total_ennemies_to_kill",
+    "obstacles",
+    "mode",
+    "pursuit",
+)
+
+
+def env_config(env: TankEnv) -> dict:
+    return {key: getattr(env, key) for key in CONFIG_KEYS}
+
+
+def pack_actions(actions: np.ndarray) -> np.ndarray:
+    """Packs actions (0 to 5) two per byte, low nibble first."""
+    padded = np.zeros(len(actions) + len(actions) % 2, dtype=np.uint8)
+    padded[: len(actions)] = actions
+    return padded[0::2] | (padded[1::2] << 4)
+
+
+def unpack_actions(packed: np.ndarray, n_steps: int) -> np.ndarray:
+    actions = np.empty(2 * len(packed), dtype=np.uint8)
+    actions[0::2] = packed & 0x0F
+    actions[1::2] = packed >> 4
+    return actions[:n_steps]
+
+
+class EpisodeRecorder:
+    """Records the episodes played on a TankEnv into an append-only file.
+
+    An episode is stored as its seed, its config and its actions, packed two
+    per byte. The game being deterministic given its seed, this is enough to
+    rebuild every step; snapshots taken every `keyframe_interval` steps only
+    make seeking faster. With `rewards`, the kill and death rewards, the only
+    ones that do not follow from the actions, are stored sparsely as
+    (step, value) pairs.
+
+    Use it in place of the environment: `reset` starts an episode and `step`
+    records an action. The episode is appended to the file when it ends, at
+    the next `reset` or on `close`.
+
+    Args:
+        env (TankEnv): Environment to record.
+        path (str): File the episodes are appended to.
+        keyframe_interval (int): Steps between keyframes, 0 for none.
+        rewards (bool): Store the kill and death rewards.
+    """
+
+    def __init__(
+        self,
+        env: TankEnv,
+        path: str,
+        keyframe_interval: int = 1000,
+        rewards: bool = True,
+    ):
+        self.env = env
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.rewards = rewards
+        self.config = json.dumps(env_config(env), sort_keys=True).encode()
+        self.seed = None
+
+    def reset(self, *, seed: int | None = None, options: dict | None = None):
+        """Starts a new episode. Without a seed, one is drawn so the episode
+        can still be replayed."""
+        self.flush()
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2**63)
+        self.seed = seed
+        self.actions = []
+        self.reward_steps = []
+        self.reward_values = []
+        self.keyframes = []
+        self.flags = 0
+        return self.env.reset(seed=seed, options=options)
+
+    def step(self, action: int):
+        assert self.seed is not None, "reset must be called before step"
+        player = self.env.state["player"]
+        score = player.score
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        self.actions.append(action)
+
+        if self.rewards:
+            # score changes beyond the returned reward: kills and deaths
+            sparse = self.env.state["player"].score - score - reward
+            if abs(sparse) > 1e-9:
+                self.reward_steps.append(len(self.actions) - 1)
+                self.reward_values.append(sparse)
+        if self.keyframe_interval and len(self.actions) % self.keyframe_interval == 0:
+            self.keyframes.append(self.env.get_state())
+        if terminated or truncated:
+            self.flags = _TERMINATED * bool(terminated) | _TRUNCATED * bool(truncated)
+            self.flush()
+        return observation, reward, terminated, truncated, info
+
+    def flush(self) -> None:
+        """Appends the current episode to the file, if any."""
+        if self.seed is None:
+            return
+        n_steps = len(self.actions)
+        header = _HEADER.pack(
+            _MAGIC,
+            n_steps,
+            self.seed,
+            len(self.config),
+            len(self.reward_steps),
+            len(self.keyframes),
+            self.keyframe_interval,
+            self.flags,
+            0,
+        )
+        parts = [
+            header,
+            np.array(self.reward_steps, dtype=np.uint32).tobytes(),
+            np.array(self.reward_values, dtype=np.float32).tobytes(),
+            np.array([len(k) for k in self.keyframes], dtype=np.uint32).tobytes(),
+            self.config,
+            pack_actions(np.array(self.actions, dtype=np.uint8)).tobytes(),
+            *self.keyframes,
+        ]
+        size = sum(len(part) for part in parts)
+        parts.append(bytes(-size % 8))
+        with open(self.path, "ab") as file:
+            file.write(b"".join(parts))
+        self.seed = None
+
+    def close(self) -> None:
+        self.flush()
+
+
+class Episode:
+    """One recorded episode, read in place from the file.
+
+    Attributes:
+        seed (int), config (dict), n_steps (int), terminated (bool),
+        truncated (bool), actions (np.ndarray), reward_steps (np.ndarray),
+        reward_values (np.ndarray), keyframe_interval (int),
+        keyframes (list of bytes-like).
+    """
+
+    def __init__(self, data: np.ndarray, offset: int):
+        (
+            magic,
+            self.n_steps,
+            self.seed,
+            config_size,
+            n_rewards,
+            n_keyframes,
+            self.keyframe_interval,
+            flags,
+            _,
+        ) = _HEADER.unpack_from(data, offset)
+        assert magic == _MAGIC, f"no episode at offset {offset}"
+        self.terminated = bool(flags & _TERMINATED)
+        self.truncated = bool(flags & _TRUNCATED)
+
+        position = offset + _HEADER.size
+
+        def take(count, dtype):
+            nonlocal position
+            array = data[position : position + count * np.dtype(dtype).itemsize]
+            position += len(array)
+            return array.view(dtype)
+
+        self.reward_steps = take(n_rewards, np.uint32)
+        self.reward_values = take(n_rewards, np.float32)
+        keyframe_sizes = take(n_keyframes, np.uint32)
+        self.config = json.loads(take(config_size, np.uint8).tobytes())
+        self.actions = unpack_actions(
+            take((self.n_steps + 1) // 2, np.uint8), self.n_steps
+        )
+        self.keyframes = []
+        for size in keyframe_sizes:
+            self.keyframes.append(take(int(size), np.uint8))
+        self.end = position + (-position % 8)
+
+
+class EpisodeReplayer:
+    """Reads a file written by EpisodeRecorder, memory-mapped, and rebuilds
+    any step of any episode on demand.
+
+    Args:
+        path (str): Recording file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.getsize(path) == 0:
+            self.data = np.zeros(0, dtype=np.uint8)
+        else:
+            self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        # offsets of the episodes, from one pass over the headers
+        self.offsets = []
+        offset = 0
+        while offset < len(self.data):
+            self.offsets.append(offset)
+            offset = Episode(self.data, offset).end
+        self.envs = {}  # one environment per config
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def episode(self, index: int) -> Episode:
+        return Episode(self.data, self.offsets[index])
+
+    def _env(self, config: dict) -> TankEnv:
+        key = json.dumps(config, sort_keys=True)
+        if key not in self.envs:
+            self.envs[key] = TankEnv(**config)
+        return self.envs[key]
+
+    def state_at(self, index: int, step: int) -> TankEnv:
+        """Environment of episode `index` after its first `step` actions,
+        replayed from the closest keyframe. The environment is shared by the
+        episodes of the same config and is moved by the next call.
+        """
+        episode = self.episode(index)
+        assert 0 <= step <= episode.n_steps
+        env = self._env(episode.config)
+
+        keyframe = 0
+        if episode.keyframe_interval:
+            keyframe = min(step // episode.keyframe_interval, len(episode.keyframes))
+        if keyframe:
+            env.set_state(episode.keyframes[keyframe - 1].tobytes())
+            start = keyframe * episode.keyframe_interval
+        else:
+            env.reset(seed=episode.seed)
+            start = 0
+        for action in episode.actions[start:step]:
+            env.step(int(action))
+        return env
+
+    def replay(self, index: int):
+        """Yields the environment after each step of episode `index`."""
+        episode = self.episode(index)
+        env = self._env(episode.config)
+        env.reset(seed=episode.seed)
+        for action in episode.actions:
+            env.step(int(action))
+            yield env
@@ -0,0 +1,186 @@
+import struct
+
+import numpy as np
+
+from envs.game_elements import OrderedSet, Tank, Projectile
+
+# Layout of a snapshot: this header, then the arrays in the order of `pack`
+_VERSION = 2
+_HEADER = struct.Struct("<B??5idIIIIqQ")
+
+
+def _pcg_state(rng: np.random.Generator) -> tuple[bytes, int, int]:
+    state = rng.bit_generator.state
+    words = state["state"]["state"].to_bytes(16, "little") + state["state"][
+        "inc"
+    ].to_bytes(16, "little")
+    return words, state["has_uint32"], state["uinteger"]
+
+
+def pack(env) -> bytes:
+    """Packs the whole game of a TankEnv, random generator included, into bytes."""
+    state = env.state
+    player = state["player"]
+    x, y, direction, _ = player.info()
+    enemies = [enemy.info()[:3] for enemy in state["enemies"]]
+    projectiles = [projectile.info() for projectile in state["projectiles"]]
+    obstacles = sorted(state["obstacles"])
+    occupancy = env.occupancy
+    free_cells = (
+        occupancy.free_cells[:0]
+        if occupancy.index_stale
+        else occupancy.free_cells[: occupancy.n_free]
+    )
+
+    pcg_words, has_uint32, uinteger = _pcg_state(env.np_random)
+
+    header = _HEADER.pack(
+        _VERSION,
+        env.done,
+        occupancy.index_stale,
+        x,
+        y,
+        direction,
+        player.kills,
+        player.deaths,
+        player.score,
+        len(enemies),
+        len(projectiles),
+        len(obstacles),
+        len(free_cells),
+        has_uint32,
+        uinteger,
+    )
+    return b"".join(
+        [
+            header,
+            np.array(enemies, dtype=np.int32).tobytes(),
+            np.array(projectiles, dtype=np.int32).tobytes(),
+            np.array(obstacles, dtype=np.int32).tobytes(),
+            occupancy.grid.tobytes(),
+            occupancy.blocked.tobytes(),
+            free_cells.tobytes(),
+            pcg_words,
+        ]
+    )
+
+
+def unpack(env, blob: bytes) -> None:
+    """Restores a game packed by `pack` into a TankEnv of the same size."""
+    (
+        version,
+        done,
+        index_stale,
+        x,
+        y,
+        direction,
+        kills,
+        deaths,
+        score,
+        n_enemies,
+        n_projectiles,
+        n_obstacles,
+        n_free,
+        has_uint32,
+        uinteger,
+    ) = _HEADER.unpack_from(blob)
+    assert version == _VERSION, "snapshot from another version of the game"
+
+    offset = _HEADER.size
+
+    def take(count, dtype=np.int32):
+        nonlocal offset
+        array = np.frombuffer(blob, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        return array
+
+    enemies = take(3 * n_enemies).reshape(-1, 3).tolist()
+    projectiles = take(4 * n_projectiles).reshape(-1, 4).tolist()
+    obstacles = take(2 * n_obstacles).reshape(-1, 2).tolist()
+    occupancy = env.occupancy
+    grid = take(occupancy.grid.size, np.uint8)
+    blocked = take(occupancy.blocked.size, np.uint8)
+    free_cells = take(n_free)
+    pcg_words = blob[offset : offset + 32]
+
+    ## game elements
+    state = env.state
+    player = Tank(x, y, int(direction), label=0)
+    player.kills = kills
+    player.deaths = deaths
+    player.score = score
+    state["player"] = player
+    state["enemies"] = OrderedSet(Tank(x, y, int(d), label=1) for x, y, d in enemies)
+    state["projectiles"] = OrderedSet(
+        Projectile(x, y, int(d), label) for x, y, d, label in projectiles
+    )
+    obstacles = {(x, y) for x, y in obstacles}
+    if obstacles != state["obstacles"]:
+        env.set_obstacles(obstacles)
+    env.done = done
+
+    ## board
+    occupancy.grid.ravel()[:] = grid
+    occupancy.blocked.ravel()[:] = blocked
+    occupancy.index_stale = index_stale
+    if not index_stale:
+        occupancy.n_free = n_free
+        occupancy.free_cells[:n_free] = free_cells
+        occupancy.free_slot[:] = -1
+        occupancy.free_slot[free_cells] = np.arange(n_free)
+
+    ## random generator
+    env.np_random.bit_generator.state = {
+        "bit_generator": "PCG64",
+        "state": {
+            "state": int.from_bytes(pcg_words[:16], "little"),
+            "inc": int.from_bytes(pcg_words[16:], "little"),
+        },
+        "has_uint32": has_uint32,
+        "uinteger": uinteger,
+    }
+
+
+class ZobristHash:
+    """64-bit hash of a game position, for transposition tables.
+
+    Each (kind of element, x, y, direction) gets a fixed random 64-bit key and
+    a position hashes to the sum of the keys of its elements, modulo 2**64.
+    The sum does not depend on the order of the sets of the state, and the
+    keys only depend on the size of the board, so hashes are stable across
+    processes.
+
+    Args:
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+    """
+
+    # kinds of elements
+    PLAYER, ENEMY, PLAYER_PROJECTILE, ENEMY_PROJECTILE, OBSTACLE = range(5)
+
+    def __init__(self, max_x: int, max_y: int):
+        # projectiles can be one cell past the border
+        self.shape = (5, max_x + 1, max_y + 1, 4)
+        rng = np.random.default_rng(0x7A4B)
+        self.keys = rng.integers(
+            0, 2**64, size=int(np.prod(self.shape)), dtype=np.uint64
+        )
+
+    def _index(self, kind: int, x: int, y: int, direction: int) -> int:
+        _, size_x, size_y, _ = self.shape
+        return ((kind * size_x + x) * size_y + y) * 4 + direction
+
+    def __call__(self, state: dict) -> int:
+        x, y, direction, _ = state["player"].info()
+        indices = [self._index(self.PLAYER, x, y, direction)]
+        for enemy in state["enemies"]:
+            x, y, direction, _ = enemy.info()
+            indices.append(self._index(self.ENEMY, x, y, direction))
+        for projectile in state["projectiles"]:
+            x, y, direction, label = projectile.info()
+            kind = self.ENEMY_PROJECTILE if label else self.PLAYER_PROJECTILE
+            indices.append(self._index(kind, x, y, direction))
+        for x, y in state["obstacles"]:
+            indices.append(self._index(self.OBSTACLE, x, y, 0))
+        # uint64 sums wrap around
+        return int(self.keys[indices].sum(dtype=np.uint64))
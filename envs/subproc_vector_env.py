@@ -0,0 +1,297 @@
+import multiprocessing as mp
+import traceback
+
+import numpy as np
+from gymnasium import spaces
+
+
+def _shared_array(ctx, shape: tuple, dtype) -> tuple:
+    """Allocates a zeroed array in shared memory, returns (raw buffer, view)."""
+    dtype = np.dtype(dtype)
+    raw = ctx.RawArray("b", max(int(np.prod(shape)) * dtype.itemsize, 1))
+    return raw, _view(raw, shape, dtype)
+
+
+def _view(raw, shape: tuple, dtype) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape))
+    return np.frombuffer(raw, dtype=dtype, count=size).reshape(shape)
+
+
+def _worker(env_fn, pipe, parent_pipe, specs, raws, start: int, stop: int):
+    """Runs one environment and writes its steps into rows start:stop of the
+    shared arrays."""
+    parent_pipe.close()
+    shared = {
+        name: _view(raws[name], shape, dtype) for name, (shape, dtype) in specs.items()
+    }
+    keys = [name[4:] for name in specs if name.startswith("obs/")]
+    rows = slice(start, stop)
+
+    def write(obs):
+        for key in keys:
+            shared["obs/" + key][rows] = obs[key]
+
+    env = None
+    try:
+        env = env_fn()
+        batched = hasattr(env, "num_envs")
+        episode_return = np.zeros(stop - start)
+        episode_length = np.zeros(stop - start, dtype=np.int64)
+        while True:
+            command, data = pipe.recv()
+            if command == "step":
+                actions = shared["actions"][rows]
+                if batched:
+                    obs, reward, terminated, truncated, info = env.step(actions)
+                else:
+                    obs, reward, terminated, truncated, info = env.step(int(actions[0]))
+                    # info values of a single game go to its row
+                    info = {key: np.array([value]) for key, value in info.items()}
+                shared["rewards"][rows] = reward
+                shared["terminated"][rows] = terminated
+                shared["truncated"][rows] = truncated
+                episode_return += reward
+                episode_length += 1
+
+                done = shared["terminated"][rows] | shared["truncated"][rows]
+                if done.any():
+                    info["final_return"] = np.where(done, episode_return, 0.0)
+                    info["final_length"] = np.where(done, episode_length, 0)
+                    episode_return[done] = 0
+                    episode_length[done] = 0
+                    if not batched:
+                        obs, _ = env.reset()
+                write(obs)
+                pipe.send(("ok", info))
+            elif command == "reset":
+                obs, _ = env.reset(seed=data)
+                episode_return[:] = 0
+                episode_length[:] = 0
+                write(obs)
+                pipe.send(("ok", None))
+            elif command == "call":
+                name, args, kwargs = data
+                pipe.send(("ok", getattr(env, name)(*args, **kwargs)))
+            elif command == "close":
+                pipe.send(("ok", None))
+                break
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        pipe.send(("error", traceback.format_exc()))
+    finally:
+        if env is not None and hasattr(env, "close"):
+            env.close()
+        pipe.close()
+
+
+class SubprocVectorEnv:
+    """Steps environments in worker processes, one environment per worker.
+
+    Workers exchange no observation through their pipes: actions, array
+    observations, rewards and terminated/truncated flags all live in shared
+    memory, and pipes only carry short commands and the info dicts. The
+    environments must observe arrays, e.g. TankEnv with obs_mode="array", or
+    be batched like VectorTankEnv, in which case a worker steps all its games
+    and owns `num_envs` consecutive rows.
+
+    Single games are reset automatically when they end; batched environments
+    reset their own games. `info` holds arrays over all rows, zero for the
+    rows that did not finish, with "final_return" and "final_length" of the
+    finished episodes.
+
+    Args:
+        env_fns (list): Picklable callables building the environments, one per
+            worker (e.g. functools.partial(TankEnv, obs_mode="array")).
+        context (str | None): multiprocessing start method, the platform
+            default if None.
+    """
+
+    def __init__(self, env_fns: list, context: str | None = None):
+        ctx = mp.get_context(context)
+
+        # spaces are read from a throwaway instance, all workers must match
+        env = env_fns[0]()
+        self.batch_size = getattr(env, "num_envs", None)
+        single_space = env.observation_space
+        single_action_space = env.action_space
+        if hasattr(env, "close"):
+            env.close()
+        del env
+
+        rows = self.batch_size or 1
+        self.num_workers = len(env_fns)
+        self.num_envs = rows * self.num_workers
+        N = self.num_envs
+
+        assert isinstance(single_space, spaces.Dict), "observations must be a dict"
+        specs = {}
+        for key, space in single_space.spaces.items():
+            shape = space.shape[1:] if self.batch_size else space.shape
+            specs["obs/" + key] = ((N, *shape), space.dtype)
+        specs["actions"] = ((N,), np.int64)
+        specs["rewards"] = ((N,), np.float64)
+        specs["terminated"] = ((N,), np.bool_)
+        specs["truncated"] = ((N,), np.bool_)
+
+        raws = {}
+        self.shared = {}
+        for name, (shape, dtype) in specs.items():
+            raws[name], self.shared[name] = _shared_array(ctx, shape, dtype)
+        self.observations = {
+            name[4:]: array
+            for name, array in self.shared.items()
+            if name.startswith("obs/")
+        }
+
+        boxes = {}
+        for key, space in self._boxes(single_space).items():
+            low, high = space.low, space.high
+            if self.batch_size:
+                low, high = low[0], high[0]
+            shape = specs["obs/" + key][0]
+            boxes[key] = spaces.Box(
+                np.broadcast_to(low, shape),
+                np.broadcast_to(high, shape),
+                dtype=space.dtype,
+            )
+        self.observation_space = spaces.Dict(boxes)
+        self.action_space = spaces.MultiDiscrete(
+            np.full(N, self._num_actions(single_action_space))
+        )
+
+        self.pipes = []
+        self.processes = []
+        for i, env_fn in enumerate(env_fns):
+            parent_pipe, child_pipe = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(
+                    env_fn,
+                    child_pipe,
+                    parent_pipe,
+                    specs,
+                    raws,
+                    i * rows,
+                    (i + 1) * rows,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_pipe.close()
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+        self.waiting = False
+        self.closed = False
+
+    @staticmethod
+    def _boxes(space: spaces.Dict) -> dict:
+        """Box view of every field (MultiBinary fields become 0/1 boxes)."""
+        boxes = {}
+        for key, field in space.spaces.items():
+            if isinstance(field, spaces.Box):
+                boxes[key] = field
+            else:
+                boxes[key] = spaces.Box(0, 1, field.shape, dtype=field.dtype)
+        return boxes
+
+    @staticmethod
+    def _num_actions(action_space) -> int:
+        if isinstance(action_space, spaces.Discrete):
+            return int(action_space.n)
+        return int(np.max(action_space.nvec))
+
+    def _receive(self) -> list:
+        results = []
+        for pipe in self.pipes:
+            status, data = pipe.recv()
+            if status == "error":
+                self.close()
+                raise RuntimeError("worker failed:\n" + data)
+            results.append(data)
+        return results
+
+    # __________STEPPING__________#
+
+    def reset(self, *, seed=None, options: dict | None = None) -> tuple:
+        """Resets every worker.
+
+        Args:
+            seed (int | list | None): Seed of the first worker, worker i gets
+                seed + i. A list gives the seed of each worker.
+        """
+        assert not self.waiting, "step_wait must be called after step_async"
+        if seed is None or isinstance(seed, (list, tuple)):
+            seeds = seed or [None] * self.num_workers
+        else:
+            seeds = [seed + i for i in range(self.num_workers)]
+        for pipe, worker_seed in zip(self.pipes, seeds):
+            pipe.send(("reset", worker_seed))
+        self._receive()
+        return (self.observations, {})
+
+    def step_async(self, actions) -> None:
+        """Starts a step of every worker, returns immediately."""
+        assert not self.waiting, "step_wait must be called after step_async"
+        self.shared["actions"][:] = actions
+        for pipe in self.pipes:
+            pipe.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self) -> tuple[dict, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Waits for the step started by `step_async`.
+
+        Returns:
+            Observation, rewards, terminated and truncated flags, and info, as
+            live views on the shared memory, overwritten by the next step.
+        """
+        infos = self._receive()
+        self.waiting = False
+
+        rows = self.batch_size or 1
+        info = {}
+        for i, worker_info in enumerate(infos):
+            for key, value in worker_info.items():
+                if key not in info:
+                    info[key] = np.zeros(self.num_envs, dtype=np.asarray(value).dtype)
+                info[key][i * rows : (i + 1) * rows] = value
+        return (
+            self.observations,
+            self.shared["rewards"],
+            self.shared["terminated"],
+            self.shared["truncated"],
+            info,
+        )
+
+    def step(self, actions) -> tuple[dict, np.ndarray, np.ndarray, np.ndarray, dict]:
+        self.step_async(actions)
+        return self.step_wait()
+
+    def call(self, name: str, *args, **kwargs) -> list:
+        """Calls a method of every environment, returns the results."""
+        assert not self.waiting, "step_wait must be called after step_async"
+        for pipe in self.pipes:
+            pipe.send(("call", (name, args, kwargs)))
+        return self._receive()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self.waiting:
+            for pipe in self.pipes:
+                if pipe.poll(1):
+                    pipe.recv()
+        for pipe in self.pipes:
+            try:
+                pipe.send(("close", None))
+                pipe.recv()
+            except (BrokenPipeError, EOFError, ConnectionResetError):
+                pass
+        for pipe in self.pipes:
+            pipe.close()
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
@@ -1,15 +1,25 @@
+import logging
+
 import gymnasium as gym
 from gymnasium import spaces
-import matplotlib.pyplot as plt
 import numpy as np
 
 from envs.game_elements import *
-from utils.coloring import (
-    fill_tank,
-    fill_obstacle,
-    fill_projectile,
-    Color,
+from envs.occupancy import OccupancyGrid, PlacementError
+from envs.projectile_map import ProjectileMap
+from envs.observation import (
+    ArrayObservation,
+    EgocentricObservation,
+    PixelObservation,
 )
+from envs import snapshot
+from envs.profiling import StepProfiler
+from envs.navigation import NavigationField
+
+# Rendering (utils.renderer, pygame, matplotlib) is imported on first use,
+# so that headless rollout workers never load it.
+
+logger = logging.getLogger(__name__)
 
 
 # Creating environnement
@@ -25,6 +35,21 @@ class TankEnv(gym.Env):
         total_enemies_to_kill (int): Number of kills required to finish the game.
         obstacles (str): One of {"", "low", "high"} describing obstacle density ("" for no obstacle).
         mode (str): "1p" for single-player or "2p" for PvP for algorithmic testing.
+        obs_mode (str): "state" to observe the dict of game objects, "array" to
+            observe preallocated arrays matching `observation_space`, "crop"
+            to observe a `view_size` x `view_size` window centered on the
+            player, whose size does not depend on the map (see
+            EgocentricObservation), "pixels" to observe the last
+            `frame_stack` rendered frames (see PixelObservation).
+        profile (bool): Time each phase of `step` and count the entities on
+            the board, see `profile_summary`. The counts of the last step are
+            also given in `info["entities"]`.
+        pursuit (str): How enemies go to the player: "direct" along x then y,
+            "path" along shortest paths around the obstacles.
+        view_size (int): Side of the window observed in "crop" mode, odd.
+        frame_stack (int): Frames stacked in "pixels" mode.
+        pixels (str): Frames of "pixels" mode: "rgb", "gray" or "palette"
+            (palette indices of utils.renderer).
     """
 
     metadata = {"render.modes": ["human"]}
@@ -37,6 +62,12 @@ class TankEnv(gym.Env):
         total_ennemies_to_kill: int = 10,
         obstacles: str = "",
         mode: str = "1p",
+        obs_mode: str = "state",
+        profile: bool = False,
+        pursuit: str = "direct",
+        view_size: int = 11,
+        frame_stack: int = 4,
+        pixels: str = "rgb",
     ):
         super(TankEnv, self).__init__()
 
@@ -47,8 +78,16 @@ class TankEnv(gym.Env):
 
         self.total_ennemies_to_kill = total_ennemies_to_kill
         self.initial_ennemies = 2
+        # enemies on the board never exceed this: spawns stop at
+        # max_enemies_on_screen, but the initial enemies may be more
+        self.enemy_slots = max(max_enemies_on_screen, self.initial_ennemies)
         self.obstacles = obstacles
         self.mode = mode
+        self.obs_mode = obs_mode
+        self.pursuit = pursuit
+        self.view_size = view_size
+        self.frame_stack = frame_stack
+        self.pixels = pixels
 
         # sanity checks
         assert max_x > 0
@@ -56,51 +95,85 @@ class TankEnv(gym.Env):
         assert max_enemies_on_screen > 0
         assert max_enemies_on_screen <= total_ennemies_to_kill
         assert (max_enemies_on_screen + 1) * 9 * 2 <= max_x * max_y
+        assert obs_mode in ("state", "array", "crop", "pixels")
+        assert pursuit in ("direct", "path")
 
         self.action_space = spaces.Discrete(
             6
         )  # 0: up, 1: right, 2: down, 3: left, 4: stay, 5: shoot
 
-        dtypes = np.int32
-        self.observation_space = spaces.Dict(
-            {
-                "player": spaces.Box(
-                    low=np.array([0, 0, 0]),
-                    high=np.array([self.max_x, self.max_y, 4]),
-                    dtype=dtypes,
-                ),  # x, y, direction
-                "enemies": spaces.Box(
-                    low=np.zeros((self.max_enemies_on_screen, 3), dtype=dtypes),
-                    high=np.array(
-                        [self.max_x, self.max_y, 4] * self.max_enemies_on_screen
-                    ).reshape(self.max_enemies_on_screen, 3),
-                    dtype=dtypes,
-                ),
-                "projectiles": spaces.Box(
-                    low=np.zeros((self.max_projectiles, 4), dtype=dtypes),
-                    high=np.array(
-                        [self.max_x, self.max_y, 4, 1] * self.max_projectiles
-                    ).reshape(self.max_projectiles, 4),
-                    dtype=dtypes,
-                ),  # x, y, direction, from (0: player, 1: enemy)
-                "obstacles": spaces.Box(
-                    low=np.zeros((self.max_x, self.max_y), dtype=dtypes),
-                    high=np.ones((self.max_x, self.max_y), dtype=dtypes),
-                    dtype=dtypes,
-                ),  # obstacles
-            }
-        )
+        if obs_mode == "crop":
+            # no block of the size of the map, even in the space
+            self.observation_space = EgocentricObservation.space(
+                self.max_x, self.max_y, view_size
+            )
+        elif obs_mode == "pixels":
+            self.observation_space = PixelObservation.space(
+                self.max_x, self.max_y, frame_stack, pixels
+            )
+        else:
+            dtypes = np.int32
+            self.observation_space = spaces.Dict(
+                {
+                    "player": spaces.Box(
+                        low=np.array([0, 0, 0]),
+                        high=np.array([self.max_x, self.max_y, 4]),
+                        dtype=dtypes,
+                    ),  # x, y, direction
+                    "enemies": spaces.Box(
+                        low=np.zeros((self.enemy_slots, 3), dtype=dtypes),
+                        high=np.array(
+                            [self.max_x, self.max_y, 4] * self.enemy_slots
+                        ).reshape(self.enemy_slots, 3),
+                        dtype=dtypes,
+                    ),
+                    "projectiles": spaces.Box(
+                        low=np.zeros((self.max_projectiles, 4), dtype=dtypes),
+                        high=np.array(
+                            [self.max_x, self.max_y, 4, 1] * self.max_projectiles
+                        ).reshape(self.max_projectiles, 4),
+                        dtype=dtypes,
+                    ),  # x, y, direction, from (0: player, 1: enemy)
+                    "obstacles": spaces.Box(
+                        low=np.zeros((self.max_x, self.max_y), dtype=dtypes),
+                        high=np.ones((self.max_x, self.max_y), dtype=dtypes),
+                        dtype=dtypes,
+                    ),  # obstacles
+                }
+            )
         self.action_space = spaces.Discrete(6)
 
+        # Array observations, written in place at each step
+        self.encoder = None
+        if self.obs_mode == "array":
+            self.encoder = ArrayObservation(
+                self.max_x, self.max_y, self.enemy_slots, self.max_projectiles
+            )
+            self.observation_space["count"] = ArrayObservation.count_space(
+                self.enemy_slots, self.max_projectiles
+            )
+        elif self.obs_mode == "crop":
+            self.encoder = EgocentricObservation(self.max_x, self.max_y, view_size)
+        elif self.obs_mode == "pixels":
+            self.encoder = PixelObservation(self.max_x, self.max_y, frame_stack, pixels)
+
         self.state = {
-            "player": Tank(0, 0, np.array([0, 0, 1, 0]), label=0),
-            "enemies": set(),  # Tank objects
-            "projectiles": set(),  # Projectile objects, could be an array the size of the game screen ?
+            "player": Tank(0, 0, 2, label=0),
+            "enemies": OrderedSet(),  # Tank objects
+            "projectiles": OrderedSet(),  # Projectile objects, could be an array the size of the game screen ?
             "obstacles": set(),
         }
 
-        # Set of all positions occupied by tanks
-        self.occupied_positions = set()
+        # Grid of all positions occupied by tanks and obstacles
+        self.occupancy = OccupancyGrid(self.max_x, self.max_y)
+        # 3x3 footprints of the obstacles, padded like the occupancy grid
+        self.obstacle_boxes = np.zeros_like(self.occupancy.grid, dtype=bool)
+        # Projectiles indexed by cell, rebuilt at each step
+        self.projectile_map = ProjectileMap()
+        # Moves of the enemies towards the player, for pursuit="path"
+        self.navigation = None
+        if pursuit == "path":
+            self.navigation = NavigationField(self.max_x, self.max_y)
 
         self.probability_new_enemy = 0.01
 
@@ -122,6 +195,14 @@ class TankEnv(gym.Env):
         self.done = False  # terminated ?
         self.info = {}
 
+        # None when profiling is off, so that step only pays a few checks
+        self.profiler = StepProfiler() if profile else None
+
+        # created at the first call to render
+        self.renderer = None
+        # created at the first call to position_hash
+        self.zobrist = None
+
     def reset(
         self,
         *,
@@ -130,31 +211,29 @@ class TankEnv(gym.Env):
         options: dict | None = None
     ) -> tuple:
         super().reset(seed=seed)
-        self.occupied_positions = set()  # "board"
+        self.occupancy.clear()  # "board"
         self.done = False
 
+        # placements are uniform draws among the free cells of the board
         if initial_run:
 
             # place the player
             ## strategy : random
-            x = np.random.randint(0, self.max_x)
-            y = np.random.randint(0, self.max_y)
+            x, y = self.occupancy.sample_free(self.np_random)
 
-            direction = np.zeros(4, dtype=int)
-            direction[np.random.randint(0, 4)] = 1  # random direction
+            direction = int(self.np_random.integers(0, 4))  # random direction
 
             player = Tank(x, y, direction, label=0)
             self.state["player"] = player
 
-            self.occupied_positions.add((x, y))
+            self.occupancy.add(x, y)
         else:
-            self.occupied_positions.add(
-                (self.state["player"].x, self.state["player"].y)
-            )
+            self.occupancy.add(self.state["player"].x, self.state["player"].y)
 
-            # place obstacles
+        # place obstacles
         ## strategy: random
-
+        ## the 5x5 clearance keeps obstacles off the player's surroundings,
+        ## so the player can never be boxed in
         obstacles = set()
         if self.obstacles == "low":
             nb_obstacles = self.max_x * self.max_y // 80
@@ -164,107 +243,96 @@ class TankEnv(gym.Env):
             nb_obstacles = 0
         if nb_obstacles > 1:
             for i in range(nb_obstacles):
-                placed = False
-                while not placed:
-                    x = np.random.randint(0, self.max_x)
-                    y = np.random.randint(0, self.max_y)
-
-                    boxes = [(x + i, y + j) for i in range(-2, 3) for j in range(-2, 3)]
-
-                    if any(box in self.occupied_positions for box in boxes):
-                        continue
+                x, y = self.occupancy.sample_free(self.np_random)
+                obstacles.add((x, y))
+                self.occupancy.add(x, y)
 
-                    direction = np.zeros(4, dtype=int)
-                    direction[np.random.randint(0, 4)] = 1
-
-                    obstacles.add((x, y))
-                    self.occupied_positions.add((x, y))
-                    placed = True
-
-        self.state["obstacles"] = obstacles
+        self.set_obstacles(obstacles)
 
         # place enemies, beware of collisions
         ## strat: self.initial_ennemies random ennemies
-        ennemies = set()
+        self.state["enemies"] = OrderedSet()
+        # projectiles of the previous game would change the new one
+        self.state["projectiles"] = OrderedSet()
         for i in range(self.initial_ennemies):
-            placed = False
-            while not placed:
-                x = np.random.randint(0, self.max_x)
-                y = np.random.randint(0, self.max_y)
+            self.spawn_enemy()
 
-                direction = np.zeros(4, dtype=int)
-                direction[np.random.randint(0, 4)] = 1
+        logger.debug("environnement reset successfully")
+        if self.obs_mode == "pixels":
+            self.encoder.reset()  # no frame of the previous game in the stack
+        return (self.observe(), {})
 
-                enemy = Tank(x, y, direction, label=1)
-
-                boxes = enemy.big_bounding_box()
-                if any(box in self.occupied_positions for box in boxes):
-                    continue
+    def set_obstacles(self, obstacles: set) -> None:
+        """Sets the obstacles of the game and their cached 3x3 footprints.
+        Does not touch the occupancy grid."""
+        self.state["obstacles"] = obstacles
+        self.obstacle_boxes[:] = False
+        pad = self.occupancy.pad
+        for x, y in obstacles:
+            self.obstacle_boxes[
+                x + pad - 1 : x + pad + 2, y + pad - 1 : y + pad + 2
+            ] = True
+        if self.encoder is not None:
+            self.encoder.encode_obstacles(obstacles)
+
+    def spawn_enemy(self) -> None:
+        """Places a new enemy with a random direction on a free cell.
+
+        Raises:
+            PlacementError: if no cell of the board is free.
+        """
+        x, y = self.occupancy.sample_free(self.np_random)
 
-                ennemies.add(enemy)
-                self.occupied_positions.add((x, y))
-                placed = True
+        direction = int(self.np_random.integers(0, 4))
 
-        self.state["enemies"] = ennemies
+        self.state["enemies"].add(Tank(x, y, direction, label=1))
+        self.occupancy.add(x, y)
 
-        # if the player is stuck, we reset
-        # stuck = more than 3 obstacles around the player
-        boxes = self.state["player"].big_bounding_box()
-        obstacles_around_player = [box for box in boxes if box in obstacles]
-        if len(obstacles_around_player) > 3:
-            print("#### player is stuck, resetting ####")
-            self.reset()
-        else:
-            print("#### environnement reset successfully ####")
-        return (self.state, {})
+    def observe(self):
+        """Current observation: the state dict, or its array encoding in
+        "array" mode (the same buffers are returned at every step)."""
+        if self.encoder is None:
+            return self.state
+        return self.encoder.encode(self.state)
 
     def clean(self, action: int) -> None:
         """Cleans the game board from killed enemies and used projectiles.
+        Also rebuilds the projectile map used by `check_death`.
         Args:
             action (int): next action to perform
         """
+        projectiles = self.state["projectiles"]
+        self.projectile_map.rebuild(projectiles)
+
         ## canceling projectiles that touch each other if necessary
-        projectiles = list(self.state["projectiles"])
-        for i in range(len(projectiles)):
-            for j in range(i + 1, len(projectiles)):
-                if (
-                    projectiles[i].x == projectiles[j].x
-                    and projectiles[i].y == projectiles[j].y
-                    and projectiles[i].label != projectiles[j].label
-                ):
-                    # same position, different players
-                    try:
-                        self.state["projectiles"].remove(projectiles[i])
-                        self.state["projectiles"].remove(projectiles[j])
-                    except:
-                        pass
+        # same position, different players: they cancel pairwise
+        for here in self.projectile_map.cells.values():
+            if len(here) < 2:
+                continue
+            from_player = [p for p in here if p.label == 0]
+            from_enemies = [p for p in here if p.label != 0]
+            pairs = min(len(from_player), len(from_enemies))
+            for projectile in from_player[:pairs] + from_enemies[:pairs]:
+                projectiles.remove(projectile)
+                here.remove(projectile)
 
         # Clean up defeated enemies and used projectiles
+        ## projectiles hitting an obstacle are absorbed
+        pad = self.occupancy.pad
+        for projectile in list(projectiles):
+            if self.obstacle_boxes[projectile.x + pad, projectile.y + pad]:
+                projectiles.remove(projectile)
+                self.projectile_map.discard(projectile)
+
         ## reward_enemy_killed for each defeated enemy
         reward = 0
-        obstacle_boxes = []
-        for obstacle in list(self.state["obstacles"]):
-            boxes = [
-                (obstacle[0] + i, obstacle[1] + j)
-                for i in range(-1, 2)
-                for j in range(-1, 2)
-            ]
-            obstacle_boxes += boxes
-
         for enemy in list(self.state["enemies"]):
-            enemy_boxes = enemy.bounding_box()
-            for projectile in list(self.state["projectiles"]):
-
-                if (projectile.x, projectile.y) in obstacle_boxes:
-                    self.state["projectiles"].remove(projectile)
-
-                if (
-                    projectile.x,
-                    projectile.y,
-                ) in enemy_boxes and projectile.label == 0:
+            for projectile in self.projectile_map.in_box(enemy.x, enemy.y):
+                if projectile.label == 0:
                     self.state["enemies"].remove(enemy)
-                    self.occupied_positions.remove((enemy.x, enemy.y))
-                    self.state["projectiles"].remove(projectile)
+                    self.occupancy.remove(enemy.x, enemy.y)
+                    projectiles.remove(projectile)
+                    self.projectile_map.discard(projectile)
                     reward += self.reward_enemy_killed
                     self.state["player"].kills += 1
                     break
@@ -273,21 +341,18 @@ class TankEnv(gym.Env):
     def check_death(self, *, who: str) -> None:
         """Checks if the called tank is dead. If yes, the game is marked as done.
         If the player is dead, penalty is applied.
+        Relies on the projectile map built by `clean`.
 
         TODO : refactor to respect Single Responsibility Principle
         """
         reward = 0
         label_map = {"player": 0, "enemy": 1}
 
-        boxes = self.state[who].bounding_box()
-        ennemies_projectiles_positions = []
-        for projectile in list(self.state["projectiles"]):
+        tank = self.state[who]
+        for projectile in self.projectile_map.in_box(tank.x, tank.y):
             if projectile.label != label_map[who]:  # not their projectile
-                ennemies_projectiles_positions.append(projectile)
-
-        for projectile in ennemies_projectiles_positions:
-            if (projectile.x, projectile.y) in boxes:
                 self.state["projectiles"].remove(projectile)
+                self.projectile_map.discard(projectile)
                 if who == "player":
                     reward += self.reward_player_dead
                 self.state[who].deaths += 1
@@ -296,33 +361,31 @@ class TankEnv(gym.Env):
         self.state["player"].score += reward
 
     def step(self, action: int) -> tuple[dict, float, bool, bool, dict]:
+        profiler = self.profiler
+        if profiler:
+            profiler.start()
         reward = self.timestep
+        # all the randomness of the step but placements, in one call: the
+        # spawn odds, then three numbers per enemy slot for their strategies
+        draws = self.np_random.random(1 + 3 * self.enemy_slots).tolist()
 
         self.clean(action)
+        if profiler:
+            profiler.lap("clean")
 
         # Add 1 enemy if the number of active enemies is less than max_enemies
         ## strategy: randomly with a probability of self.probability_new_enemy
         if (
             len(self.state["enemies"]) < self.max_enemies_on_screen
-            and np.random.rand() < self.probability_new_enemy
+            and draws[0] < self.probability_new_enemy
         ) or len(self.state["enemies"]) == 0:
-            placed = False
-            while not placed:
-                x = np.random.randint(0, self.max_x)
-                y = np.random.randint(0, self.max_y)
-
-                direction = np.zeros(4, dtype=int)
-                direction[np.random.randint(0, 4)] = 1
-
-                enemy = Tank(x, y, direction, label=1)
-
-                boxes = enemy.big_bounding_box()
-                if any(box in self.occupied_positions for box in boxes):
-                    continue
-
-                self.state["enemies"].add(enemy)
-                self.occupied_positions.add((x, y))
-                placed = True
+            try:
+                self.spawn_enemy()
+            except PlacementError:
+                # no room left, try again at the next step
+                logger.debug("no free cell to spawn an enemy")
+        if profiler:
+            profiler.lap("spawn")
 
         # Check if the player is dead
         # the game doesn't end when the player dies
@@ -335,6 +398,8 @@ class TankEnv(gym.Env):
         # the game doesn't end when the player dies
         if self.state["player"].kills >= self.total_ennemies_to_kill:
             self.done = True
+        if profiler:
+            profiler.lap("check_death")
 
         ##################### update #####################
 
@@ -345,20 +410,31 @@ class TankEnv(gym.Env):
             "max_x": self.max_x,
             "max_y": self.max_y,
         }
-        self.state["player"].update(
-            action, self.state, self.occupied_positions, boundaries
-        )
+        self.state["player"].update(action, self.state, self.occupancy, boundaries)
         if action == 4:
             reward += self.reward_nothing
         elif action == 5:
             reward += self.reward_used_projectile
+        if profiler:
+            profiler.lap("player")
 
         # Update the state of enemies
         ## strategy: random
-        for enemy in self.state["enemies"]:
+        navigation = self.navigation
+        if navigation is not None:
+            player = self.state["player"]
+            navigation.update(self.state["obstacles"], player.x, player.y)
+        for i, enemy in enumerate(self.state["enemies"]):
             enemy.update_strategic(
-                self.state, self.occupied_positions, boundaries, strategy=2
+                self.state,
+                self.occupancy,
+                boundaries,
+                strategy=2,
+                draws=draws[1 + 3 * i : 4 + 3 * i],
+                navigation=navigation,
             )
+        if profiler:
+            profiler.lap("enemies")
 
         # Update the state of projectiles
         ## position
@@ -366,44 +442,71 @@ class TankEnv(gym.Env):
             self.state["projectiles"]
         ):  # list() to avoid modifications while iterating
             projectile.update(self.state, boundaries)
+        if profiler:
+            profiler.lap("projectiles")
+            self.info["entities"] = profiler.count(self.state)
 
         ##################### update done #####################
 
         self.state["player"].score += reward
         truncated = False  # to be re-considered
 
-        return (self.state, reward, self.done, truncated, self.info)
+        return (self.observe(), reward, self.done, truncated, self.info)
 
-    # __________RENDERING__________#
-
-    def render(self, mode="human") -> np.ndarray:
-        # Create a matrix M of size max_x * max_y with a padding of 1 on each side
-        rows = self.max_y + 2
-        cols = self.max_x + 2
-        M = np.ones((rows, cols, 3), dtype=np.uint8) * 240  # white background
+    # __________PROFILING__________#
 
-        # fill the matrix with the elements of the environment
-        ## fill with player
-        M = fill_tank(self.state["player"], Color.player, M)
+    def profile_summary(self, reset: bool = False) -> dict:
+        """Time spent in each phase of `step` and entity counts since the
+        profiler was created or last reset. Requires `profile=True`.
 
-        ## fill with enemies
-        for enemy in self.state["enemies"]:
-            M = fill_tank(enemy, Color.enemy, M)
+        Args:
+            reset (bool): Clear the profiler after reading it.
+        """
+        assert self.profiler is not None, "create the env with profile=True"
+        summary = self.profiler.summary()
+        if reset:
+            self.profiler.reset()
+        return summary
+
+    # __________SNAPSHOTS__________#
+
+    def get_state(self) -> bytes:
+        """Snapshot of the whole game as bytes: game elements, occupancy grid
+        and random generators. Restoring it with `set_state` and stepping with
+        the same actions replays the same game."""
+        return snapshot.pack(self)
+
+    def set_state(self, blob: bytes) -> None:
+        """Restores a snapshot taken by `get_state` on an env of the same size.
+        The current observation is refreshed but not returned, in "pixels"
+        mode the stack restarts from the restored frame."""
+        snapshot.unpack(self, blob)
+        if self.obs_mode == "pixels":
+            self.encoder.reset()
+        self.observe()
+
+    def position_hash(self) -> int:
+        """64-bit Zobrist hash of the current position (tanks, directions,
+        projectiles and obstacles), e.g. to key a transposition table."""
+        if self.zobrist is None:
+            self.zobrist = snapshot.ZobristHash(self.max_x, self.max_y)
+        return self.zobrist(self.state)
 
-        ## fill with obstacles
-        # 3 x 3 square obstacle
-        for obstacle in self.state["obstacles"]:
-            M = fill_obstacle(obstacle, Color.obstacle, M)
+    # __________RENDERING__________#
 
-        ## fill with projectiles
-        for projectile in self.state["projectiles"]:
-            M = fill_projectile(projectile, M)
+    def render(self, mode="human") -> np.ndarray:
+        """Returns the frame of the game as a (max_y + 2, max_x + 2, 3) RGB
+        array, with a padding of 1 on each side."""
+        if self.renderer is None:
+            from utils.renderer import FrameRenderer
 
-        # return frame
-        return M
+            self.renderer = FrameRenderer(self.max_x, self.max_y)
+        return self.renderer.render(self.state)
 
     def plot_render(self) -> None:
         """Generates the rendered frame and plots it."""
+        import matplotlib.pyplot as plt
+
         gameboard = self.render()
         plt.axis("off")
         plt.imshow(gameboard)
@@ -0,0 +1,483 @@
+import numpy as np
+from gymnasium import spaces
+
+
+# Direction: 0 = up, 1 = right, 2 = down, 3 = left
+DX = np.array([0, 1, 0, -1], dtype=np.int32)
+DY = np.array([-1, 0, 1, 0], dtype=np.int32)
+
+# Offsets of the 5x5 clearance window and of the 3x3 hit box around a center
+OFFSETS_5 = np.array([(i, j) for i in range(-2, 3) for j in range(-2, 3)]).T
+OFFSETS_3 = np.array([(i, j) for i in range(-1, 2) for j in range(-1, 2)]).T
+
+# Grids are padded by 2 cells on each side so windows never leave the array
+PAD = 2
+
+
+class VectorTankEnv:
+    """Batched version of TankEnv stepping `num_envs` single-player games at once.
+
+    The state of every game is kept in NumPy arrays (struct-of-arrays) and all
+    games are advanced together with array operations. The rules are the ones
+    of TankEnv: 5x5 spawn and move clearance, 3x3 hit boxes, opposing
+    projectiles cancelling each other and enemies playing strategy 2 of
+    `Tank.update_strategic`. Finished games are reset automatically at the end
+    of `step`.
+
+    Args:
+        num_envs (int): Number of games simulated in parallel.
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+        max_enemies_on_screen (int): Maximum simultaneous enemies.
+        total_ennemies_to_kill (int): Number of kills required to finish the game.
+        obstacles (str): One of {"", "low", "high"} describing obstacle density.
+        max_projectiles (int | None): Projectile slots per game. The default is
+            large enough for every tank to shoot at every step.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        max_x: int = 20,
+        max_y: int = 20,
+        max_enemies_on_screen: int = 5,
+        total_ennemies_to_kill: int = 10,
+        obstacles: str = "",
+        max_projectiles: int | None = None,
+    ):
+        self.num_envs = num_envs
+        self.max_x = max_x
+        self.max_y = max_y
+        self.max_enemies_on_screen = max_enemies_on_screen
+        self.total_ennemies_to_kill = total_ennemies_to_kill
+        self.initial_ennemies = 2
+        self.obstacles = obstacles
+
+        # sanity checks
+        assert num_envs > 0
+        assert max_x > 0
+        assert max_y > 0
+        assert max_enemies_on_screen > 0
+        assert max_enemies_on_screen <= total_ennemies_to_kill
+        assert (max_enemies_on_screen + 1) * 9 * 2 <= max_x * max_y
+
+        # enemy slots, the initial enemies may exceed max_enemies_on_screen
+        self.enemy_slots = max(max_enemies_on_screen, self.initial_ennemies)
+        if max_projectiles is None:
+            # a projectile lives at most max(max_x, max_y) + 3 steps
+            max_projectiles = (self.enemy_slots + 1) * (max(max_x, max_y) + 3)
+        self.max_projectiles = max_projectiles
+
+        if obstacles == "low":
+            self.nb_obstacles = max_x * max_y // 80
+        elif obstacles == "high":
+            self.nb_obstacles = max_x * max_y // 20
+        else:
+            self.nb_obstacles = 0
+
+        self.probability_new_enemy = 0.01
+
+        # Rewards, same as TankEnv
+        self.reward_enemy_killed = 10
+        self.reward_player_dead = -20
+        self.reward_used_projectile = -0.1
+        self.reward_nothing = -0.01
+        self.timestep = -0.001
+
+        N, E, P = num_envs, self.enemy_slots, self.max_projectiles
+        self.action_space = spaces.MultiDiscrete(np.full(N, 6))
+        self.observation_space = spaces.Dict(
+            {
+                "player": spaces.Box(0, max(max_x, max_y, 4), (N, 3), np.int32),
+                "enemies": spaces.Box(0, max(max_x, max_y, 4), (N, E, 3), np.int32),
+                "enemies_alive": spaces.MultiBinary((N, E)),
+                "projectiles": spaces.Box(
+                    -PAD, max(max_x, max_y, 4), (N, P, 4), np.int32
+                ),
+                "projectiles_alive": spaces.MultiBinary((N, P)),
+                "obstacles": spaces.MultiBinary((N, max_x, max_y)),
+            }
+        )
+
+        # state of the games
+        ## tanks: x, y, direction
+        self.player = np.zeros((N, 3), dtype=np.int32)
+        self.enemies = np.zeros((N, E, 3), dtype=np.int32)
+        self.enemies_alive = np.zeros((N, E), dtype=bool)
+        ## projectiles: x, y, direction, from (0: player, 1: enemy)
+        self.projectiles = np.zeros((N, P, 4), dtype=np.int32)
+        self.projectiles_alive = np.zeros((N, P), dtype=bool)
+        ## obstacle centers
+        self.obstacle_grid = np.zeros((N, max_x, max_y), dtype=np.uint8)
+
+        ## padded grids, indexed [game, x + PAD, y + PAD]
+        shape = (N, max_x + 2 * PAD, max_y + 2 * PAD)
+        self.occupancy = np.zeros(shape, dtype=np.int16)  # tank and obstacle centers
+        self.obstacle_boxes = np.zeros(shape, dtype=bool)  # 3x3 obstacle footprints
+        # scratch grids, always left zeroed after use
+        self._enemy_boxes = np.zeros(shape, dtype=np.int8)
+        self._projectile_count = np.zeros((2,) + shape, dtype=np.int16)
+
+        self.score = np.zeros(N, dtype=np.float64)
+        self.kills = np.zeros(N, dtype=np.int32)
+        self.deaths = np.zeros(N, dtype=np.int32)
+        self.done = np.zeros(N, dtype=bool)
+
+        self.rng = np.random.default_rng()
+
+    # __________OBSERVATION__________#
+
+    def _observation(self) -> dict:
+        # live views on the state, overwritten by the next call to step
+        return {
+            "player": self.player,
+            "enemies": self.enemies,
+            "enemies_alive": self.enemies_alive,
+            "projectiles": self.projectiles,
+            "projectiles_alive": self.projectiles_alive,
+            "obstacles": self.obstacle_grid,
+        }
+
+    # __________PLACEMENT__________#
+
+    def _window_count(self, g, x, y, offsets) -> np.ndarray:
+        """Number of centers in the window around (x, y) for each game of g."""
+        return self.occupancy[
+            g[:, None], x[:, None] + PAD + offsets[0], y[:, None] + PAD + offsets[1]
+        ].sum(axis=1)
+
+    def _window_counts(self, g) -> np.ndarray:
+        """Number of centers in the 5x5 window of every cell of the board, for
+        each game of g, from 2D cumulative sums of the padded grid."""
+        c = np.cumsum(np.cumsum(self.occupancy[g], axis=1, dtype=np.int32), axis=2)
+        c = np.pad(c, ((0, 0), (1, 0), (1, 0)))
+        return c[:, 5:, 5:] - c[:, :-5, 5:] - c[:, 5:, :-5] + c[:, :-5, :-5]
+
+    def _place(self, g, rounds: int = 4) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Draws a position with a clear 5x5 window in each game of g,
+        uniformly among the free cells like OccupancyGrid.sample_free in
+        TankEnv (but from another random stream).
+
+        A few rounds of rejection sampling place most tanks while the board
+        is sparse; the games still pending then draw from the list of their
+        free cells.
+
+        Returns:
+            x, y and a mask of the games where a position was found.
+        """
+        x = np.zeros(len(g), dtype=np.int32)
+        y = np.zeros(len(g), dtype=np.int32)
+        placed = np.zeros(len(g), dtype=bool)
+        pending = np.arange(len(g))
+        for _ in range(rounds):
+            if pending.size == 0:
+                return x, y, placed
+            cx = self.rng.integers(0, self.max_x, pending.size, dtype=np.int32)
+            cy = self.rng.integers(0, self.max_y, pending.size, dtype=np.int32)
+            free = self._window_count(g[pending], cx, cy, OFFSETS_5) == 0
+            x[pending[free]] = cx[free]
+            y[pending[free]] = cy[free]
+            placed[pending[free]] = True
+            pending = pending[~free]
+        if pending.size == 0:
+            return x, y, placed
+
+        free = self._window_counts(g[pending]).reshape(pending.size, -1) == 0
+        n_free = free.sum(axis=1)
+        # the k-th free cell of each game, k uniform below its number of free cells
+        k = (self.rng.random(pending.size) * n_free).astype(np.int64)
+        cell = np.argmax(np.cumsum(free, axis=1) > k[:, None], axis=1)
+        found = n_free > 0
+        x[pending[found]] = cell[found] // self.max_y
+        y[pending[found]] = cell[found] % self.max_y
+        placed[pending[found]] = True
+        return x, y, placed
+
+    def _spawn_enemies(self, g) -> None:
+        """Spawns one enemy in the first free slot of each game of g. Games
+        without a free cell left get none, like TankEnv, which tries again at
+        the next step."""
+        x, y, placed = self._place(g)
+        g, x, y = g[placed], x[placed], y[placed]
+        slot = np.argmin(self.enemies_alive[g], axis=1)
+        self.enemies[g, slot, 0] = x
+        self.enemies[g, slot, 1] = y
+        self.enemies[g, slot, 2] = self.rng.integers(0, 4, len(g))
+        self.enemies_alive[g, slot] = True
+        self.occupancy[g, x + PAD, y + PAD] += 1
+
+    def _reset_games(self, g) -> None:
+        self.occupancy[g] = 0
+        self.obstacle_boxes[g] = False
+        self.obstacle_grid[g] = 0
+        self.enemies_alive[g] = False
+        self.projectiles_alive[g] = False
+        self.score[g] = 0
+        self.kills[g] = 0
+        self.deaths[g] = 0
+        self.done[g] = False
+
+        # place the player
+        ## strategy : random
+        x = self.rng.integers(0, self.max_x, len(g), dtype=np.int32)
+        y = self.rng.integers(0, self.max_y, len(g), dtype=np.int32)
+        self.player[g, 0] = x
+        self.player[g, 1] = y
+        self.player[g, 2] = self.rng.integers(0, 4, len(g))
+        self.occupancy[g, x + PAD, y + PAD] += 1
+
+        # place obstacles
+        ## strategy: random
+        if self.nb_obstacles > 1:
+            for _ in range(self.nb_obstacles):
+                # a full board gets fewer obstacles rather than stopping the batch
+                x, y, placed = self._place(g)
+                h, x, y = g[placed], x[placed], y[placed]
+                self.obstacle_grid[h, x, y] = 1
+                self.occupancy[h, x + PAD, y + PAD] += 1
+                for i, j in OFFSETS_3.T:
+                    self.obstacle_boxes[h, x + PAD + i, y + PAD + j] = True
+
+        # place enemies
+        for _ in range(self.initial_ennemies):
+            self._spawn_enemies(g)
+
+    def reset(self, *, seed: int | None = None, options: dict | None = None) -> tuple:
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_games(np.arange(self.num_envs))
+        return (self._observation(), {})
+
+    # __________CLEANING__________#
+
+    def clean(self, g, p) -> tuple[np.ndarray, np.ndarray]:
+        """Cancels opposing projectiles, removes projectiles hitting obstacles
+        and kills enemies hit by the player's projectiles.
+
+        Args:
+            g, p (np.ndarray): game and slot of the alive projectiles.
+
+        Returns:
+            Game and slot of the projectiles still alive.
+        """
+        if g.size == 0:
+            return g, p
+        px = self.projectiles[g, p, 0] + PAD
+        py = self.projectiles[g, p, 1] + PAD
+        label = self.projectiles[g, p, 3]
+
+        ## canceling projectiles that touch each other
+        # projectiles of each side are counted per cell, a projectile is only
+        # a candidate if the other side has one on the same cell
+        count = self._projectile_count
+        np.add.at(count, (label, g, px, py), 1)
+        opposite = count[1 - label, g, px, py]
+        count[label, g, px, py] = 0
+        candidates = np.flatnonzero(opposite > 0)
+        removed = np.zeros(g.size, dtype=bool)
+        if candidates.size:
+            # pairs cancel: the k-th projectile of a side on a cell survives
+            # only if the other side has at most k projectiles there
+            key = (g[candidates] * count.shape[2] + px[candidates]) * count.shape[
+                3
+            ] + py[candidates]
+            order = np.lexsort((label[candidates], key))
+            sorted_key = key[order] * 2 + label[candidates][order]
+            first = np.r_[True, sorted_key[1:] != sorted_key[:-1]]
+            start = np.maximum.accumulate(np.where(first, np.arange(order.size), 0))
+            rank = np.empty(order.size, dtype=np.int64)
+            rank[order] = np.arange(order.size) - start
+            removed[candidates[rank < opposite[candidates]]] = True
+
+        ## projectiles hitting obstacles are absorbed
+        removed |= self.obstacle_boxes[g, px, py]
+
+        ## player's projectiles hitting enemies
+        ## reward_enemy_killed for each defeated enemy
+        eg, ek = np.nonzero(self.enemies_alive)
+        if eg.size:
+            ex = self.enemies[eg, ek, 0, None] + PAD + OFFSETS_3[0]
+            ey = self.enemies[eg, ek, 1, None] + PAD + OFFSETS_3[1]
+            boxes = self._enemy_boxes
+            boxes[eg[:, None], ex, ey] = ek[:, None] + 1
+            shooter = np.flatnonzero((label == 0) & ~removed)
+            hit = boxes[g[shooter], px[shooter], py[shooter]] - 1
+            boxes[eg[:, None], ex, ey] = 0
+
+            shooter, hit = shooter[hit >= 0], hit[hit >= 0]
+            if shooter.size:
+                # one projectile per killed enemy is used
+                _, first = np.unique(
+                    g[shooter] * self.enemy_slots + hit, return_index=True
+                )
+                shooter, hit = shooter[first], hit[first]
+                kg = g[shooter]
+                removed[shooter] = True
+                self.enemies_alive[kg, hit] = False
+                self.occupancy[
+                    kg, self.enemies[kg, hit, 0] + PAD, self.enemies[kg, hit, 1] + PAD
+                ] -= 1
+                np.add.at(self.kills, kg, 1)
+                np.add.at(self.score, kg, self.reward_enemy_killed)
+
+        self.projectiles_alive[g[removed], p[removed]] = False
+        return g[~removed], p[~removed]
+
+    def check_death(self, g, p) -> None:
+        """Checks if the players are hit by an enemy projectile. Hit games are
+        marked as done and the penalty is applied.
+
+        Args:
+            g, p (np.ndarray): game and slot of the alive projectiles.
+        """
+        hit = (
+            (self.projectiles[g, p, 3] == 1)
+            & (np.abs(self.projectiles[g, p, 0] - self.player[g, 0]) <= 1)
+            & (np.abs(self.projectiles[g, p, 1] - self.player[g, 1]) <= 1)
+        )
+        g, p = g[hit], p[hit]
+        self.projectiles_alive[g, p] = False
+        np.add.at(self.deaths, g, 1)
+        np.add.at(self.score, g, self.reward_player_dead)
+        self.done[g] = True
+
+    # __________UPDATE__________#
+
+    def _update_tanks(self, g, tanks, action, label: int) -> None:
+        """Vectorized Tank.update for one tank in each game of g.
+
+        Args:
+            g (np.ndarray): games to update, without duplicates.
+            tanks (np.ndarray): (len(g), 3) x, y, direction of the tanks, updated in place.
+            action (np.ndarray): action of each tank.
+            label (int): 0 for the player, 1 for enemies.
+        """
+        x, y, d = tanks[:, 0], tanks[:, 1], tanks[:, 2]
+        turn = action < 4
+        forward = turn & (d == action)
+
+        # if it doesn't match, rotate
+        rotate = turn & ~forward
+        d[rotate] = action[rotate]
+
+        # if it matches, move forward when the 5x5 window is clear
+        nx = x + DX[d]
+        ny = y + DY[d]
+        move = forward & (nx >= 0) & (nx < self.max_x) & (ny >= 0) & (ny < self.max_y)
+        m = np.flatnonzero(move)
+        if m.size:
+            # the tank's own center is in the window around its target
+            free = self._window_count(g[m], nx[m], ny[m], OFFSETS_5) == 1
+            m = m[free]
+            self.occupancy[g[m], x[m] + PAD, y[m] + PAD] -= 1
+            self.occupancy[g[m], nx[m] + PAD, ny[m] + PAD] += 1
+            x[m] = nx[m]
+            y[m] = ny[m]
+
+        # shoot
+        s = np.flatnonzero(action == 5)
+        if s.size:
+            sg = g[s]
+            slot = np.argmin(self.projectiles_alive[sg], axis=1)
+            # drop the shot if every slot is in use
+            ok = ~self.projectiles_alive[sg, slot]
+            s, sg, slot = s[ok], sg[ok], slot[ok]
+            self.projectiles[sg, slot, 0] = x[s] + 2 * DX[d[s]]
+            self.projectiles[sg, slot, 1] = y[s] + 2 * DY[d[s]]
+            self.projectiles[sg, slot, 2] = d[s]
+            self.projectiles[sg, slot, 3] = label
+            self.projectiles_alive[sg, slot] = True
+
+    def _update_enemies(self) -> None:
+        """Strategy 2 of Tank.update_strategic for every enemy, slot by slot."""
+        # all the randomness of the step in one draw
+        u = self.rng.random((self.enemy_slots, 2, self.num_envs))
+        r = self.rng.integers(0, 6, (self.enemy_slots, self.num_envs))
+
+        for k in range(self.enemy_slots):
+            g = np.flatnonzero(self.enemies_alive[:, k])
+            if g.size == 0:
+                continue
+            tanks = self.enemies[g, k]
+            x, y, d = tanks[:, 0], tanks[:, 1], tanks[:, 2]
+            px, py = self.player[g, 0], self.player[g, 1]
+
+            # go to the player
+            towards = np.select(
+                [x < px, x > px, y < py, y > py], [1, 3, 2, 0], default=4
+            )
+            # else follow its direction, else random
+            action = np.where(
+                u[k, 0, g] < 0.1,
+                towards,
+                np.where(u[k, 1, g] < 0.7, d, r[k, g]),
+            )
+            self._update_tanks(g, tanks, action, label=1)
+            self.enemies[g, k] = tanks
+
+    def _update_projectiles(self) -> None:
+        g, p = np.nonzero(self.projectiles_alive)
+        d = self.projectiles[g, p, 2]
+        x = self.projectiles[g, p, 0] + DX[d]
+        y = self.projectiles[g, p, 1] + DY[d]
+        self.projectiles[g, p, 0] = x
+        self.projectiles[g, p, 1] = y
+        # out of boundaries, +1 because of padding
+        out = (x <= -1) | (x > self.max_x) | (y <= -1) | (y > self.max_y)
+        self.projectiles_alive[g[out], p[out]] = False
+
+    def step(self, actions) -> tuple[dict, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Advances every game by one step.
+
+        Args:
+            actions (np.ndarray): (num_envs,) action of each player.
+
+        Returns:
+            Observation, rewards, terminated and truncated flags, and info.
+            Finished games are already reset in the returned observation, their
+            final score is given in `info["final_score"]`.
+        """
+        actions = np.asarray(actions)
+        all_games = np.arange(self.num_envs)
+        reward = np.full(self.num_envs, self.timestep)
+
+        g, p = self.clean(*np.nonzero(self.projectiles_alive))
+
+        # Add 1 enemy if the number of active enemies is less than max_enemies
+        ## strategy: randomly with a probability of self.probability_new_enemy
+        n_enemies = self.enemies_alive.sum(axis=1)
+        spawn = (
+            (n_enemies < self.max_enemies_on_screen)
+            & (self.rng.random(self.num_envs) < self.probability_new_enemy)
+        ) | (n_enemies == 0)
+        if spawn.any():
+            self._spawn_enemies(np.flatnonzero(spawn))
+
+        # Check if the player is dead
+        self.check_death(g, p)
+        self.done |= self.kills >= self.total_ennemies_to_kill
+
+        ##################### update #####################
+
+        player = self.player.copy()
+        self._update_tanks(all_games, player, actions, label=0)
+        self.player[:] = player
+        reward[actions == 4] += self.reward_nothing
+        reward[actions == 5] += self.reward_used_projectile
+
+        self._update_enemies()
+        self._update_projectiles()
+
+        ##################### update done #####################
+
+        self.score += reward
+        terminated = self.done.copy()
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        info = {}
+        if terminated.any():
+            finished = np.flatnonzero(terminated)
+            info["final_score"] = np.where(terminated, self.score, 0.0)
+            info["final_kills"] = np.where(terminated, self.kills, 0)
+            self._reset_games(finished)
+
+        return (self._observation(), reward, terminated, truncated, info)
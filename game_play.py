@@ -1,8 +1,13 @@
-import pygame
+import argparse
+import threading
+import time
+
 import numpy as np
+import pygame
 
 from envs import TankEnv
 from utils.coloring import Color
+from utils.renderer import FrameRenderer, Upscaler
 
 
 def main(env: TankEnv):
@@ -12,6 +17,7 @@ def main(env: TankEnv):
     screen = pygame.display.set_mode(screen_size)
     clock = pygame.time.Clock()
     font = pygame.font.Font(None, 36)
+    upscaler = Upscaler(scale=18)  # Scale up for visibility
 
     running = True
     while running:
@@ -44,11 +50,7 @@ def main(env: TankEnv):
 
         # Render the game state
         frame = env.render()
-        frame = np.repeat(
-            np.repeat(frame, 18, axis=0), 18, axis=1
-        )  # Scale up for visibility
-        surface = pygame.surfarray.make_surface(frame)
-        screen.blit(surface, (0, 0))
+        screen.blit(upscaler.to_surface(frame), (0, 0))
 
         # display score
         value = int(state["player"].score)
@@ -72,13 +74,204 @@ def main(env: TankEnv):
     # if agent mode, continue for n_ep times
 
 
+# __________PIPELINED__________#
+
+
+class FrameBuffer:
+    """Double buffer of rendered frames between a simulation thread and a
+    render thread.
+
+    The simulation renders each step into the back frame, then swaps it with
+    the front one; the render thread only ever reads the front frame, the
+    newest one. Frames published while the render thread was busy are never
+    shown: they are counted as dropped instead of slowing the simulation.
+
+    Args:
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+    """
+
+    def __init__(self, max_x: int, max_y: int):
+        self.renderer = FrameRenderer(max_x, max_y)
+        shape = (max_y + 2, max_x + 2, 3)
+        self.frames = [np.zeros(shape, dtype=np.uint8) for _ in range(2)]
+        self.scores = [0, 0]
+        self.front = 0
+        self.published = 0  # frames published so far
+        self.shown = 0  # number of the last frame taken by the render thread
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def publish(self, state: dict) -> None:
+        """Renders `state` into the back frame and makes it the front one,
+        from the simulation thread."""
+        back = 1 - self.front
+        self.renderer.render(state, out=self.frames[back])
+        self.scores[back] = int(state["player"].score)
+        with self.lock:
+            self.front = back
+            self.published += 1
+
+    def take(self, convert):
+        """Calls `convert(frame, score)` on the newest frame if it was not
+        shown yet, from the render thread, and returns its result (None if
+        there is no new frame). The simulation does not swap during the
+        call, so it should be short, e.g. an upscale into a surface."""
+        with self.lock:
+            if self.published == self.shown:
+                return None
+            self.dropped += self.published - self.shown - 1
+            self.shown = self.published
+            return convert(self.frames[self.front], self.scores[self.front])
+
+
+class KeyboardInput:
+    """Latest action of the keyboard, shared with the simulation thread.
+
+    A key held down repeats its action at every tick; a key pressed and
+    released between two ticks still plays once.
+    """
+
+    KEY_TO_ACTION = {
+        pygame.K_LEFT: 0,
+        pygame.K_DOWN: 1,
+        pygame.K_RIGHT: 2,
+        pygame.K_UP: 3,
+        pygame.K_SPACE: 5,  # Shoot
+    }
+
+    def __init__(self):
+        self.held = 4  # stay
+        self.pressed = None
+
+    def poll(self, events) -> None:
+        """Reads the keyboard, from the render thread."""
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key in self.KEY_TO_ACTION:
+                self.pressed = self.KEY_TO_ACTION[event.key]
+        keys = pygame.key.get_pressed()
+        self.held = 4
+        for key, act in self.KEY_TO_ACTION.items():
+            if keys[key]:
+                self.held = act
+                break
+
+    def __call__(self, state) -> int:
+        """Action of the next tick, from the simulation thread."""
+        action, self.pressed = self.pressed, None
+        return self.held if action is None else action
+
+
+def simulate(env: TankEnv, policy, frames: FrameBuffer, stop, fps: float, errors):
+    """Steps `env` with the actions of `policy(state)` at `fps` steps per
+    second (0: as fast as possible) and publishes every step to `frames`,
+    until `stop` is set."""
+    try:
+        state = env.state
+        frames.publish(state)
+        period = 1 / fps if fps > 0 else 0.0
+        deadline = time.perf_counter()
+        while not stop.is_set():
+            state, _, done, trunc, _ = env.step(policy(state))
+            if done or trunc:
+                env.reset()
+                state = env.state
+            frames.publish(state)
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.perf_counter()  # late: no burst to catch up
+    except Exception as error:
+        errors.append(error)
+        stop.set()
+
+
+def main_pipelined(env: TankEnv, sim_fps=9, display_fps=60, policy=None):
+    """Plays (or, with a `policy`, watches an agent play) with the simulation
+    and the display on separate threads: the simulation ticks at `sim_fps`
+    whatever the display does, the display shows the newest frame at up to
+    `display_fps` and counts the frames it never got to show.
+
+    Args:
+        env (TankEnv): Environment, already reset.
+        sim_fps (float): Steps per second, 0 for as fast as possible.
+        display_fps (float): Maximum frames per second displayed.
+        policy (callable | None): state -> action, the keyboard if None.
+    """
+    screen_size = (env.max_x * 20, env.max_y * 20)  # Scale up the game screen
+    screen = pygame.display.set_mode(screen_size)
+    clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 36)
+    small_font = pygame.font.Font(None, 24)
+    upscaler = Upscaler(scale=18)  # Scale up for visibility
+
+    keyboard = KeyboardInput() if policy is None else None
+    frames = FrameBuffer(env.max_x, env.max_y)
+    stop = threading.Event()
+    errors = []
+    sim = threading.Thread(
+        target=simulate,
+        args=(env, policy or keyboard, frames, stop, sim_fps, errors),
+        daemon=True,
+    )
+    sim.start()
+
+    score = None
+    while not stop.is_set():
+        events = pygame.event.get()
+        if any(event.type == pygame.QUIT for event in events):
+            stop.set()
+        if keyboard is not None:
+            keyboard.poll(events)
+
+        # only the newest frame, copied to the surface under the lock
+        taken = frames.take(lambda frame, value: (upscaler.to_surface(frame), value))
+        if taken is not None:
+            surface, score = taken
+            screen.blit(surface, (0, 0))
+
+            # display score
+            color = Color.positive_score if score >= 0 else Color.negative_score
+            score_surface = font.render(f"Score: {score}", True, color.value)
+            screen.blit(
+                score_surface, (screen.get_width() - score_surface.get_width() - 10, 10)
+            )
+            # display dropped frames
+            dropped = small_font.render(
+                f"dropped: {frames.dropped}", True, Color.negative_score.value
+            )
+            screen.blit(dropped, (10, 10))
+            pygame.display.flip()
+
+        clock.tick(display_fps)
+
+    sim.join()
+    if errors:
+        raise errors[0]
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play the tank game.")
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="simulate and display on separate threads",
+    )
+    parser.add_argument("--sim-fps", type=float, default=9, help="0: flat out")
+    parser.add_argument("--display-fps", type=float, default=60)
+    args = parser.parse_args()
+
     # Initialize pygame and the environment
     pygame.init()
     env = TankEnv(obstacles="")
     env.reset()
 
     # Run the game
-    main(env)
+    if args.pipelined:
+        main_pipelined(env, args.sim_fps, args.display_fps)
+    else:
+        main(env)
 
     pygame.quit()
@@ -0,0 +1,334 @@
+"""Asyncio server hosting many TankEnv games on one tick loop.
+
+Each client connection (a human front end or a bot) gets its own game. At
+every tick of a fixed-rate scheduler, every game is stepped with the last
+action its client sent, and its observation is sent back. A client whose
+socket does not drain is backpressured: its game is paused until the
+socket drains, and the client is dropped if that takes too long, so slow
+clients never hold back the others.
+
+Protocol (little-endian, over TCP or a Unix socket):
+    server -> client, once: HELLO (magic, session id, max_x, max_y)
+    server -> client, every tick: OBSERVATION header (tick, reward, flags,
+        number of entities, number of obstacles), then one int16 row
+        (x, y, direction, label) per entity: the player, the enemies, then
+        the projectiles; then one int16 row (x, y) per obstacle, only in the
+        first observation of an episode (flag NEW_EPISODE).
+    client -> server: one byte per action (0 to 5), the last one received
+        before a tick is played, 4 (stay) if none.
+Games are reset automatically: the observation of the last step carries
+TERMINATED or TRUNCATED, and is that of the first step of the next game.
+
+Usage:
+    python game_server.py serve --port 8765 --tick-rate 30
+    python game_server.py load --port 8765 --clients 200 --duration 10
+"""
+
+import argparse
+import asyncio
+import collections
+import struct
+import sys
+import time
+
+import numpy as np
+
+from envs import TankEnv
+
+MAGIC = b"TNK1"
+HELLO = struct.Struct("<4sIHH")  # magic, session id, max_x, max_y
+OBSERVATION = struct.Struct("<IfBHH")  # tick, reward, flags, entities, obstacles
+
+# Observation flags
+TERMINATED = 1
+TRUNCATED = 2
+NEW_EPISODE = 4
+
+STAY = 4
+
+# Tick durations kept for the report, the most recent ones
+TICK_TIMES = 4096
+
+
+# __________PROTOCOL__________#
+
+
+def encode_observation(env: TankEnv, tick: int, reward: float, flags: int) -> bytes:
+    state = env.state
+    rows = [state["player"].info()]
+    rows += [enemy.info() for enemy in state["enemies"]]
+    rows += [projectile.info() for projectile in state["projectiles"]]
+    obstacles = sorted(state["obstacles"]) if flags & NEW_EPISODE else []
+    return b"".join(
+        (
+            OBSERVATION.pack(tick, reward, flags, len(rows), len(obstacles)),
+            np.array(rows, dtype=np.int16).tobytes(),
+            np.array(obstacles, dtype=np.int16).tobytes(),
+        )
+    )
+
+
+async def read_observation(reader: asyncio.StreamReader) -> dict:
+    """Reads one observation sent by the server."""
+    header = await reader.readexactly(OBSERVATION.size)
+    tick, reward, flags, n_entities, n_obstacles = OBSERVATION.unpack(header)
+    body = await reader.readexactly(8 * n_entities + 4 * n_obstacles)
+    entities = np.frombuffer(body, dtype=np.int16, count=4 * n_entities)
+    obstacles = np.frombuffer(
+        body, dtype=np.int16, count=2 * n_obstacles, offset=8 * n_entities
+    )
+    return {
+        "tick": tick,
+        "reward": reward,
+        "flags": flags,
+        "entities": entities.reshape(-1, 4),  # x, y, direction, label
+        "obstacles": obstacles.reshape(-1, 2),
+    }
+
+
+# __________SERVER__________#
+
+
+class Session(asyncio.Protocol):
+    """One client connection and its game."""
+
+    def __init__(self, server: "GameServer"):
+        self.server = server
+        self.transport = None
+        self.env = None
+        self.action = STAY
+        self.paused_since = None  # loop time at which writing was paused
+
+    def connection_made(self, transport) -> None:
+        server = self.server
+        self.transport = transport
+        transport.set_write_buffer_limits(high=server.write_buffer)
+        self.id = server.next_id
+        server.next_id += 1
+        self.env = TankEnv(**server.env_kwargs)
+        seed = None if server.seed is None else server.seed + self.id
+        self.env.reset(seed=seed)
+        max_x, max_y = self.env.max_x, self.env.max_y
+        transport.write(HELLO.pack(MAGIC, self.id, max_x, max_y))
+        transport.write(encode_observation(self.env, server.ticks, 0.0, NEW_EPISODE))
+        server.sessions[self.id] = self
+
+    def data_received(self, data: bytes) -> None:
+        # only the last valid action before the tick counts
+        for byte in reversed(data):
+            if byte < 6:
+                self.action = byte
+                break
+
+    def pause_writing(self) -> None:
+        self.paused_since = asyncio.get_running_loop().time()
+
+    def resume_writing(self) -> None:
+        self.paused_since = None
+
+    def connection_lost(self, exc) -> None:
+        self.server.sessions.pop(self.id, None)
+
+    def step(self, tick: int) -> None:
+        env = self.env
+        _, reward, terminated, truncated, _ = env.step(self.action)
+        self.action = STAY
+        flags = TERMINATED * bool(terminated) | TRUNCATED * bool(truncated)
+        if terminated or truncated:
+            env.reset()
+            flags |= NEW_EPISODE
+        self.transport.write(encode_observation(env, tick, reward, flags))
+
+
+class GameServer:
+    """Hosts one TankEnv per connection and steps all of them at each tick.
+
+    Args:
+        env_kwargs (dict): Arguments of the TankEnv of every session.
+        tick_rate (float): Ticks per second, 0 to tick as fast as possible.
+        write_buffer (int): Bytes of pending output after which a session is
+            paused until its client catches up.
+        stall_timeout (float): Seconds a session may stay paused before its
+            client is disconnected.
+        seed (int | None): Session i plays with seed + i.
+    """
+
+    def __init__(
+        self,
+        env_kwargs: dict,
+        tick_rate: float = 30,
+        write_buffer: int = 1 << 16,
+        stall_timeout: float = 5.0,
+        seed: int | None = None,
+    ):
+        self.env_kwargs = env_kwargs
+        self.tick_rate = tick_rate
+        self.write_buffer = write_buffer
+        self.stall_timeout = stall_timeout
+        self.seed = seed
+        self.sessions = {}  # id -> Session
+        self.next_id = 0
+        self.ticks = 0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.stats = {"ticks": 0, "steps": 0, "paused": 0, "dropped": 0}
+        self.tick_times = collections.deque(maxlen=TICK_TIMES)
+        self.late_ticks = 0
+
+    def tick(self, now: float) -> None:
+        """Steps every session whose client keeps up."""
+        self.ticks += 1
+        stats = self.stats
+        for session in list(self.sessions.values()):
+            if session.paused_since is not None:
+                stats["paused"] += 1
+                if now - session.paused_since > self.stall_timeout:
+                    # connection_lost only comes at the next loop iteration
+                    stats["dropped"] += 1
+                    self.sessions.pop(session.id, None)
+                    session.transport.abort()
+                continue
+            session.step(self.ticks)
+            stats["steps"] += 1
+        stats["ticks"] += 1
+
+    async def run(self) -> None:
+        """Fixed-rate tick loop. A late tick is played at once, but the
+        schedule restarts from it rather than bursting to catch up."""
+        loop = asyncio.get_running_loop()
+        period = 1 / self.tick_rate if self.tick_rate > 0 else 0.0
+        deadline = loop.time()
+        while True:
+            delay = deadline - loop.time()
+            if period and delay < -period:
+                self.late_ticks += 1
+                deadline = loop.time()
+            # also lets the loop serve the sockets when ticking flat out
+            await asyncio.sleep(max(delay, 0))
+            t0 = time.perf_counter()
+            self.tick(loop.time())
+            self.tick_times.append(time.perf_counter() - t0)
+            deadline += period
+
+    async def report(self, every: float) -> None:
+        """Prints the load of the server every `every` seconds."""
+        while True:
+            await asyncio.sleep(every)
+            stats = self.stats
+            times = np.array(self.tick_times or [0.0]) * 1e3
+            print(
+                f"sessions {len(self.sessions):5d}  "
+                f"ticks {stats['ticks'] / every:7.1f}/s  "
+                f"steps {stats['steps'] / every:9.0f}/s  "
+                f"tick p50/max {np.median(times):6.2f}/{times.max():6.2f} ms  "
+                f"late {self.late_ticks}  paused {stats['paused']}  "
+                f"dropped {stats['dropped']}",
+                file=sys.stderr,
+            )
+            self.reset_stats()
+
+    async def serve(self, host=None, port=None, path=None, report_every=5.0):
+        # hundreds of clients may connect at once
+        backlog = 1024
+        loop = asyncio.get_running_loop()
+        if path is not None:
+            server = await loop.create_unix_server(
+                lambda: Session(self), path, backlog=backlog
+            )
+        else:
+            server = await loop.create_server(
+                lambda: Session(self), host, port, backlog=backlog
+            )
+        async with server:
+            tasks = [asyncio.create_task(self.run())]
+            if report_every > 0:
+                tasks.append(asyncio.create_task(self.report(report_every)))
+            await asyncio.gather(*tasks)
+
+
+# __________LOAD TEST__________#
+
+
+async def bot(host, port, path, duration: float, rng, counts: list) -> None:
+    """Client answering each observation with a random action."""
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    magic, _, _, _ = HELLO.unpack(await reader.readexactly(HELLO.size))
+    assert magic == MAGIC, "not a tank game server"
+    end = time.perf_counter() + duration
+    try:
+        while time.perf_counter() < end:
+            await read_observation(reader)
+            counts[0] += 1
+            writer.write(bytes([rng.integers(6)]))
+    except asyncio.IncompleteReadError:
+        counts[1] += 1  # disconnected by the server
+    finally:
+        writer.close()
+
+
+async def load_test(args) -> None:
+    rng = np.random.default_rng(args.seed)
+    counts = [0, 0]  # observations received, disconnections
+    t0 = time.perf_counter()
+    await asyncio.gather(
+        *(
+            bot(args.host, args.port, args.unix, args.duration, rng, counts)
+            for _ in range(args.clients)
+        )
+    )
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{args.clients} clients: {counts[0] / elapsed:.0f} observations/s, "
+        f"{counts[0] / elapsed / args.clients:.1f}/s per client, "
+        f"{counts[1]} disconnected"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["serve", "load"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Unix socket path, over TCP")
+    parser.add_argument("--seed", type=int, default=None)
+    # serve
+    parser.add_argument("--tick-rate", type=float, default=30, help="0: flat out")
+    parser.add_argument("--max-x", type=int, default=20)
+    parser.add_argument("--max-y", type=int, default=20)
+    parser.add_argument("--obstacles", default="", choices=["", "low", "high"])
+    parser.add_argument("--pursuit", default="direct", choices=["direct", "path"])
+    parser.add_argument("--write-buffer", type=int, default=1 << 16)
+    parser.add_argument("--stall-timeout", type=float, default=5.0)
+    parser.add_argument("--report-every", type=float, default=5.0)
+    # load
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.command == "load":
+        asyncio.run(load_test(args))
+        return
+    server = GameServer(
+        {
+            "max_x": args.max_x,
+            "max_y": args.max_y,
+            "obstacles": args.obstacles,
+            "pursuit": args.pursuit,
+        },
+        tick_rate=args.tick_rate,
+        write_buffer=args.write_buffer,
+        stall_timeout=args.stall_timeout,
+        seed=args.seed,
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report_every))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
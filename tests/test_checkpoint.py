@@ -0,0 +1,67 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from agents.features import FEATURES_VERSION
+from agents.Q_table_agent import QTable, SharedQTable
+from train_q_table import load_checkpoint, save_checkpoint
+
+
+@pytest.fixture
+def shared_table():
+    """Makes SharedQTables and frees their memory after the test."""
+    tables = []
+
+    def make(*args, **kwargs):
+        tables.append(SharedQTable(*args, **kwargs))
+        return tables[-1]
+
+    yield make
+    for table in reversed(tables):
+        table.close()
+
+
+def test_checkpoint_round_trip_into_shared_memory(tmp_path, shared_table):
+    path = str(tmp_path / "q_table.npz")
+    source = shared_table(10, 6)
+    source.set_q_table(np.random.default_rng(0).normal(size=source.q_table.shape))
+    save_checkpoint(path, source, episode=42, epsilon=0.25)
+    assert [p.name for p in tmp_path.iterdir()] == ["q_table.npz"]
+
+    agent = shared_table(10, 6)
+    ## a worker attached before the load sees the loaded values
+    worker = pickle.loads(pickle.dumps(agent))
+    try:
+        assert load_checkpoint(path, agent) == (42, 0.25)
+        np.testing.assert_array_equal(agent.q_table, source.q_table)
+        np.testing.assert_array_equal(worker.q_table, source.q_table)
+    finally:
+        worker.close()
+
+
+def write_checkpoint(path, q_table, **version):
+    np.savez(path, q_table=q_table, episode=1, epsilon=0.5, **version)
+
+
+@pytest.mark.parametrize(
+    "version, message",
+    [({}, "version 1,"), ({"features_version": FEATURES_VERSION - 1}, "retrain")],
+)
+def test_checkpoints_of_other_features_are_refused(
+    tmp_path, shared_table, version, message
+):
+    path = str(tmp_path / "old.npz")
+    agent = shared_table(10, 6)
+    write_checkpoint(path, np.ones(agent.q_table.shape), **version)
+    with pytest.raises(AssertionError, match=message):
+        load_checkpoint(path, agent)
+    ## the table is left untouched
+    assert not agent.q_table.any()
+
+
+def test_checkpoint_of_another_shape_is_refused(tmp_path):
+    path = str(tmp_path / "q_table.npz")
+    save_checkpoint(path, QTable(10, 6), episode=0, epsilon=1.0)
+    with pytest.raises(AssertionError):
+        load_checkpoint(path, QTable(12, 6))
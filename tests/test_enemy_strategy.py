@@ -0,0 +1,70 @@
+import copy
+
+import numpy as np
+import pytest
+
+from envs import TankEnv
+from envs.game_elements import Tank
+
+
+def chosen_action(monkeypatch, strategy, draws, rng=None) -> int:
+    """Action an enemy facing up, with the player to its right, picks."""
+    actions = []
+    monkeypatch.setattr(
+        Tank, "update", lambda self, action, *args: actions.append(action)
+    )
+    enemy = Tank(10, 10, 0)
+    state = {"player": Tank(20, 10, 0, label=0)}
+    enemy.update_strategic(state, None, None, strategy=strategy, rng=rng, draws=draws)
+    return actions[0]
+
+
+@pytest.mark.parametrize(
+    "strategy, draws, action",
+    [
+        (2, [0.05, 0.0, 0.0], 1),  # towards the player
+        (2, [0.5, 0.5, 0.9], 0),  # forward
+        (2, [0.5, 0.8, 0.9], 5),  # random, int(0.9 * 6)
+        (1, [0.05, 0.5, 0.9], 0),  # forward, strategy 1 ignores the player
+        (1, [0.05, 0.8, 0.4], 2),
+        (0, [0.05, 0.5, 0.2], 1),  # always random
+    ],
+)
+def test_draws_select_the_strategy_branch(monkeypatch, strategy, draws, action):
+    assert chosen_action(monkeypatch, strategy, draws) == action
+
+
+def test_strategy_2_frequencies(monkeypatch):
+    rng = np.random.default_rng(0)
+    n = 60000
+    actions = np.bincount(
+        [chosen_action(monkeypatch, 2, None, rng=rng) for _ in range(n)],
+        minlength=6,
+    )
+    ## 0.1 towards the player (1), 0.63 forward (0), 0.27 uniform
+    expected = np.full(6, 0.27 / 6)
+    expected[1] += 0.1
+    expected[0] += 0.63
+    np.testing.assert_allclose(actions / n, expected, atol=0.01)
+
+
+def test_step_hands_each_enemy_its_slice_of_the_draws(monkeypatch):
+    env = TankEnv(obstacles="low", obs_mode="array")
+    env.reset(seed=5)
+    received = []
+    update_strategic = Tank.update_strategic
+
+    def record(self, *args, draws=None, **kwargs):
+        received.append(draws)
+        return update_strategic(self, *args, draws=draws, **kwargs)
+
+    monkeypatch.setattr(Tank, "update_strategic", record)
+    for action in np.random.default_rng(1).integers(0, 6, 200):
+        rng = copy.deepcopy(env.np_random)
+        received.clear()
+        _, _, terminated, _, _ = env.step(int(action))
+        ## the step starts with one call for all its randomness
+        draws = rng.random(1 + 3 * env.enemy_slots).tolist()
+        assert received == [draws[1 + 3 * i : 4 + 3 * i] for i in range(len(received))]
+        if terminated:
+            env.reset()
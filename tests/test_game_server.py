@@ -0,0 +1,100 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from envs import TankEnv
+from game_server import (
+    NEW_EPISODE,
+    TERMINATED,
+    encode_observation,
+    read_observation,
+)
+
+
+def expected_observation(env: TankEnv, tick, reward, flags) -> dict:
+    state = env.state
+    rows = [state["player"].info()]
+    rows += [enemy.info() for enemy in state["enemies"]]
+    rows += [projectile.info() for projectile in state["projectiles"]]
+    obstacles = sorted(state["obstacles"]) if flags & NEW_EPISODE else []
+    return {
+        "tick": tick,
+        "reward": np.float32(reward),
+        "flags": flags,
+        "entities": np.array(rows).reshape(-1, 4),
+        "obstacles": np.array(obstacles).reshape(-1, 2),
+    }
+
+
+def play(steps: int) -> tuple[list, list]:
+    """Encoded messages of a few games, as the server sends them, and what
+    they should decode to."""
+    env = TankEnv(obstacles="low")
+    env.reset(seed=0)
+    rng = np.random.default_rng(0)
+    messages = [encode_observation(env, 0, 0.0, NEW_EPISODE)]
+    expected = [expected_observation(env, 0, 0.0, NEW_EPISODE)]
+    for tick in range(1, steps + 1):
+        _, reward, terminated, _, _ = env.step(int(rng.integers(6)))
+        flags = 0
+        if terminated:
+            env.reset()
+            flags = TERMINATED | NEW_EPISODE
+        messages.append(encode_observation(env, tick, reward, flags))
+        expected.append(expected_observation(env, tick, reward, flags))
+    return messages, expected
+
+
+def assert_same(observation: dict, expected: dict) -> None:
+    assert observation.keys() == expected.keys()
+    for key, value in expected.items():
+        np.testing.assert_array_equal(observation[key], value, err_msg=key)
+
+
+@pytest.mark.parametrize("chunk", [None, 1, 7])
+def test_observations_survive_the_stream(chunk):
+    messages, expected = play(1000)
+    ## several games, and obstacles sent only when a game starts
+    assert sum(e["flags"] & TERMINATED for e in expected) > 1
+    assert all(
+        (len(e["obstacles"]) > 0) == bool(e["flags"] & NEW_EPISODE) for e in expected
+    )
+    data = b"".join(messages)
+
+    async def feed(reader: asyncio.StreamReader) -> None:
+        ## split anywhere, as TCP may deliver it
+        for start in range(0, len(data), chunk):
+            reader.feed_data(data[start : start + chunk])
+            await asyncio.sleep(0)
+        reader.feed_eof()
+
+    async def read_all() -> list:
+        reader = asyncio.StreamReader()
+        if chunk is None:
+            reader.feed_data(data)
+            reader.feed_eof()
+        else:
+            feeder = asyncio.create_task(feed(reader))
+        observations = [await read_observation(reader) for _ in messages]
+        if chunk is not None:
+            await feeder
+        assert reader.at_eof()
+        return observations
+
+    observations = asyncio.run(read_all())
+    for observation, value in zip(observations, expected):
+        assert_same(observation, value)
+
+
+def test_truncated_stream_raises():
+    messages, _ = play(5)
+
+    async def read_truncated():
+        reader = asyncio.StreamReader()
+        reader.feed_data(messages[0][:-1])
+        reader.feed_eof()
+        await read_observation(reader)
+
+    with pytest.raises(asyncio.IncompleteReadError):
+        asyncio.run(read_truncated())
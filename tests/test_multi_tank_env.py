@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+from envs import MultiTankEnv
+from envs.game_elements import Tank
+
+
+def positions(env: MultiTankEnv) -> dict:
+    return {agent: tank.info() for agent, tank in env.tanks.items()}
+
+
+def place(env: MultiTankEnv, tanks: dict) -> None:
+    """Replaces the tanks of a reset env by `tanks`, agent -> (x, y, direction)."""
+    for tank in env.tanks.values():
+        env.occupancy.remove(tank.x, tank.y)
+    env.tanks = {}
+    env.agent_of = {}
+    for agent, (x, y, direction) in tanks.items():
+        tank = Tank(x, y, direction, label=env.teams[env.possible_agents.index(agent)])
+        env.tanks[agent] = tank
+        env.agent_of[tank] = agent
+        env.occupancy.add(x, y)
+    env.agents = list(env.tanks)
+
+
+def moves(env: MultiTankEnv, targets: dict) -> list:
+    movers = []
+    for agent, (x, y) in targets.items():
+        movers.append((agent, env.tanks[agent], x, y))
+    return movers
+
+
+def test_moves_do_not_depend_on_the_order_of_the_agents():
+    rng = np.random.default_rng(0)
+    for trial in range(100):
+        env = MultiTankEnv(num_agents=10, max_x=20, max_y=20)
+        env.reset(seed=trial)
+        start = positions(env)
+        targets = {}
+        for agent, (x, y, _, _) in start.items():
+            dx, dy = [(0, -1), (1, 0), (0, 1), (-1, 0)][rng.integers(4)]
+            targets[agent] = (x + dx, y + dy)
+
+        outcomes = set()
+        for _ in range(5):
+            order = rng.permutation(len(targets))
+            agents = [list(targets)[i] for i in order]
+            env.reset(seed=trial)
+            env._move_tanks(moves(env, {agent: targets[agent] for agent in agents}))
+            outcomes.add(tuple(sorted(positions(env).items())))
+        assert len(outcomes) == 1
+
+
+def test_contested_targets_block_both_movers():
+    env = MultiTankEnv(num_agents=3, max_x=20, max_y=20)
+    for order in (["tank_0", "tank_1"], ["tank_1", "tank_0"]):
+        env.reset(seed=0)
+        place(env, {"tank_0": (5, 10, 1), "tank_1": (11, 10, 3), "tank_2": (15, 2, 0)})
+        # tank_0 and tank_1 move towards each other, to targets 4 cells apart
+        targets = {"tank_0": (6, 10), "tank_1": (10, 10)}
+        env._move_tanks(moves(env, {agent: targets[agent] for agent in order}))
+        assert positions(env)["tank_0"][:2] == (6, 10)
+        assert positions(env)["tank_1"][:2] == (10, 10)
+
+        # one cell closer: the targets are within the 5x5 clearance
+        targets = {"tank_0": (7, 10), "tank_1": (9, 10)}
+        env._move_tanks(moves(env, {agent: targets[agent] for agent in order}))
+        assert positions(env)["tank_0"][:2] == (6, 10)
+        assert positions(env)["tank_1"][:2] == (10, 10)
+
+
+def test_a_tank_cannot_follow_one_that_moves_away():
+    # the clearance is checked against the board at the start of the tick
+    env = MultiTankEnv(num_agents=2, max_x=20, max_y=20)
+    for order in (["tank_0", "tank_1"], ["tank_1", "tank_0"]):
+        env.reset(seed=0)
+        place(env, {"tank_0": (5, 10, 1), "tank_1": (8, 10, 1)})
+        targets = {"tank_0": (6, 10), "tank_1": (9, 10)}
+        env._move_tanks(moves(env, {agent: targets[agent] for agent in order}))
+        assert positions(env)["tank_0"][:2] == (5, 10)
+        assert positions(env)["tank_1"][:2] == (9, 10)
+
+
+@pytest.mark.parametrize("teams", [None, [0, 1] * 4])
+def test_games_do_not_depend_on_the_order_of_the_agents(teams):
+    def summary(env, rewards):
+        tanks = sorted(
+            (agent, tank.info(), tank.kills, tank.deaths)
+            for agent, tank in env.tanks.items()
+        )
+        projectiles = sorted(projectile.info() for projectile in env.projectiles)
+        return tanks, projectiles, sorted(rewards.items())
+
+    for seed in range(5):
+        env = MultiTankEnv(num_agents=8, max_x=24, max_y=24, teams=teams)
+        other = MultiTankEnv(num_agents=8, max_x=24, max_y=24, teams=teams)
+        env.reset(seed=seed)
+        other.reset(seed=seed)
+        rng = np.random.default_rng(seed)
+        for _ in range(300):
+            if not env.agents:
+                break
+            actions = {agent: int(rng.integers(6)) for agent in env.agents}
+            # the other env iterates over its tanks and actions in another order
+            items = list(other.tanks.items())
+            other.tanks = dict(items[i] for i in rng.permutation(len(items)))
+            reversed_actions = dict(reversed(list(actions.items())))
+            rewards = env.step(actions)[1]
+            other_rewards = other.step(reversed_actions)[1]
+            assert summary(env, rewards) == summary(other, other_rewards)
+
+
+def test_invariants_and_observations():
+    env = MultiTankEnv(num_agents=12, max_x=40, max_y=40, obstacles="low")
+    observations, _ = env.reset(seed=1)
+    rng = np.random.default_rng(1)
+    for _ in range(1000):
+        if not env.agents:
+            observations, _ = env.reset()
+        actions = {agent: int(rng.integers(6)) for agent in env.agents}
+        observations, rewards, terminations, truncations, _ = env.step(actions)
+        assert set(observations) == set(rewards) == set(actions)
+        for agent, observation in observations.items():
+            assert env.observation_space(agent).contains(observation)
+        # tanks keep their 5x5 clearance
+        tanks = list(env.tanks.values())
+        for i, tank in enumerate(tanks):
+            for other in tanks[i + 1 :]:
+                assert max(abs(tank.x - other.x), abs(tank.y - other.y)) >= 3
+        assert int(env.occupancy.grid.sum()) == len(tanks) + len(env.obstacle_set)
+
+
+def test_reset_is_deterministic():
+    def play():
+        env = MultiTankEnv(num_agents=6)
+        env.reset(seed=5)
+        rng = np.random.default_rng(2)
+        trajectory = []
+        for _ in range(500):
+            if not env.agents:
+                env.reset()
+            actions = {agent: int(rng.integers(6)) for agent in env.agents}
+            trajectory.append(sorted(env.step(actions)[1].items()))
+        return trajectory
+
+    assert play() == play()
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from envs.game_elements import DX, DY
+from envs.navigation import NavigationField
+
+MAX_X, MAX_Y = 24, 18
+# a wall with a gap, and a few scattered obstacles
+OBSTACLES = {(12, y) for y in range(0, 12, 3)} | {(4, 14), (19, 4), (20, 15)}
+
+
+def standable(obstacles) -> np.ndarray:
+    """Cells whose 5x5 window holds no obstacle center, checked one by one."""
+    free = np.ones((MAX_X, MAX_Y), dtype=bool)
+    for x in range(MAX_X):
+        for y in range(MAX_Y):
+            free[x, y] = all(max(abs(x - ox), abs(y - oy)) > 2 for ox, oy in obstacles)
+    return free
+
+
+def brute_force_distances(free: np.ndarray, player: tuple) -> np.ndarray:
+    """Moves to the player, by relaxing every cell until nothing changes."""
+    unreachable = MAX_X * MAX_Y + 1
+    distance = np.full((MAX_X, MAX_Y), unreachable)
+    distance[player] = 0
+    changed = True
+    while changed:
+        changed = False
+        for x in range(MAX_X):
+            for y in range(MAX_Y):
+                if not free[x, y]:
+                    continue
+                for dx, dy in zip(DX, DY):
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < MAX_X and 0 <= ny < MAX_Y and free[nx, ny]:
+                        if distance[nx, ny] + 1 < distance[x, y]:
+                            distance[x, y] = distance[nx, ny] + 1
+                            changed = True
+    return np.where(distance == unreachable, -1, distance)
+
+
+@pytest.mark.parametrize("player", [(2, 2), (21, 9), (13, 16)])
+def test_moves_follow_shortest_paths(player):
+    free = standable(OBSTACLES)
+    assert free[player]
+    expected = brute_force_distances(free, player)
+    field = NavigationField(MAX_X, MAX_Y)
+    field.update(OBSTACLES, *player)
+    np.testing.assert_array_equal(field.distances(*player), expected)
+
+    for x in range(MAX_X):
+        for y in range(MAX_Y):
+            move = field.move(x, y)
+            if expected[x, y] <= 0:
+                assert move == -1
+                continue
+            # one step closer, onto a cell a tank can stand on
+            nx, ny = x + DX[move], y + DY[move]
+            assert free[nx, ny]
+            assert expected[nx, ny] == expected[x, y] - 1
+            # the direct pursuit along x is kept whenever it is optimal
+            if x != player[0]:
+                toward_x = 1 if x < player[0] else 3
+                tx = x + DX[toward_x]
+                if expected[tx, y] == expected[x, y] - 1:
+                    assert move == toward_x
+
+
+def test_following_the_moves_reaches_the_player():
+    free = standable(OBSTACLES)
+    player = (21, 9)
+    expected = brute_force_distances(free, player)
+    field = NavigationField(MAX_X, MAX_Y)
+    field.update(OBSTACLES, *player)
+    # from behind the wall, around it through the gap
+    x, y = 3, 3
+    steps = 0
+    while (x, y) != player:
+        move = field.move(x, y)
+        x, y = x + DX[move], y + DY[move]
+        steps += 1
+        assert steps <= expected[3, 3]
+    assert steps == expected[3, 3] > abs(21 - 3) + abs(9 - 3)
+
+
+def test_tables_are_cached_per_player_cell():
+    field = NavigationField(MAX_X, MAX_Y, cache_cells=2 * MAX_X * MAX_Y)
+    field.update(OBSTACLES, 2, 2)
+    first = field.table
+    field.update(OBSTACLES, 21, 9)
+    field.update(OBSTACLES, 2, 2)
+    assert field.table is first
+    # a third cell evicts the least recently used one
+    field.update(OBSTACLES, 13, 16)
+    assert set(field.tables) == {(2, 2), (13, 16)}
+    # new obstacles clear the cache
+    field.update(set(OBSTACLES), 13, 16)
+    assert set(field.tables) == {(13, 16)}
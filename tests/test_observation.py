@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from envs import TankEnv
+from envs.observation import EgocentricObservation
+
+
+def reference_crop(env: TankEnv, view_size: int) -> np.ndarray:
+    """Window of EgocentricObservation around the player, drawn cell by cell
+    on a whole board padded with walls."""
+    state = env.state
+    pad = view_size // 2 + 1
+    shape = (env.max_x + 2 * pad, env.max_y + 2 * pad)
+    grid = np.zeros((EgocentricObservation.CHANNELS, *shape), dtype=np.uint8)
+    for x, y in np.ndindex(shape):
+        # walls beyond the cells a tank can reach, -1 to max
+        board_x, board_y = x - pad, y - pad
+        outside = not (-1 <= board_x <= env.max_x and -1 <= board_y <= env.max_y)
+        grid[EgocentricObservation.OBSTACLES, x, y] = outside
+    for x, y in state["obstacles"]:
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                grid[EgocentricObservation.OBSTACLES, x + pad + i, y + pad + j] = 1
+    tanks = [(state["player"], EgocentricObservation.PLAYER)]
+    tanks += [(enemy, EgocentricObservation.ENEMIES) for enemy in state["enemies"]]
+    for tank, channel in tanks:
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                grid[channel, tank.x + pad + i, tank.y + pad + j] = 1
+                grid[
+                    EgocentricObservation.DIRECTION, tank.x + pad + i, tank.y + pad + j
+                ] = (tank.direction + 1)
+    for projectile in state["projectiles"]:
+        channel = EgocentricObservation.PLAYER_PROJECTILES + (projectile.label != 0)
+        x, y = projectile.x + pad, projectile.y + pad
+        grid[channel, x, y] = 1
+        grid[EgocentricObservation.DIRECTION, x, y] = projectile.direction + 1
+    player = state["player"]
+    x, y = player.x + pad - view_size // 2, player.y + pad - view_size // 2
+    return grid[:, x : x + view_size, y : y + view_size]
+
+
+@pytest.mark.parametrize("obstacles", ["", "high"])
+@pytest.mark.parametrize("view_size", [5, 9, 15])
+def test_crop_matches_reference(obstacles, view_size):
+    env = TankEnv(obstacles=obstacles, obs_mode="crop", view_size=view_size)
+    observation, _ = env.reset(seed=view_size)
+    rng = np.random.default_rng(0)
+    for _ in range(600):
+        observation, _, terminated, truncated, _ = env.step(int(rng.integers(6)))
+        assert env.observation_space.contains(observation)
+        np.testing.assert_array_equal(
+            observation["view"], reference_crop(env, view_size)
+        )
+        if terminated or truncated:
+            observation, _ = env.reset()
+            np.testing.assert_array_equal(
+                observation["view"], reference_crop(env, view_size)
+            )
+
+
+def test_array_observation_has_a_row_for_every_enemy():
+    # fewer enemies on screen than the initial ones
+    env = TankEnv(max_enemies_on_screen=1, total_ennemies_to_kill=3, obs_mode="array")
+    observation, _ = env.reset(seed=0)
+    assert env.observation_space["enemies"].shape == (env.enemy_slots, 3)
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        enemies = sorted(enemy.info()[:3] for enemy in env.state["enemies"])
+        count = observation["count"][0]
+        assert count == len(enemies)
+        assert sorted(map(tuple, observation["enemies"][:count].tolist())) == enemies
+        assert env.observation_space.contains(observation)
+        observation, _, terminated, truncated, _ = env.step(int(rng.integers(6)))
+        if terminated or truncated:
+            observation, _ = env.reset()
+
+
+@pytest.mark.parametrize("pixels", ["rgb", "gray", "palette"])
+@pytest.mark.parametrize("frame_stack", [1, 3])
+def test_pixel_stack_holds_the_last_frames_in_order(pixels, frame_stack):
+    env = TankEnv(obs_mode="pixels", frame_stack=frame_stack, pixels=pixels)
+    observation, _ = env.reset(seed=frame_stack)
+    rng = np.random.default_rng(2)
+    ## the first frame of an episode fills the stack
+    frames = [observation["pixels"][-1].copy()] * frame_stack
+    resets = 0
+    for _ in range(500):
+        observation, _, terminated, truncated, _ = env.step(int(rng.integers(6)))
+        stack = observation["pixels"]
+        assert env.observation_space.contains(observation)
+        assert not stack.flags.owndata  # a view of the ring buffer
+        frames = frames[1:] + [stack[-1].copy()]
+        np.testing.assert_array_equal(stack, np.stack(frames))
+        if pixels == "rgb":
+            np.testing.assert_array_equal(stack[-1], env.render())
+        if terminated or truncated:
+            observation, _ = env.reset()
+            resets += 1
+            stack = observation["pixels"]
+            assert env.observation_space.contains(observation)
+            np.testing.assert_array_equal(stack, stack[-1:].repeat(frame_stack, 0))
+            frames = [stack[-1].copy()] * frame_stack
+    assert resets > 0
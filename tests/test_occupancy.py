@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from envs import TankEnv
+from envs.occupancy import OccupancyGrid, PlacementError
+
+
+def window_counts(grid: np.ndarray) -> np.ndarray:
+    """Number of centers in the 5x5 window of every cell of the board,
+    counted cell by cell."""
+    pad = OccupancyGrid.pad
+    max_x, max_y = grid.shape[0] - 2 * pad, grid.shape[1] - 2 * pad
+    counts = np.zeros((max_x, max_y), dtype=np.int64)
+    for x in range(max_x):
+        for y in range(max_y):
+            counts[x, y] = grid[x : x + 5, y : y + 5].sum()
+    return counts
+
+
+def check_consistent(occupancy: OccupancyGrid, centers: list) -> None:
+    pad = occupancy.pad
+    grid = np.zeros_like(occupancy.grid)
+    for x, y in centers:
+        grid[x + pad, y + pad] += 1
+    np.testing.assert_array_equal(occupancy.grid, grid)
+    counts = window_counts(grid)
+    np.testing.assert_array_equal(occupancy.blocked[pad:-pad, pad:-pad], counts)
+    for x, y in np.ndindex(counts.shape):
+        assert occupancy.is_free(x, y) == (counts[x, y] == 0)
+
+    free = set(np.flatnonzero(counts.ravel() == 0).tolist())
+    if not occupancy.index_stale:
+        indexed = occupancy.free_cells[: occupancy.n_free].tolist()
+        assert len(indexed) == len(free) and set(indexed) == free
+        for slot, cell in enumerate(indexed):
+            assert occupancy.free_slot[cell] == slot
+    occupancy.rebuild_index()
+    assert set(occupancy.free_cells[: occupancy.n_free].tolist()) == free
+
+
+def test_incremental_updates_match_recount():
+    rng = np.random.default_rng(0)
+    max_x, max_y = 15, 12
+    occupancy = OccupancyGrid(max_x, max_y)
+    centers = []
+    for step in range(600):
+        action = rng.integers(3) if centers else 0
+        if action == 0 and len(centers) < 12:
+            x, y = int(rng.integers(max_x)), int(rng.integers(max_y))
+            occupancy.add(x, y)
+            centers.append((x, y))
+        elif action == 1 and centers:
+            x, y = centers.pop(int(rng.integers(len(centers))))
+            occupancy.remove(x, y)
+        elif centers:
+            i = int(rng.integers(len(centers)))
+            x, y = centers[i]
+            if rng.random() < 0.8:
+                # one cell, the common case, or a jump
+                dx, dy = [(0, -1), (1, 0), (0, 1), (-1, 0)][rng.integers(4)]
+                new_x, new_y = x + dx, y + dy
+            else:
+                new_x, new_y = int(rng.integers(max_x)), int(rng.integers(max_y))
+            if 0 <= new_x < max_x and 0 <= new_y < max_y:
+                occupancy.move(x, y, new_x, new_y)
+                centers[i] = (new_x, new_y)
+        if step % 7 == 0:
+            check_consistent(occupancy, centers)
+    check_consistent(occupancy, centers)
+    occupancy.clear()
+    check_consistent(occupancy, [])
+
+
+def test_can_move_ignores_the_moving_center():
+    occupancy = OccupancyGrid(20, 20)
+    occupancy.add(5, 5)
+    assert occupancy.can_move(5, 5, 6, 5)
+    assert occupancy.can_move(5, 5, 15, 15)
+    occupancy.add(10, 5)
+    # (8, 5) is within 2 cells of the other center
+    assert not occupancy.can_move(5, 5, 8, 5)
+    assert occupancy.can_move(5, 5, 7, 5)
+    assert not occupancy.can_move(10, 5, 7, 5)
+
+
+def test_sample_free_draws_free_cells():
+    rng = np.random.default_rng(1)
+    occupancy = OccupancyGrid(10, 10)
+    centers = []
+    while True:
+        try:
+            x, y = occupancy.sample_free(rng)
+        except PlacementError:
+            break
+        assert occupancy.is_free(x, y)
+        occupancy.add(x, y)
+        centers.append((x, y))
+    # no free cell is left once the board is full
+    assert window_counts(occupancy.grid).min() > 0
+    check_consistent(occupancy, centers)
+
+
+@pytest.mark.parametrize("obstacles", ["", "low", "high"])
+def test_env_keeps_the_grid_of_its_tanks_and_obstacles(obstacles):
+    env = TankEnv(obstacles=obstacles)
+    env.reset(seed=0)
+    rng = np.random.default_rng(2)
+    for step in range(1500):
+        _, _, terminated, truncated, _ = env.step(int(rng.integers(6)))
+        if terminated or truncated:
+            env.reset()
+        if step % 50 == 0:
+            state = env.state
+            tanks = [state["player"], *state["enemies"]]
+            centers = [(tank.x, tank.y) for tank in tanks]
+            check_consistent(env.occupancy, centers + list(state["obstacles"]))
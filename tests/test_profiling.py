@@ -0,0 +1,80 @@
+import itertools
+
+import pytest
+
+from envs import TankEnv
+from envs import profiling
+from envs.profiling import StepProfiler
+
+
+def test_laps_charge_the_time_since_the_previous_mark(monkeypatch):
+    ## a clock that advances 10 ns more at each reading: 0, 10, 30, 60, ...
+    clock = itertools.accumulate(itertools.count(0, 10))
+    monkeypatch.setattr(profiling.time, "perf_counter_ns", lambda: next(clock))
+    profiler = StepProfiler()
+    for _ in range(2):
+        profiler.start()
+        for phase in StepProfiler.PHASES:
+            profiler.lap(phase)
+
+    ## readings of the first step: 0 | 10 30 60 100 150 210
+    ## and of the second: 280 | 360 450 550 660 780 910
+    assert profiler.time_ns == {
+        "clean": 10 + 80,
+        "spawn": 20 + 90,
+        "check_death": 30 + 100,
+        "player": 40 + 110,
+        "enemies": 50 + 120,
+        "projectiles": 60 + 130,
+    }
+    assert profiler.calls == dict.fromkeys(StepProfiler.PHASES, 2)
+
+    summary = profiler.summary()
+    total = sum(profiler.time_ns.values())
+    for phase, stats in summary["phases"].items():
+        assert stats["calls"] == 2
+        assert stats["total_ms"] == profiler.time_ns[phase] / 1e6
+        assert stats["mean_us"] == pytest.approx(profiler.time_ns[phase] / 2e3)
+        assert stats["share"] == profiler.time_ns[phase] / total
+    ## the time between two steps is charged to no phase
+    assert total == 210 + (910 - 280)
+
+
+def test_env_profile_counts_every_phase_and_entity():
+    env = TankEnv(obstacles="low", obs_mode="array", profile=True)
+    env.reset(seed=0)
+    steps = 300
+    counts = []
+    for action in itertools.islice(itertools.cycle(range(6)), steps):
+        _, _, terminated, truncated, info = env.step(action)
+        assert info["entities"] == {
+            "enemies": len(env.state["enemies"]),
+            "projectiles": len(env.state["projectiles"]),
+            "obstacles": len(env.state["obstacles"]),
+        }
+        counts.append(dict(info["entities"]))
+        if terminated or truncated:
+            env.reset()
+
+    summary = env.profile_summary(reset=True)
+    assert summary["steps"] == steps
+    for stats in summary["phases"].values():
+        assert stats["calls"] == steps
+        assert stats["total_ms"] >= 0
+    assert sum(s["share"] for s in summary["phases"].values()) == pytest.approx(1)
+    for entity, stats in summary["entities"].items():
+        values = [count[entity] for count in counts]
+        assert stats["mean"] == pytest.approx(sum(values) / steps)
+        assert stats["max"] == max(values)
+
+    ## cleared by the read
+    summary = env.profile_summary()
+    assert summary["steps"] == 0
+    assert all(s["calls"] == 0 for s in summary["phases"].values())
+
+
+def test_profile_summary_requires_a_profiler():
+    env = TankEnv()
+    env.reset(seed=0)
+    with pytest.raises(AssertionError):
+        env.profile_summary()
@@ -0,0 +1,85 @@
+import numpy as np
+
+from agents.Q_table_agent import QTable
+
+
+def random_table(rng) -> QTable:
+    agent = QTable(10, 6, num_orientations_kronecker=2)
+    agent.set_q_table(rng.normal(size=agent.q_table.shape))
+    return agent
+
+
+def test_batched_update_with_repeated_entries_matches_a_loop():
+    rng = np.random.default_rng(0)
+    n = 500
+    # few distinct entries, so most of them are updated many times; the next
+    # states are never updated, so their Q-values are the same before and
+    # during the batch
+    distances = rng.integers(0, 3, n)
+    orientations = rng.integers(0, 2, n)
+    actions = rng.integers(0, 2, n)
+    rewards = rng.normal(size=n)
+    next_distances = rng.integers(5, 10, n)
+    next_orientations = rng.integers(0, 2, n)
+    assert len(np.unique(distances * 4 + orientations * 2 + actions)) < n // 10
+
+    batched = random_table(rng)
+    looped = QTable(10, 6, num_orientations_kronecker=2)
+    looped.set_q_table(batched.q_table.copy())
+    batched.update_q_values(
+        distances,
+        orientations,
+        actions,
+        0.1,
+        rewards,
+        0.9,
+        next_distances,
+        next_orientations,
+    )
+    for i in range(n):
+        looped.update_q_value(
+            distances[i],
+            orientations[i],
+            actions[i],
+            0.1,
+            rewards[i],
+            0.9,
+            next_distances[i],
+            next_orientations[i],
+        )
+    np.testing.assert_allclose(batched.q_table, looped.q_table, rtol=0, atol=1e-12)
+
+
+def test_batched_update_without_bootstrapping_on_done():
+    rng = np.random.default_rng(1)
+    agent = random_table(rng)
+    before = agent.q_table.copy()
+    # the same entry twice, the first transition ends its episode
+    agent.update_q_values(
+        np.array([1, 1]),
+        np.array([0, 0]),
+        np.array([3, 3]),
+        0.5,
+        np.array([1.0, 2.0]),
+        0.9,
+        np.array([7, 8]),
+        np.array([1, 1]),
+        dones=np.array([True, False]),
+    )
+    q = before[1, 0, 3]
+    q = q + 0.5 * (1.0 - q)
+    q = q + 0.5 * (2.0 + 0.9 * before[8, 1].max() - q)
+    assert np.isclose(agent.q_table[1, 0, 3], q)
+    # nothing else moved
+    changed = agent.q_table != before
+    assert changed.sum() == 1
+
+
+def test_batched_actions_are_greedy_without_exploration():
+    rng = np.random.default_rng(2)
+    agent = random_table(rng)
+    distances = rng.integers(0, 10, 100)
+    orientations = rng.integers(0, 2, 100)
+    actions = agent.choose_actions(distances, orientations, 0.0, rng)
+    expected = [agent.choose_action(d, o, 0.0) for d, o in zip(distances, orientations)]
+    np.testing.assert_array_equal(actions, expected)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from envs import TankEnv
+from envs.recording import (
+    EpisodeRecorder,
+    EpisodeReplayer,
+    pack_actions,
+    unpack_actions,
+)
+
+
+def record(path, obstacles: str, seeds: list, keyframe_interval: int) -> list:
+    """Records one episode per seed, of random actions, and returns the
+    position hash, score and reward of every step of each."""
+    env = TankEnv(obstacles=obstacles)
+    recorder = EpisodeRecorder(env, path, keyframe_interval=keyframe_interval)
+    rng = np.random.default_rng(0)
+    episodes = []
+    for seed in seeds:
+        recorder.reset(seed=seed)
+        steps = []
+        for _ in range(300):
+            _, reward, terminated, truncated, _ = recorder.step(int(rng.integers(6)))
+            steps.append((env.position_hash(), env.state["player"].score, reward))
+            if terminated or truncated:
+                break
+        episodes.append(steps)
+    recorder.close()
+    return episodes
+
+
+@pytest.mark.parametrize("obstacles", ["", "high"])
+@pytest.mark.parametrize("keyframe_interval", [0, 1, 37])
+def test_state_at_rebuilds_every_step(tmp_path, obstacles, keyframe_interval):
+    path = str(tmp_path / "episodes.bin")
+    episodes = record(path, obstacles, [0, 1, None], keyframe_interval)
+    replayer = EpisodeReplayer(path)
+    assert len(replayer) == len(episodes)
+    for index, steps in enumerate(episodes):
+        episode = replayer.episode(index)
+        assert episode.n_steps == len(steps)
+        # in a shuffled order, so each call moves the shared env back and forth
+        for step in np.random.default_rng(index).permutation(len(steps) + 1):
+            env = replayer.state_at(index, int(step))
+            if step > 0:
+                position, score, _ = steps[step - 1]
+                assert env.position_hash() == position
+                assert env.state["player"].score == score
+        replayed = [env.position_hash() for env in replayer.replay(index)]
+        assert replayed == [position for position, _, _ in steps]
+
+
+def test_state_at_start_is_the_reset_game(tmp_path):
+    path = str(tmp_path / "episodes.bin")
+    record(path, "low", [5], keyframe_interval=10)
+    env = TankEnv(obstacles="low")
+    env.reset(seed=5)
+    assert EpisodeReplayer(path).state_at(0, 0).position_hash() == env.position_hash()
+
+
+def test_sparse_rewards_complete_the_score(tmp_path):
+    path = str(tmp_path / "episodes.bin")
+    episodes = record(path, "", [2, 3], keyframe_interval=50)
+    replayer = EpisodeReplayer(path)
+    for index, steps in enumerate(episodes):
+        episode = replayer.episode(index)
+        # the score of every step is the returned rewards plus the sparse ones
+        sparse = np.zeros(len(steps))
+        sparse[episode.reward_steps] = episode.reward_values
+        rewards = np.array([reward for _, _, reward in steps])
+        scores = np.array([score for _, score, _ in steps])
+        np.testing.assert_allclose(np.cumsum(rewards + sparse), scores, atol=1e-4)
+
+
+def test_action_packing_round_trip():
+    rng = np.random.default_rng(4)
+    for n in (0, 1, 2, 7, 100):
+        actions = rng.integers(0, 6, n).astype(np.uint8)
+        packed = pack_actions(actions)
+        assert len(packed) == (n + 1) // 2
+        np.testing.assert_array_equal(unpack_actions(packed, n), actions)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from envs import TankEnv
+from utils.coloring import Color, fill_obstacle, fill_projectile, fill_tank
+from utils.renderer import Upscaler
+
+
+def fill_render(env: TankEnv) -> np.ndarray:
+    """The frame as drawn by the fill_* helpers, element by element."""
+    frame = np.full((env.max_y + 2, env.max_x + 2, 3), 240, dtype=np.uint8)
+    state = env.state
+    frame = fill_tank(state["player"], Color.player, frame)
+    for enemy in state["enemies"]:
+        frame = fill_tank(enemy, Color.enemy, frame)
+    for obstacle in state["obstacles"]:
+        frame = fill_obstacle(obstacle, Color.obstacle, frame)
+    for projectile in state["projectiles"]:
+        frame = fill_projectile(projectile, frame)
+    return frame
+
+
+@pytest.mark.parametrize("obstacles", ["", "high"])
+def test_frames_match_the_fill_helpers(obstacles):
+    env = TankEnv(max_x=24, max_y=16, obstacles=obstacles)
+    env.reset(seed=0)
+    rng = np.random.default_rng(0)
+    projectiles_seen = 0
+    for _ in range(500):
+        _, _, terminated, truncated, _ = env.step(int(rng.integers(6)))
+        frame = env.render()
+        assert frame.shape == (16 + 2, 24 + 2, 3) and frame.dtype == np.uint8
+        np.testing.assert_array_equal(frame, fill_render(env))
+        projectiles_seen += len(env.state["projectiles"])
+        if terminated or truncated:
+            # a new obstacle layout must not reuse the cached one
+            env.reset()
+            np.testing.assert_array_equal(env.render(), fill_render(env))
+    assert projectiles_seen > 0
+
+
+def test_upscaler_matches_repeat():
+    rng = np.random.default_rng(1)
+    upscaler = Upscaler(scale=5)
+    for shape in [(7, 9, 3), (7, 9, 3), (4, 6, 3)]:
+        frame = rng.integers(0, 256, shape, dtype=np.uint8)
+        expected = np.repeat(np.repeat(frame, 5, axis=0), 5, axis=1)
+        np.testing.assert_array_equal(upscaler.upscale(frame), expected)
@@ -0,0 +1,196 @@
+import numpy as np
+import pytest
+from gymnasium import spaces
+
+from utils.replay_buffer import ReplayBuffer, SumTree
+
+SPACE = spaces.Dict(
+    {
+        "id": spaces.Box(0, np.iinfo(np.int64).max, shape=(), dtype=np.int64),
+        "grid": spaces.Box(0, 255, shape=(3, 2), dtype=np.uint8),
+    }
+)
+
+
+def observation(i: int) -> dict:
+    return {"id": np.int64(i), "grid": np.full((3, 2), i % 256, dtype=np.uint8)}
+
+
+def play(buffer: ReplayBuffer, steps: int, rng, first_id: int = 0) -> dict:
+    """Appends `steps` transitions of episodes of random lengths, every
+    observation with a new id. Returns the transitions by id of their
+    observation: (action, reward, id of the next observation, done)."""
+    transitions = {}
+    next_id = first_id
+    obs, next_id = next_id, next_id + 1
+    for _ in range(steps):
+        action, reward = int(rng.integers(6)), float(rng.random())
+        done, truncated = bool(rng.random() < 0.1), bool(rng.random() < 0.05)
+        next_obs, next_id = next_id, next_id + 1
+        buffer.add(
+            observation(obs), action, reward, observation(next_obs), done, truncated
+        )
+        transitions[obs] = (action, reward, next_obs, done)
+        obs = next_obs
+        if done or truncated:
+            obs, next_id = next_id, next_id + 1
+    return transitions
+
+
+def check_batch(batch: dict, transitions: dict) -> None:
+    for i, obs in enumerate(batch["id"]):
+        action, reward, next_obs, done = transitions[int(obs)]
+        assert batch["action"][i] == action
+        assert batch["reward"][i] == np.float32(reward)
+        assert batch["next_id"][i] == next_obs
+        assert batch["done"][i] == done
+        assert (batch["grid"][i] == obs % 256).all()
+        assert (batch["next_grid"][i] == next_obs % 256).all()
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_sampled_transitions_are_the_added_ones(prioritized):
+    rng = np.random.default_rng(0)
+    buffer = ReplayBuffer(64, SPACE, prioritized=prioritized)
+    transitions = play(buffer, 500, rng)
+    batch = buffer.sample(1000, rng=rng)
+    check_batch(batch, transitions)
+    # only the transitions still in the buffer are drawn
+    recent = sorted(transitions)[-64:]
+    assert set(batch["id"].tolist()) <= set(recent)
+    assert len(buffer) == np.count_nonzero(buffer.data["valid"])
+    assert len(set(batch["id"].tolist())) == len(buffer)
+
+
+def test_observations_are_stored_once():
+    buffer = ReplayBuffer(16, SPACE)
+    assert not any(name.startswith("next_") for name in buffer.data)
+    rng = np.random.default_rng(1)
+    buffer.add(observation(0), 1, 0.0, observation(1), False)
+    buffer.add(observation(1), 2, 0.0, observation(2), True)
+    # the last observation of the episode takes one row without transition
+    assert len(buffer) == 2
+    assert buffer.position[0] == 3
+    buffer.add(observation(3), 3, 0.0, observation(4), False)
+    assert buffer.data["id"][:5, 0].tolist() == [0, 1, 2, 3, 4]
+    assert buffer.data["valid"][:5, 0].tolist() == [True, True, False, True, False]
+    batch = buffer.sample(100, rng=rng)
+    assert set(batch["id"].tolist()) == {0, 1, 3}
+
+
+def test_vectorized_rings():
+    rng = np.random.default_rng(2)
+    n = 3
+    buffer = ReplayBuffer(60, SPACE, num_envs=n)
+    transitions = {}
+    obs = np.arange(n)
+    next_id = n
+    for _ in range(100):
+        next_obs = next_id + np.arange(n)
+        next_id += n
+        actions = rng.integers(0, 6, n)
+        rewards = rng.random(n).astype(np.float32)
+        dones = rng.random(n) < 0.1
+        batch = lambda ids: {
+            "id": ids,
+            "grid": np.stack([observation(i)["grid"] for i in ids]),
+        }
+        buffer.extend(batch(obs), actions, rewards, batch(next_obs), dones)
+        for j in range(n):
+            transitions[int(obs[j])] = (actions[j], rewards[j], next_obs[j], dones[j])
+        resets = next_id + np.arange(n)
+        next_id += n
+        obs = np.where(dones, resets, next_obs)
+    check_batch(buffer.sample(500, rng=rng), transitions)
+
+
+def test_prioritized_sampling_follows_priorities():
+    rng = np.random.default_rng(3)
+    buffer = ReplayBuffer(32, SPACE, prioritized=True, alpha=1.0)
+    play(buffer, 200, rng)
+    indices = np.flatnonzero(buffer.data["valid"].reshape(-1))
+    priorities = rng.random(len(indices)) + 0.01
+    buffer.update_priorities(indices, priorities)
+
+    draws = 200_000
+    batch = buffer.sample(draws, beta=0.5, rng=rng)
+    frequencies = np.bincount(batch["indices"], minlength=buffer.capacity)
+    expected = np.zeros(buffer.capacity)
+    expected[indices] = priorities / priorities.sum()
+    assert np.abs(frequencies / draws - expected).max() < 0.01
+    # importance-sampling weights, normalized by their maximum
+    probabilities = expected[batch["indices"]]
+    weights = (len(buffer) * probabilities) ** -0.5
+    np.testing.assert_allclose(batch["weights"], weights / weights.max(), rtol=1e-5)
+
+
+def test_rows_without_transition_are_never_drawn():
+    rng = np.random.default_rng(4)
+    buffer = ReplayBuffer(16, SPACE, prioritized=True)
+    play(buffer, 100, rng)
+    # large priorities given to rows that lost their transition are ignored
+    invalid = np.flatnonzero(~buffer.data["valid"].reshape(-1))
+    buffer.update_priorities(invalid, np.full(len(invalid), 1e6))
+    batch = buffer.sample(1000, rng=rng)
+    assert buffer.data["valid"].reshape(-1)[batch["indices"]].all()
+
+
+def test_sum_tree_prefix_search():
+    rng = np.random.default_rng(5)
+    tree = SumTree(10)
+    priorities = rng.random(10)
+    tree.update(np.arange(10), priorities)
+    assert np.isclose(tree.total(), priorities.sum())
+    prefix_sums = rng.random(1000) * priorities.sum()
+    expected = np.searchsorted(np.cumsum(priorities), prefix_sums)
+    np.testing.assert_array_equal(tree.find(prefix_sums), expected)
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_memmap_resume(tmp_path, prioritized):
+    rng = np.random.default_rng(6)
+    buffer = ReplayBuffer(64, SPACE, prioritized=prioritized, path=str(tmp_path))
+    transitions = play(buffer, 150, rng)
+    if prioritized:
+        indices = np.flatnonzero(buffer.data["valid"].reshape(-1))
+        buffer.update_priorities(indices, rng.random(len(indices)) + 0.1)
+    buffer.flush()
+    expected = buffer.sample(100, rng=np.random.default_rng(7))
+    del buffer
+
+    buffer = ReplayBuffer(
+        64, SPACE, prioritized=prioritized, path=str(tmp_path), resume=True
+    )
+    batch = buffer.sample(100, rng=np.random.default_rng(7))
+    for name, array in expected.items():
+        np.testing.assert_array_equal(batch[name], array)
+    # appending continues where the flushed buffer stopped
+    transitions.update(play(buffer, 40, rng, first_id=10_000))
+    check_batch(buffer.sample(500, rng=rng), transitions)
+
+
+def test_sum_tree_never_ends_on_a_zero_priority():
+    tree = SumTree(8)
+    priorities = np.array([0.0, 0.3, 0.1, 0.0, 0.7, 0.2, 0.0, 0.0])
+    tree.update(np.arange(8), priorities)
+    total = tree.total()
+    # the edges of the range, and sums pushed past them by rounding
+    prefix_sums = np.array([0.0, -1e-12, total, total * (1 + 1e-12), 0.4, 0.4 + 1e-15])
+    leaves = tree.find(prefix_sums)
+    assert (priorities[leaves] > 0).all()
+
+
+def test_samples_from_a_buffer_with_zeroed_rows_are_valid():
+    rng = np.random.default_rng(8)
+    buffer = ReplayBuffer(64, SPACE, prioritized=True, alpha=1.0)
+    play(buffer, 300, rng)
+    valid = buffer.data["valid"].reshape(-1)
+    indices = np.flatnonzero(valid)
+    # priorities of very different scales, a few of them tiny
+    priorities = 10.0 ** rng.uniform(-8, 3, len(indices))
+    buffer.update_priorities(indices, priorities)
+    for _ in range(50):
+        batch = buffer.sample(256, rng=rng)
+        assert valid[batch["indices"]].all()
+        assert np.isfinite(batch["weights"]).all()
+        assert (batch["weights"] > 0).all()
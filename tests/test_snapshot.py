@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from envs import TankEnv
+from envs.snapshot import ZobristHash
+
+
+def play(env: TankEnv, actions) -> list:
+    """Steps through `actions`, resetting finished games, and returns what
+    every step produced."""
+    trajectory = []
+    for action in actions:
+        obs, reward, terminated, truncated, _ = env.step(int(action))
+        player = env.state["player"]
+        trajectory.append(
+            (
+                reward,
+                terminated,
+                truncated,
+                env.position_hash(),
+                player.score,
+                player.kills,
+                player.deaths,
+                sorted(projectile.info() for projectile in env.state["projectiles"]),
+            )
+        )
+        if terminated or truncated:
+            env.reset()
+    return trajectory
+
+
+@pytest.mark.parametrize("obstacles", ["", "low", "high"])
+@pytest.mark.parametrize("obs_mode", ["state", "array", "crop"])
+def test_restored_snapshot_replays_the_same_game(obstacles, obs_mode):
+    actions = np.random.default_rng(0).integers(0, 6, 1200)
+    env = TankEnv(obstacles=obstacles, obs_mode=obs_mode)
+    env.reset(seed=1)
+    play(env, actions[:400])
+    blob = env.get_state()
+    position = env.position_hash()
+    expected = play(env, actions[400:])
+
+    # into another env, played with another seed
+    other = TankEnv(obstacles=obstacles, obs_mode=obs_mode)
+    other.reset(seed=99)
+    other.set_state(blob)
+    assert other.position_hash() == position
+    assert other.get_state() == blob
+    assert play(other, actions[400:]) == expected
+
+    # into the env that took it
+    env.set_state(blob)
+    assert play(env, actions[400:]) == expected
+
+
+def test_restored_observation():
+    env = TankEnv(obs_mode="array")
+    env.reset(seed=2)
+    play(env, np.random.default_rng(3).integers(0, 6, 100))
+    blob = env.get_state()
+    expected = {key: value.copy() for key, value in env.observe().items()}
+    env.reset(seed=4)
+    env.set_state(blob)
+    for key, value in env.observe().items():
+        np.testing.assert_array_equal(value, expected[key])
+
+
+def test_snapshot_restores_occupancy():
+    env = TankEnv(obstacles="high")
+    env.reset(seed=5)
+    play(env, np.random.default_rng(6).integers(0, 6, 300))
+    blob = env.get_state()
+    grid, blocked = env.occupancy.grid.copy(), env.occupancy.blocked.copy()
+    env.reset(seed=7)
+    env.set_state(blob)
+    np.testing.assert_array_equal(env.occupancy.grid, grid)
+    np.testing.assert_array_equal(env.occupancy.blocked, blocked)
+
+
+def test_position_hash_ignores_order_and_is_stable():
+    env = TankEnv()
+    env.reset(seed=8)
+    play(env, np.random.default_rng(9).integers(0, 6, 50))
+    state = env.state
+    shuffled = dict(state)
+    shuffled["enemies"] = list(reversed(list(state["enemies"])))
+    shuffled["projectiles"] = list(reversed(list(state["projectiles"])))
+    shuffled["obstacles"] = sorted(state["obstacles"], reverse=True)
+    zobrist = ZobristHash(env.max_x, env.max_y)
+    assert zobrist(shuffled) == zobrist(state) == env.position_hash()
+    # a move changes the hash
+    player = state["player"]
+    before = env.position_hash()
+    player.direction = (player.direction + 1) % 4
+    assert env.position_hash() != before
@@ -0,0 +1,73 @@
+import functools
+
+import numpy as np
+import pytest
+
+from envs import SubprocVectorEnv, TankEnv, VectorTankEnv
+
+
+@pytest.fixture
+def vector_env():
+    envs = []
+
+    def make(env_fns):
+        envs.append(SubprocVectorEnv(env_fns))
+        return envs[-1]
+
+    yield make
+    for env in envs:
+        env.close()
+
+
+def test_worker_matches_a_local_env(vector_env):
+    make = functools.partial(TankEnv, obs_mode="array", obstacles="low")
+    env = vector_env([make, make])
+    local = make()
+    observation, _ = env.reset(seed=7)
+    local_observation, _ = local.reset(seed=7)
+    rng = np.random.default_rng(0)
+    episode_return, finished = 0.0, 0
+    for _ in range(3000):
+        actions = rng.integers(0, 6, 2)
+        observation, reward, terminated, truncated, info = env.step(actions)
+        local_observation, local_reward, done, _, _ = local.step(int(actions[0]))
+        episode_return += local_reward
+        assert reward[0] == local_reward
+        assert terminated[0] == done
+        if done:
+            # the worker resets its game on its own, from the same generator
+            assert info["final_return"][0] == pytest.approx(episode_return)
+            local_observation, _ = local.reset()
+            episode_return = 0.0
+            finished += 1
+        for key, value in local_observation.items():
+            np.testing.assert_array_equal(observation[key][0], value)
+    assert finished > 0
+    # worker 1 plays another game, seeded with seed + 1
+    assert env.call("position_hash")[0] == local.position_hash()
+
+
+def test_batched_workers_match_local_batches(vector_env):
+    make = functools.partial(VectorTankEnv, 8)
+    env = vector_env([make, make])
+    local = make()
+    observation, _ = env.reset(seed=3)
+    local.reset(seed=3)
+    assert env.num_envs == 16
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        actions = rng.integers(0, 6, 16)
+        observation, reward, terminated, _, _ = env.step(actions)
+        local_observation, local_reward, local_terminated, _, _ = local.step(
+            actions[:8]
+        )
+        np.testing.assert_array_equal(reward[:8], local_reward)
+        np.testing.assert_array_equal(terminated[:8], local_terminated)
+        for key, value in local_observation.items():
+            np.testing.assert_array_equal(observation[key][:8], value)
+
+
+def test_worker_errors_are_raised(vector_env):
+    env = vector_env([functools.partial(TankEnv, obs_mode="array")])
+    with pytest.raises(RuntimeError, match="worker failed"):
+        env.call("no_such_method")
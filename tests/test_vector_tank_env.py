@@ -0,0 +1,176 @@
+import numpy as np
+import pytest
+
+from envs import TankEnv, VectorTankEnv
+from envs.vector_tank_env import PAD
+
+
+def check_occupancy(env: VectorTankEnv) -> None:
+    """The occupancy grid of every game holds exactly the centers of its
+    player, its alive enemies and its obstacles."""
+    expected = np.zeros_like(env.occupancy)
+    games = np.arange(env.num_envs)
+    np.add.at(expected, (games, env.player[:, 0] + PAD, env.player[:, 1] + PAD), 1)
+    g, k = np.nonzero(env.enemies_alive)
+    np.add.at(expected, (g, env.enemies[g, k, 0] + PAD, env.enemies[g, k, 1] + PAD), 1)
+    g, x, y = np.nonzero(env.obstacle_grid)
+    np.add.at(expected, (g, x + PAD, y + PAD), 1)
+    np.testing.assert_array_equal(env.occupancy, expected)
+
+
+def check_clearance(env: VectorTankEnv) -> None:
+    """Tanks and obstacles of a game keep their 5x5 clearance."""
+    for game in range(env.num_envs):
+        centers = [tuple(env.player[game, :2])]
+        centers += [tuple(e[:2]) for e in env.enemies[game][env.enemies_alive[game]]]
+        centers += list(zip(*np.nonzero(env.obstacle_grid[game])))
+        for i, (x, y) in enumerate(centers):
+            for other_x, other_y in centers[i + 1 :]:
+                assert max(abs(x - other_x), abs(y - other_y)) >= 3
+
+
+@pytest.mark.parametrize("obstacles", ["", "low", "high"])
+def test_invariants_after_every_step(obstacles):
+    env = VectorTankEnv(16, obstacles=obstacles)
+    observation, _ = env.reset(seed=0)
+    rng = np.random.default_rng(0)
+    check_occupancy(env)
+    check_clearance(env)
+    for step in range(400):
+        _, reward, terminated, truncated, info = env.step(rng.integers(0, 6, 16))
+        assert reward.shape == terminated.shape == truncated.shape == (16,)
+        check_occupancy(env)
+        if step % 20 == 0:
+            check_clearance(env)
+        assert (env.enemies_alive.sum(axis=1) >= 1).all()
+        # projectiles in use are inside the board or one cell past it
+        g, p = np.nonzero(env.projectiles_alive)
+        assert (env.projectiles[g, p, :2] >= -1).all()
+        assert (env.projectiles[g, p, 0] <= env.max_x).all()
+        assert (env.projectiles[g, p, 1] <= env.max_y).all()
+
+
+def test_opposing_projectiles_cancel_in_pairs():
+    env = VectorTankEnv(1)
+    env.reset(seed=1)
+    env.projectiles_alive[:] = False
+    # on one cell, 3 projectiles of the player against 1 of the enemies; on
+    # another, 1 against 1
+    rows = [(10, 2, 0, 0), (10, 2, 1, 0), (10, 2, 2, 0), (10, 2, 3, 1)]
+    rows += [(4, 15, 0, 0), (4, 15, 2, 1)]
+    for slot, row in enumerate(rows):
+        env.projectiles[0, slot] = row
+        env.projectiles_alive[0, slot] = True
+    # keep the enemies out of the way
+    env.enemies_alive[:] = False
+    g, p = env.clean(*np.nonzero(env.projectiles_alive))
+    survivors = env.projectiles[g, p]
+    assert len(survivors) == 2
+    assert (survivors[:, 3] == 0).all() and (survivors[:, :2] == (10, 2)).all()
+    assert env.projectiles_alive.sum() == 2
+
+
+def test_kill_and_death_scoring():
+    env = VectorTankEnv(2, max_x=20, max_y=20)
+    env.reset(seed=2)
+    env.projectiles_alive[:] = False
+
+    # game 0: a player projectile in the 3x3 box of an enemy
+    enemy = np.flatnonzero(env.enemies_alive[0])[0]
+    ex, ey = env.enemies[0, enemy, :2]
+    env.projectiles[0, 0] = (ex + 1, ey, 0, 0)
+    env.projectiles_alive[0, 0] = True
+    # game 1: an enemy projectile in the 3x3 box of the player
+    px, py = env.player[1, :2]
+    env.projectiles[1, 0] = (px, py - 1, 2, 1)
+    env.projectiles_alive[1, 0] = True
+
+    score, kills, deaths = env.score.copy(), env.kills.copy(), env.deaths.copy()
+    g, p = env.clean(*np.nonzero(env.projectiles_alive))
+    env.check_death(g, p)
+    assert not env.enemies_alive[0, enemy]
+    assert env.kills[0] == kills[0] + 1 and env.deaths[0] == deaths[0]
+    assert env.score[0] == score[0] + env.reward_enemy_killed
+    assert env.deaths[1] == deaths[1] + 1 and env.kills[1] == kills[1]
+    assert env.score[1] == score[1] + env.reward_player_dead
+    assert env.done.tolist() == [False, True]
+    assert not env.projectiles_alive.any()
+    check_occupancy(env)
+
+
+def test_finished_games_are_reset_with_their_final_statistics():
+    env = VectorTankEnv(32)
+    env.reset(seed=3)
+    rng = np.random.default_rng(3)
+    finished = 0
+    for _ in range(600):
+        score, kills = env.score.copy(), env.kills.copy()
+        actions = rng.integers(0, 6, 32)
+        _, reward, terminated, _, info = env.step(actions)
+        if not terminated.any():
+            assert "final_score" not in info and "final_kills" not in info
+            continue
+        finished += terminated.sum()
+        # the final statistics are those of the finished games only
+        assert (info["final_score"][~terminated] == 0).all()
+        assert (info["final_kills"][~terminated] == 0).all()
+        assert (info["final_kills"][terminated] >= kills[terminated]).all()
+        # the final score is the previous one plus the step reward, the kills
+        # and the deaths (one per enemy projectile hitting the player)
+        new_kills = (info["final_kills"] - kills)[terminated]
+        rest = (info["final_score"] - score - reward)[terminated]
+        rest -= env.reward_enemy_killed * new_kills
+        hits = rest / env.reward_player_dead
+        np.testing.assert_allclose(hits, np.round(hits), atol=1e-6)
+        won = info["final_kills"][terminated] >= env.total_ennemies_to_kill
+        assert ((np.round(hits) >= 1) | won).all()
+        # and the games start over
+        assert (env.score[terminated] == 0).all()
+        assert (env.kills[terminated] == 0).all()
+        assert not env.done.any()
+        check_occupancy(env)
+    assert finished > 0
+
+
+def test_full_board_skips_the_spawn_of_that_game_only():
+    env = VectorTankEnv(2)
+    env.reset(seed=4)
+    # every cell of game 0 is blocked, and both games lost their enemies
+    env.occupancy[0, PAD:-PAD, PAD:-PAD] += 1
+    env.enemies_alive[:] = False
+    env.step(np.full(2, 4))
+    assert env.enemies_alive[0].sum() == 0
+    assert env.enemies_alive[1].sum() == 1
+
+
+def test_episode_statistics_agree_with_tank_env():
+    rng = np.random.default_rng(5)
+    n = 64
+    env = VectorTankEnv(n)
+    env.reset(seed=5)
+    lengths, kills = [], []
+    age = np.zeros(n, dtype=np.int64)
+    for _ in range(1200):
+        _, _, terminated, _, info = env.step(rng.integers(0, 6, n))
+        age += 1
+        if terminated.any():
+            lengths += age[terminated].tolist()
+            kills += info["final_kills"][terminated].tolist()
+            age[terminated] = 0
+
+    single = TankEnv()
+    single.reset(seed=5)
+    single_lengths, single_kills = [], []
+    steps = 0
+    while len(single_lengths) < 300:
+        _, _, terminated, _, _ = single.step(int(rng.integers(6)))
+        steps += 1
+        if terminated:
+            single_lengths.append(steps)
+            single_kills.append(single.state["player"].kills)
+            steps = 0
+            single.reset()
+
+    assert len(lengths) > 300
+    assert np.mean(lengths) == pytest.approx(np.mean(single_lengths), rel=0.15)
+    assert np.mean(kills) == pytest.approx(np.mean(single_kills), rel=0.15)
@@ -0,0 +1,309 @@
+"""Headless Q-table training on TankEnv.
+
+Runs the training loop of notebooks/Q_table_algorithm.ipynb without a
+display: one environment is reused across episodes, nothing is rendered
+unless asked every K episodes, the Q-table is checkpointed periodically and
+the speed is reported in episodes per second.
+
+With --workers N, N processes play their own environments and update one
+Q-table in shared memory without locks (Hogwild), while the main process
+checkpoints and reports.
+
+Usage:
+    python train_q_table.py --episodes 10000 --checkpoint q_table.npz
+    python train_q_table.py --resume q_table.npz --render-every 500
+    python train_q_table.py --workers 8 --checkpoint q_table.npz --resume q_table.npz
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from agents.features import FEATURES_VERSION, FeatureExtractor
+from agents.Q_table_agent import QTable, SharedQTable
+from envs import TankEnv
+
+
+def save_checkpoint(path: str, agent: QTable, episode: int, epsilon: float):
+    """Writes the checkpoint next to `path` then renames it, so an
+    interrupted run never leaves a truncated file. The table is copied
+    first, workers may be updating it."""
+    tmp = path + ".tmp.npz"
+    q_table = agent.q_table.copy()
+    np.savez(
+        tmp,
+        q_table=q_table,
+        episode=episode,
+        epsilon=epsilon,
+        features_version=FEATURES_VERSION,
+    )
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str, agent: QTable) -> tuple[int, float]:
+    with np.load(path) as checkpoint:
+        # tables saved without a version predate the feature fixes
+        version = int(checkpoint.get("features_version", 1))
+        assert version == FEATURES_VERSION, (
+            f"{path} was trained on features version {version}, "
+            f"not {FEATURES_VERSION}: its Q-values do not apply, retrain it"
+        )
+        assert checkpoint["q_table"].shape == agent.q_table.shape
+        agent.set_q_table(checkpoint["q_table"].copy())
+        return int(checkpoint["episode"]), float(checkpoint["epsilon"])
+
+
+class Viewer:
+    """pygame window showing an episode now and then, imported on first use."""
+
+    def __init__(self, env: TankEnv, fps: int):
+        import pygame
+
+        from utils.renderer import Upscaler
+
+        pygame.init()
+        self.pygame = pygame
+        self.screen = pygame.display.set_mode((env.max_x * 20, env.max_y * 20))
+        self.clock = pygame.time.Clock()
+        self.upscaler = Upscaler(scale=18)
+        self.fps = fps
+
+    def show(self, frame: np.ndarray) -> bool:
+        """Displays a frame, returns False if the window was closed."""
+        for event in self.pygame.event.get():
+            if event.type == self.pygame.QUIT:
+                return False
+        self.screen.blit(self.upscaler.to_surface(frame), (0, 0))
+        self.pygame.display.flip()
+        self.clock.tick(self.fps)
+        return True
+
+    def close(self):
+        self.pygame.quit()
+
+
+def run_episode(env, agent, features, epsilon, args, rng, viewer=None) -> tuple:
+    """Plays and learns from one episode, returns (total reward, steps)."""
+    state, _ = env.reset()
+    distance, orientation = features(state)
+    total_reward = 0.0
+    for steps in range(1, args.max_steps + 1):
+        if rng.random() < epsilon:
+            action = int(rng.integers(agent.action_space_size))
+        else:
+            action = int(np.argmax(agent.q_table[distance, orientation]))
+
+        state, reward, done, truncated, _ = env.step(action)
+        next_distance, next_orientation = features(state)
+        agent.update_q_value(
+            distance,
+            orientation,
+            action,
+            args.learning_rate,
+            reward,
+            args.discount_factor,
+            next_distance,
+            next_orientation,
+        )
+        total_reward += reward
+        distance, orientation = next_distance, next_orientation
+
+        if viewer is not None and not viewer.show(env.render()):
+            viewer = None
+        if done or truncated:
+            break
+    return total_reward, steps
+
+
+def scheduled_epsilon(args, start_epsilon: float, episodes: int) -> float:
+    """Epsilon after `episodes` episodes of decay."""
+    return max(args.epsilon_min, start_epsilon * args.epsilon_decay**episodes)
+
+
+def worker(index, agent, started, finished, stop, args, start_epsilon):
+    """Plays episodes on its own environment and updates the shared table
+    until args.episodes episodes were handed out or `stop` is set.
+
+    `started` counts the episodes handed out to all the workers, `finished`
+    those played to the end (both shared values); epsilon decays with the
+    latter."""
+    seed = None if args.seed is None else args.seed + index
+    env = TankEnv(max_x=args.max_x, max_y=args.max_y, obstacles=args.obstacles)
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    features = FeatureExtractor(args.max_x, args.max_y)
+    try:
+        while not stop.is_set():
+            with started.get_lock():
+                if started.value >= args.episodes:
+                    break
+                started.value += 1
+            epsilon = scheduled_epsilon(args, start_epsilon, finished.value)
+            run_episode(env, agent, features, epsilon, args, rng)
+            with finished.get_lock():
+                finished.value += 1
+    except KeyboardInterrupt:
+        pass
+
+
+def train_parallel(args, agent, start_episode: int, epsilon: float):
+    """Runs args.workers Hogwild workers, checkpoints every
+    args.checkpoint_every episodes and logs every args.log_every episodes."""
+    started = mp.Value("q", 0)  # episodes handed out to the workers
+    finished = mp.Value("q", 0)  # episodes played to the end
+    stop = mp.Event()
+    workers = [
+        mp.Process(
+            target=worker,
+            args=(i, agent, started, finished, stop, args, epsilon),
+            daemon=True,
+        )
+        for i in range(args.workers)
+    ]
+    t0 = time.perf_counter()
+    for process in workers:
+        process.start()
+
+    logged = saved = 0
+    try:
+        while any(process.is_alive() for process in workers):
+            time.sleep(0.2)
+            done_episodes = finished.value
+            if done_episodes // args.log_every > logged:
+                logged = done_episodes // args.log_every
+                elapsed = time.perf_counter() - t0
+                print(
+                    f"episode {start_episode + done_episodes:7d}  "
+                    f"{done_episodes / elapsed:8.1f} episodes/s  "
+                    f"epsilon {scheduled_epsilon(args, epsilon, done_episodes):.3f}"
+                )
+            if args.checkpoint and done_episodes // args.checkpoint_every > saved:
+                saved = done_episodes // args.checkpoint_every
+                save_checkpoint(
+                    args.checkpoint,
+                    agent,
+                    start_episode + done_episodes,
+                    scheduled_epsilon(args, epsilon, done_episodes),
+                )
+    except KeyboardInterrupt:
+        print("interrupted")
+    finally:
+        stop.set()
+        for process in workers:
+            process.join()
+        # an episode interrupted in flight is played again on --resume
+        done_episodes = finished.value
+        if args.checkpoint:
+            save_checkpoint(
+                args.checkpoint,
+                agent,
+                start_episode + done_episodes,
+                scheduled_epsilon(args, epsilon, done_episodes),
+            )
+        agent.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=10000)
+    parser.add_argument("--learning-rate", type=float, default=0.001)
+    parser.add_argument("--discount-factor", type=float, default=0.99)
+    parser.add_argument("--epsilon", type=float, default=1.0)
+    parser.add_argument("--epsilon-decay", type=float, default=0.997)
+    parser.add_argument("--epsilon-min", type=float, default=0.01)
+    parser.add_argument("--max-x", type=int, default=20)
+    parser.add_argument("--max-y", type=int, default=20)
+    parser.add_argument("--obstacles", default="", choices=["", "low", "high"])
+    parser.add_argument(
+        "--max-steps", type=int, default=10000, help="steps before an episode is cut"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--render-every",
+        type=int,
+        default=0,
+        help="show one episode every K episodes (0: never, no pygame import)",
+    )
+    parser.add_argument(
+        "--fps", type=int, default=9, help="frame rate of shown episodes"
+    )
+    parser.add_argument("--checkpoint", default=None, help="npz file for the Q-table")
+    parser.add_argument("--checkpoint-every", type=int, default=500)
+    parser.add_argument("--resume", default=None, help="npz checkpoint to start from")
+    parser.add_argument("--log-every", type=int, default=100)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="processes updating a shared Q-table (no rendering with more than 1)",
+    )
+    args = parser.parse_args()
+
+    # manhattan distances range from 0 to max_x + max_y - 2
+    table = SharedQTable if args.workers > 1 else QTable
+    agent = table(args.max_x + args.max_y - 1, 6, num_orientations_kronecker=2)
+
+    start_episode, epsilon = 0, args.epsilon
+    if args.resume is not None:
+        # a restarted job resumes from the same path it checkpoints to, the
+        # first run starts from scratch
+        if os.path.exists(args.resume):
+            start_episode, epsilon = load_checkpoint(args.resume, agent)
+        else:
+            print(f"no checkpoint at {args.resume}, starting from scratch")
+    if args.workers > 1:
+        train_parallel(args, agent, start_episode, epsilon)
+        return
+
+    env = TankEnv(max_x=args.max_x, max_y=args.max_y, obstacles=args.obstacles)
+    env.reset(seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    features = FeatureExtractor(args.max_x, args.max_y)
+
+    rewards = np.zeros(args.episodes)
+    viewer = None
+    t0 = time.perf_counter()
+    total_steps = 0
+    done_episodes = 0  # episodes played to the end, an interrupted one is not
+    try:
+        for episode in range(start_episode, start_episode + args.episodes):
+            shown = args.render_every > 0 and episode % args.render_every == 0
+            if shown and viewer is None:
+                viewer = Viewer(env, args.fps)
+            total_reward, steps = run_episode(
+                env, agent, features, epsilon, args, rng, viewer if shown else None
+            )
+            rewards[episode - start_episode] = total_reward
+            total_steps += steps
+            epsilon = max(args.epsilon_min, epsilon * args.epsilon_decay)
+            done_episodes += 1
+
+            if done_episodes % args.log_every == 0:
+                elapsed = time.perf_counter() - t0
+                recent = rewards[max(0, done_episodes - args.log_every) : done_episodes]
+                print(
+                    f"episode {start_episode + done_episodes:7d}  "
+                    f"{done_episodes / elapsed:8.1f} episodes/s  "
+                    f"{total_steps / elapsed:9.0f} steps/s  "
+                    f"mean reward {recent.mean():8.3f}  epsilon {epsilon:.3f}"
+                )
+            if args.checkpoint and done_episodes % args.checkpoint_every == 0:
+                save_checkpoint(
+                    args.checkpoint, agent, start_episode + done_episodes, epsilon
+                )
+    except KeyboardInterrupt:
+        print("interrupted")
+    finally:
+        if args.checkpoint:
+            save_checkpoint(
+                args.checkpoint, agent, start_episode + done_episodes, epsilon
+            )
+        if viewer is not None:
+            viewer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -62,5 +62,5 @@ def fill_projectile(projectile: Projectile, gameboard: np.ndarray) -> np.ndarray
 
     map_label_color = {0: Color.player_projectile, 1: Color.enemy_projectile}
 
-    gameboard[y_coord, x_coord, :] = map_label_color[label]
+    gameboard[y_coord, x_coord, :] = map_label_color[label].value
     return gameboard
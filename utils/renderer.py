@@ -0,0 +1,153 @@
+import numpy as np
+
+from utils.coloring import Color
+
+# Palette indices used in the coded frame
+BACKGROUND = 0
+PLAYER = 1
+ENEMY = 2
+OBSTACLE = 3
+PLAYER_PROJECTILE = 4
+ENEMY_PROJECTILE = 5
+
+PALETTE = np.array(
+    [
+        [240, 240, 240],  # white background
+        Color.player.value,
+        Color.enemy.value,
+        Color.obstacle.value,
+        Color.player_projectile.value,
+        Color.enemy_projectile.value,
+    ],
+    dtype=np.uint8,
+)
+
+# 3x3 sprite of a tank for each direction (0 = up, 1 = right, 2 = down, 3 = left),
+# indexed [row, column], same shapes as `fill_tank`
+TANK_SPRITES = np.array(
+    [
+        [[0, 1, 0], [1, 1, 1], [1, 0, 1]],
+        [[1, 1, 0], [0, 1, 1], [1, 1, 0]],
+        [[1, 0, 1], [1, 1, 1], [0, 1, 0]],
+        [[0, 1, 1], [1, 1, 0], [0, 1, 1]],
+    ],
+    dtype=bool,
+)
+
+# (row, column) offsets of the cells of each sprite, relative to the center
+_SPRITE_OFFSETS = [np.nonzero(sprite) for sprite in TANK_SPRITES]
+SPRITE_ROWS = [rows - 1 for rows, _ in _SPRITE_OFFSETS]
+SPRITE_COLS = [cols - 1 for _, cols in _SPRITE_OFFSETS]
+
+
+class FrameRenderer:
+    """Renders TankEnv frames with array operations.
+
+    The frame is first drawn as palette indices: the background and the
+    obstacles are cached and only redrawn when the obstacle set changes, the
+    tanks are stamped from per-direction sprites and the projectiles are
+    scattered in one assignment. The indices are then turned into colors.
+
+    Args:
+        max_x (int): Width of the game screen.
+        max_y (int): Height of the game screen.
+    """
+
+    def __init__(self, max_x: int, max_y: int):
+        # padding of 1 on each side
+        self.shape = (max_y + 2, max_x + 2)
+        self.static = np.zeros(self.shape, dtype=np.uint8)
+        self.codes = np.zeros(self.shape, dtype=np.uint8)
+        self._obstacles = None
+
+    def set_obstacles(self, obstacles) -> None:
+        """Redraws the static layer: background and 3x3 obstacles."""
+        self.static[:] = BACKGROUND
+        for x, y in obstacles:
+            self.static[y : y + 3, x : x + 3] = OBSTACLE
+        self._obstacles = obstacles
+
+    def _stamp_tank(self, tank, code: int) -> None:
+        x, y, direction, _ = tank.info()
+        rows, cols = SPRITE_ROWS[direction], SPRITE_COLS[direction]
+        self.codes[y + 1 + rows, x + 1 + cols] = code
+
+    def draw(self, state: dict) -> np.ndarray:
+        """Draws the palette indices of the frame of `state` into `self.codes`."""
+        return self.draw_elements(
+            state["obstacles"],
+            (state["player"], *state["enemies"]),
+            state["projectiles"],
+        )
+
+    def draw_elements(self, obstacles, tanks, projectiles) -> np.ndarray:
+        """Draws game elements into `self.codes`: tanks and projectiles of
+        label 0 in the colors of the player, the others in those of the
+        enemies."""
+        if obstacles is not self._obstacles:
+            self.set_obstacles(obstacles)
+        codes = self.codes
+        np.copyto(codes, self.static)
+
+        ## tanks
+        for tank in tanks:
+            self._stamp_tank(tank, ENEMY if tank.label else PLAYER)
+
+        ## projectiles
+        n = len(projectiles)
+        if n:
+            xs = np.empty(n, dtype=np.intp)
+            ys = np.empty(n, dtype=np.intp)
+            colors = np.empty(n, dtype=np.uint8)
+            for i, projectile in enumerate(projectiles):
+                xs[i] = projectile.x
+                ys[i] = projectile.y
+                colors[i] = projectile.label != 0
+            codes[ys + 1, xs + 1] = PLAYER_PROJECTILE + colors
+        return codes
+
+    def render(self, state: dict, out: np.ndarray | None = None) -> np.ndarray:
+        """Renders the RGB frame of `state`.
+
+        Args:
+            state (dict): state of a TankEnv.
+            out (np.ndarray | None): (max_y + 2, max_x + 2, 3) uint8 array to
+                render into. A new array is returned if None.
+        """
+        return np.take(PALETTE, self.draw(state), axis=0, out=out)
+
+
+class Upscaler:
+    """Upscales frames into a reusable buffer, and optionally onto a cached
+    pygame surface.
+
+    Args:
+        scale (int): Size in pixels of a cell of the game.
+    """
+
+    def __init__(self, scale: int = 18):
+        self.scale = scale
+        self.buffer = None
+        self.surface = None
+
+    def upscale(self, frame: np.ndarray) -> np.ndarray:
+        rows, cols, channels = frame.shape
+        shape = (rows * self.scale, cols * self.scale, channels)
+        if self.buffer is None or self.buffer.shape != shape:
+            self.buffer = np.empty(shape, dtype=frame.dtype)
+        # each cell becomes a scale x scale block, in a single copy
+        blocks = self.buffer.reshape(rows, self.scale, cols, self.scale, channels)
+        blocks[:] = frame[:, None, :, None, :]
+        return self.buffer
+
+    def to_surface(self, frame: np.ndarray):
+        """Upscales the frame onto a pygame surface reused between calls."""
+        import pygame
+
+        pixels = self.upscale(frame)
+        # surfarray arrays are indexed [x, y], like pygame.surfarray.make_surface
+        size = pixels.shape[:2]
+        if self.surface is None or self.surface.get_size() != size:
+            self.surface = pygame.Surface(size)
+        pygame.surfarray.blit_array(self.surface, pixels)
+        return self.surface
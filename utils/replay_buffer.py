@@ -1,6 +1,336 @@
-import random
+import os
+
 import numpy as np
+from gymnasium import spaces
+
+
+class SumTree:
+    """Binary tree whose nodes hold the sum of the priorities of their leaves.
+
+    Stored as a flat array: node i has children 2i and 2i + 1, the root is
+    node 1 and leaf j is node `leaves + j`. Updates and prefix-sum searches
+    walk one root-to-leaf path, O(log N), and both are vectorized over a batch.
+
+    Args:
+        capacity (int): Number of leaves.
+    """
+
+    def __init__(self, capacity: int):
+        self.leaves = 1 << max(capacity - 1, 0).bit_length()
+        self.depth = self.leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    def total(self) -> float:
+        return self.tree[1]
+
+    def get(self, indices) -> np.ndarray:
+        return self.tree[self.leaves + np.asarray(indices)]
+
+    def update(self, indices, priorities) -> None:
+        nodes = self.leaves + np.asarray(indices)
+        # with duplicate indices, the last priority wins
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, prefix_sums) -> np.ndarray:
+        """Leaves whose cumulative priority range contains each prefix sum."""
+        values = np.array(prefix_sums, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            right = self.tree[2 * nodes + 1]
+            # never into a subtree of priority 0, where rounding of the
+            # prefix sums could otherwise end
+            go_right = ((values > left) & (right > 0)) | (left <= 0)
+            values -= np.where(go_right, left, 0.0)
+            nodes = 2 * nodes + go_right
+        return nodes - self.leaves
+
 
 class ReplayBuffer:
-    def __init__(self, capacity):
-        pass
\ No newline at end of file
+    """Fixed-capacity ring buffer of transitions stored in preallocated arrays.
+
+    Each observation is stored once: the next observation of the transition
+    in row i is the observation of row i + 1 of the same ring. When an
+    episode ends (done or truncated), its last observation takes one extra
+    row, which holds no transition, and the next episode starts after it.
+    Along with the fields of the observation space, every row stores
+    "action", "reward", "done" and "valid" (the row holds a transition
+    whose next observation is still there). Appending overwrites the oldest
+    rows once the buffer is full. Use a TankEnv with obs_mode="array", whose
+    observations are arrays matching its observation_space.
+
+    With `num_envs` > 1, the buffer is made of `num_envs` rings of
+    capacity // num_envs rows, one per environment of a vectorized
+    environment, so that the transitions of an episode stay consecutive.
+
+    Sampling is uniform, or proportional to priority ** alpha when
+    `prioritized` is set: new transitions get the highest priority seen so
+    far, and `update_priorities` sets them from the TD errors.
+
+    Args:
+        capacity (int): Maximum number of rows, of all the rings.
+        observation_space (spaces.Dict): Observation space of the environment.
+        prioritized (bool): Sample through a sum-tree of priorities.
+        alpha (float): Prioritization exponent, 0 is uniform.
+        path (str | None): Directory where the arrays are memory-mapped
+            (one .npy file per field), to hold buffers larger than RAM.
+            The arrays live in RAM if None.
+        num_envs (int): Number of environments appending together.
+        resume (bool): Open the buffer last flushed to `path` (the arrays
+            are opened in "r+" mode) rather than creating an empty one. The
+            next transition starts an episode.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        observation_space: spaces.Dict,
+        prioritized: bool = False,
+        alpha: float = 0.6,
+        path: str | None = None,
+        num_envs: int = 1,
+        resume: bool = False,
+    ):
+        assert num_envs > 0
+        assert capacity // num_envs >= 2, "every ring needs two rows"
+        assert path is not None or not resume, "nothing to resume without a path"
+        self.rows = capacity // num_envs
+        self.num_envs = num_envs
+        self.capacity = self.rows * num_envs
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.path = path
+        self.keys = list(observation_space.spaces)
+        self.envs = np.arange(num_envs)
+
+        fields = {}
+        for key, space in observation_space.spaces.items():
+            fields[key] = (space.shape, space.dtype)
+        fields["action"] = ((), np.int64)
+        fields["reward"] = ((), np.float32)
+        fields["done"] = ((), np.bool_)
+        fields["valid"] = ((), np.bool_)
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        mode = "r+" if resume else "w+"
+        self.data = {
+            name: self._allocate(name, shape, dtype, mode)
+            for name, (shape, dtype) in fields.items()
+        }
+
+        self.position = np.zeros(num_envs, dtype=np.int64)  # next row of each ring
+        # the observation at `position` is already stored (episode in progress)
+        self.open = np.zeros(num_envs, dtype=np.bool_)
+        self.rows_used = 0  # rows of the rings written at least once
+        self.size = 0  # valid rows
+
+        self.tree = SumTree(self.capacity) if prioritized else None
+        self.max_priority = 1.0
+        if resume:
+            self._load_state()
+
+    def _allocate(self, name: str, shape: tuple, dtype, mode: str) -> np.ndarray:
+        shape = (self.rows, self.num_envs, *shape)
+        if self.path is None:
+            return np.zeros(shape, dtype=dtype)
+        array = np.lib.format.open_memmap(
+            os.path.join(self.path, name + ".npy"), mode=mode, dtype=dtype, shape=shape
+        )
+        assert (
+            array.shape == shape and array.dtype == dtype
+        ), f"{name}.npy holds {array.dtype}{array.shape}, not {dtype}{shape}"
+        return array
+
+    def __len__(self) -> int:
+        return self.size
+
+    # __________APPEND__________#
+
+    def add(
+        self,
+        obs: dict,
+        action: int,
+        reward: float,
+        next_obs: dict,
+        done: bool,
+        truncated: bool = False,
+    ):
+        """Appends one transition, O(1) (O(log N) with priorities).
+
+        Within an episode, `obs` must be the `next_obs` of the previous
+        call, it is not stored again. The episode ends when `done` or
+        `truncated` is set."""
+        assert self.num_envs == 1, "append the transitions of every env with extend"
+        row = int(self.position[0])
+        next_row = (row + 1) % self.rows
+        data = self.data
+        for key in self.keys:
+            if not self.open[0]:
+                data[key][row, 0] = obs[key]
+            data[key][next_row, 0] = next_obs[key]
+        data["action"][row, 0] = action
+        data["reward"][row, 0] = reward
+        data["done"][row, 0] = done
+
+        # the transition of the row holding the next observation is lost
+        valid = data["valid"]
+        self.size += int(not valid[row, 0]) - int(valid[next_row, 0])
+        valid[row, 0] = True
+        valid[next_row, 0] = False
+        if self.tree is not None:
+            self.tree.update([row, next_row], [self.max_priority**self.alpha, 0.0])
+
+        ended = done or truncated
+        self.open[0] = not ended
+        self.position[0] = (row + 2) % self.rows if ended else next_row
+        self.rows_used = min(self.rows, max(self.rows_used, row + 2))
+
+    def extend(
+        self, obs: dict, actions, rewards, next_obs: dict, dones, truncated=None
+    ) -> None:
+        """Appends one transition per environment, e.g. one step of a
+        vectorized environment. Every field of `obs` and `next_obs` has a
+        leading dimension of num_envs, and `next_obs` holds the last
+        observations of the episodes that end, not those of the automatic
+        resets."""
+        envs = self.envs
+        rows = self.position
+        next_rows = (rows + 1) % self.rows
+        dones = np.asarray(dones, dtype=np.bool_)
+        assert len(dones) == self.num_envs
+        ended = dones if truncated is None else dones | np.asarray(truncated)
+
+        data = self.data
+        started = ~self.open
+        for key in self.keys:
+            if started.any():
+                data[key][rows[started], envs[started]] = obs[key][started]
+            data[key][next_rows, envs] = next_obs[key]
+        data["action"][rows, envs] = actions
+        data["reward"][rows, envs] = rewards
+        data["done"][rows, envs] = dones
+
+        # the transition of the rows holding the next observations is lost
+        valid = data["valid"]
+        self.size += int(np.count_nonzero(~valid[rows, envs]))
+        self.size -= int(np.count_nonzero(valid[next_rows, envs]))
+        valid[rows, envs] = True
+        valid[next_rows, envs] = False
+        if self.tree is not None:
+            n = self.num_envs
+            self.tree.update(
+                np.concatenate((rows * n + envs, next_rows * n + envs)),
+                np.repeat([self.max_priority**self.alpha, 0.0], n),
+            )
+
+        self.open = ~ended
+        self.position = np.where(ended, (rows + 2) % self.rows, next_rows)
+        self.rows_used = min(self.rows, max(self.rows_used, int(rows.max()) + 2))
+
+    # __________SAMPLING__________#
+
+    def sample(
+        self, batch_size: int, beta: float = 0.4, rng: np.random.Generator | None = None
+    ) -> dict:
+        """Samples a minibatch of transitions.
+
+        Returns a dict of arrays with a leading batch dimension, plus
+        "indices" to pass to `update_priorities`, and "weights", the
+        importance-sampling weights normalized by their maximum (all ones
+        for uniform sampling).
+
+        Args:
+            batch_size (int): Number of transitions.
+            beta (float): Importance-sampling exponent, prioritized only.
+            rng (np.random.Generator | None): Source of randomness.
+        """
+        assert self.size > 0, "cannot sample from an empty buffer"
+        rng = np.random.default_rng() if rng is None else rng
+        valid = self.data["valid"].reshape(-1)
+
+        if self.tree is None:
+            # draw again the rows without a transition, a few per episode
+            high = self.rows_used * self.num_envs
+            indices = rng.integers(0, high, batch_size)
+            invalid = ~valid[indices]
+            while invalid.any():
+                indices[invalid] = rng.integers(0, high, np.count_nonzero(invalid))
+                invalid = ~valid[indices]
+            weights = np.ones(batch_size, dtype=np.float32)
+        else:
+            # one draw per equal slice of the total priority
+            total = self.tree.total()
+            prefix_sums = (np.arange(batch_size) + 1 - rng.random(batch_size)) * (
+                total / batch_size
+            )
+            indices = self.tree.find(prefix_sums)
+            probabilities = self.tree.get(indices) / total
+            weights = (self.size * probabilities) ** -beta
+            weights = (weights / weights.max()).astype(np.float32)
+
+        rows, envs = np.divmod(indices, self.num_envs)
+        next_rows = (rows + 1) % self.rows
+        batch = {}
+        for key in self.keys:
+            batch[key] = self.data[key][rows, envs]
+            batch["next_" + key] = self.data[key][next_rows, envs]
+        for name in ("action", "reward", "done"):
+            batch[name] = self.data[name][rows, envs]
+        batch["indices"] = indices
+        batch["weights"] = weights
+        return batch
+
+    def update_priorities(self, indices, priorities) -> None:
+        """Sets the priorities of sampled transitions, typically |TD error| plus
+        a small constant so that no transition gets a zero probability."""
+        assert self.tree is not None, "the buffer is not prioritized"
+        priorities = np.asarray(priorities, dtype=np.float64)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        # a sampled row may have been overwritten by an episode end since
+        valid = self.data["valid"].reshape(-1)[indices]
+        self.tree.update(indices, np.where(valid, priorities**self.alpha, 0.0))
+
+    # __________PERSISTENCE__________#
+
+    def flush(self) -> None:
+        """Writes memory-mapped arrays to disk, with the positions and the
+        priorities, so that the buffer can be opened again with `resume`."""
+        for array in self.data.values():
+            if isinstance(array, np.memmap):
+                array.flush()
+        if self.path is None:
+            return
+        state = {
+            "position": self.position,
+            "open": self.open,
+            "rows_used": self.rows_used,
+            "max_priority": self.max_priority,
+        }
+        if self.tree is not None:
+            state["priorities"] = self.tree.get(np.arange(self.capacity))
+        tmp = os.path.join(self.path, "state.tmp.npz")
+        np.savez(tmp, **state)
+        os.replace(tmp, os.path.join(self.path, "state.npz"))
+
+    def _load_state(self) -> None:
+        with np.load(os.path.join(self.path, "state.npz")) as state:
+            # the episodes in progress end there, the last observation of
+            # each keeps its row
+            self.position = np.where(
+                state["open"], (state["position"] + 1) % self.rows, state["position"]
+            )
+            self.rows_used = int(state["rows_used"])
+            self.max_priority = float(state["max_priority"])
+            if self.tree is None:
+                pass
+            elif "priorities" in state:
+                self.tree.update(np.arange(self.capacity), state["priorities"])
+            else:
+                # flushed without priorities, every transition gets the same
+                valid = self.data["valid"].reshape(-1)
+                self.tree.update(np.arange(self.capacity), valid * 1.0)
+        self.size = int(np.count_nonzero(self.data["valid"]))